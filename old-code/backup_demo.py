@@ -35,7 +35,18 @@ def demonstrate_backup_workflow():
         print(f"   📁 Backup location: {backup_path}")
     
     print(f"\n3. Verifying backup file exists...")
-    if backup_path.exists():
+    if backup_path.exists() and backup_path.suffix == '.json':
+        # Deduplicating store: the backup is a snapshot manifest over shared chunks
+        from backup_store import BackupStore
+        store = BackupStore.for_master(master_table_path)
+        stamps = store.snapshots(master_table_path.name)
+        snapshot = store.read_snapshot(master_table_path.name, backup_path.stem)
+        print(f"   ✅ Snapshot verified ({len(snapshot['members'])} workbook parts)")
+        print(f"   📊 Original file size: {master_table_path.stat().st_size:,} bytes")
+        print(f"   📊 New data stored: {snapshot['stored_bytes']:,} bytes")
+        print(f"   📁 {len(stamps)} snapshots, store size {store.disk_usage():,} bytes")
+        print(f"   💡 Restore with: python excel_processor.py backup-restore {backup_path.stem}")
+    elif backup_path.exists():
         print(f"   ✅ Backup file verified")
         
         # Get file sizes for comparison
@@ -0,0 +1,383 @@
+"""
+Deduplicating backup store for the master table.
+
+create_master_table_backup used to shutil.copy2 the whole master before every
+append, so backups/ filled with multi-megabyte copies that differed by a few rows.
+The store keeps the workbook as its zip members instead:
+- every member is split into chunks stored once, zlib-compressed, under
+  objects/ab/<sha256>; styles, VBA and untouched sheets are shared by all snapshots
+- worksheet XML is cut at <sheetData>, </sheetData> and before every
+  ROWS_PER_CHUNK-th row, so an append only adds the chunk(s) holding the new rows
+- snapshots/<master name>/<YYYYMMDD_HHMMSS>.json lists the members of one backup
+  (zip metadata, CRC, size and chunk hashes)
+
+A member whose CRC and size match the previous snapshot reuses its chunks without
+being read, so backup time and disk use grow with the change, not with the master.
+prune() applies the retention policy (newest snapshot of each of the last N days
+and M weeks) and deletes chunks no snapshot references any more. restore()
+rebuilds the workbook from a snapshot and checks every member's CRC.
+
+BACKUP_KEEP_DAILY / BACKUP_KEEP_WEEKLY set the retention (default 7 and 4).
+backup_master_for_mode() is the entry point for the append paths: MASTER_BACKUP_MODE
+'store' (default) snapshots into the store, 'copy' keeps the old full copy in backups/.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import zipfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from master_tail import SHEETDATA_OPEN_RE
+from xlsx_stream import CHUNK_SIZE, ZIP64_LIMIT
+
+SNAPSHOT_VERSION = 1
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+BACKUP_MODES = ('store', 'copy')
+ROWS_PER_CHUNK = 2000
+MAX_CHUNK_SIZE = 8 * CHUNK_SIZE
+
+_SHEET_PART_RE = re.compile(r'^xl/worksheets/[^/]+\.xml$')
+_ROW_START_RE = re.compile(rb'<row\b[^>]*?\br="(\d+)"')
+
+
+def _split_sheet(src) -> Iterator[bytes]:
+    """Yield worksheet XML in chunks whose boundaries only depend on nearby content.
+    Head and tail of the sheet are separate chunks and rows are grouped by row number,
+    so a changed <dimension> or appended rows leave the other row chunks untouched.
+    """
+    buf = b''
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        buf += chunk
+        m = SHEETDATA_OPEN_RE.search(buf)
+        if m:
+            break
+        if not chunk:
+            # Not a regular worksheet: store it as size-bounded chunks
+            yield from (buf[i:i + MAX_CHUNK_SIZE] for i in range(0, len(buf), MAX_CHUNK_SIZE))
+            return
+    yield buf[:m.end()]
+    buf = buf[m.end():]
+    if m.group(1):
+        # <sheetData/>: an empty sheet has no rows to group, the rest is its tail
+        yield buf + src.read()
+        return
+
+    piece = b''
+    while True:
+        end = buf.find(b'</sheetData>')
+        done = end != -1
+        if done:
+            block, buf = buf[:end], buf[end:]
+        else:
+            cut = buf.rfind(b'</row>')
+            if cut == -1:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    raise ValueError('Worksheet XML ended before </sheetData>')
+                buf += chunk
+                continue
+            cut += len(b'</row>')
+            block, buf = buf[:cut], buf[cut:]
+
+        # block holds complete rows; cut before row 1, 1 + ROWS_PER_CHUNK, ...
+        start = 0
+        for row in _ROW_START_RE.finditer(block):
+            if (int(row.group(1)) - 1) % ROWS_PER_CHUNK == 0 or len(piece) + row.start() - start > MAX_CHUNK_SIZE:
+                piece += block[start:row.start()]
+                if piece:
+                    yield piece
+                piece = b''
+                start = row.start()
+        piece += block[start:]
+
+        if done:
+            if piece:
+                yield piece
+            tail = buf
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                tail += chunk
+            yield tail
+            return
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            raise ValueError('Worksheet XML ended before </sheetData>')
+        buf += chunk
+
+
+def _split_member(src, name: str) -> Iterator[bytes]:
+    if _SHEET_PART_RE.match(name):
+        yield from _split_sheet(src)
+        return
+    while True:
+        chunk = src.read(MAX_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_timestamp(stamp: str) -> datetime:
+    return datetime.strptime(stamp[:15], TIMESTAMP_FORMAT)
+
+
+class BackupStore:
+    """Content-addressed chunks + per-master snapshot manifests under one directory."""
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    def __repr__(self) -> str:
+        return f'BackupStore({self.root})'
+
+    @classmethod
+    def for_master(cls, master_path: Path | str) -> 'BackupStore':
+        """The store used for master_path: <master dir>/backups/store."""
+        return cls(Path(master_path).parent / 'backups' / 'store')
+
+    # --- Layout ---
+
+    def object_path(self, sha256: str) -> Path:
+        return self.root / 'objects' / sha256[:2] / sha256
+
+    def snapshot_dir(self, master_name: str) -> Path:
+        return self.root / 'snapshots' / master_name
+
+    def snapshots(self, master_name: str) -> List[str]:
+        """Snapshot timestamps for master_name, oldest first."""
+        return sorted(p.stem for p in self.snapshot_dir(master_name).glob('*.json'))
+
+    def read_snapshot(self, master_name: str, stamp: str) -> dict:
+        return json.loads((self.snapshot_dir(master_name) / f'{stamp}.json').read_text())
+
+    def resolve(self, master_name: str, stamp: str) -> str:
+        """Exact timestamp, or the newest snapshot whose timestamp starts with stamp (e.g. '20250831')."""
+        matches = [s for s in self.snapshots(master_name) if s.startswith(stamp)]
+        if not matches:
+            raise ValueError(f"No backup of {master_name} matches '{stamp}'")
+        return stamp if stamp in matches else matches[-1]
+
+    # --- Chunks ---
+
+    def _put(self, data: bytes) -> Tuple[str, int]:
+        """Store a chunk if it is new. Returns (sha256, bytes written to disk)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            return digest, 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        packed = zlib.compress(data, 6)
+        tmp = path.with_name(f'.{digest}.tmp')
+        tmp.write_bytes(packed)
+        os.replace(tmp, path)
+        return digest, len(packed)
+
+    def _get(self, digest: str) -> bytes:
+        data = zlib.decompress(self.object_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Backup chunk {digest} is corrupt')
+        return data
+
+    # --- Backup / restore ---
+
+    def backup(self, master_path: Path | str, stamp: Optional[str] = None) -> Path:
+        """Snapshot master_path. Returns the path of the snapshot manifest."""
+        master_path = Path(master_path)
+        name = master_path.name
+        stamp = stamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+        existing = self.snapshots(name)
+        base, n = stamp, 1
+        while stamp in existing:
+            stamp = f'{base}_{n}'
+            n += 1
+
+        previous: Dict[str, dict] = {}
+        if existing:
+            try:
+                previous = {m['name']: m for m in self.read_snapshot(name, existing[-1])['members']}
+            except (OSError, ValueError, KeyError):
+                previous = {}
+
+        members: List[dict] = []
+        new_chunks = 0
+        stored_bytes = 0
+        with zipfile.ZipFile(master_path) as zf:
+            for info in zf.infolist():
+                entry = {'name': info.filename, 'date_time': list(info.date_time),
+                         'compress_type': info.compress_type, 'external_attr': info.external_attr,
+                         'crc': info.CRC, 'size': info.file_size}
+                prev = previous.get(info.filename)
+                if (prev is not None and (prev['crc'], prev['size']) == (info.CRC, info.file_size)
+                        and all(self.object_path(h).exists() for h in prev['chunks'])):
+                    entry['chunks'] = prev['chunks']
+                else:
+                    chunks = []
+                    with zf.open(info) as src:
+                        for piece in _split_member(src, info.filename):
+                            digest, written = self._put(piece)
+                            chunks.append(digest)
+                            if written:
+                                new_chunks += 1
+                                stored_bytes += written
+                    entry['chunks'] = chunks
+                members.append(entry)
+
+        snapshot = {'version': SNAPSHOT_VERSION, 'master': name, 'stamp': stamp,
+                    'size': master_path.stat().st_size, 'new_chunks': new_chunks,
+                    'stored_bytes': stored_bytes, 'members': members}
+        out = self.snapshot_dir(name) / f'{stamp}.json'
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f'.{out.name}.tmp')
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, out)
+        return out
+
+    def restore(self, master_name: str, stamp: str, out_path: Path | str) -> Path:
+        """Rebuild the workbook saved in snapshot stamp of master_name at out_path."""
+        out_path = Path(out_path)
+        snapshot = self.read_snapshot(master_name, self.resolve(master_name, stamp))
+        tmp_path = out_path.with_name(f'.{out_path.name}.tmp')
+        try:
+            with zipfile.ZipFile(tmp_path, 'w') as zout:
+                for m in snapshot['members']:
+                    info = zipfile.ZipInfo(m['name'], date_time=tuple(m['date_time']))
+                    info.compress_type = m['compress_type']
+                    info.external_attr = m['external_attr']
+                    crc = 0
+                    with zout.open(info, 'w', force_zip64=m['size'] > ZIP64_LIMIT // 2) as dst:
+                        for digest in m['chunks']:
+                            data = self._get(digest)
+                            crc = zlib.crc32(data, crc)
+                            dst.write(data)
+                    if crc != m['crc']:
+                        raise ValueError(f"CRC mismatch restoring {m['name']} from backup {snapshot['stamp']}")
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return out_path
+
+    # --- Retention ---
+
+    def prune(self, keep_daily: int = 7, keep_weekly: int = 4) -> Tuple[int, int]:
+        """Apply the retention policy to every master in the store and drop unreferenced chunks.
+
+        For each master the newest snapshot is always kept, plus the newest snapshot of
+        each of the last keep_daily days and keep_weekly ISO weeks that have snapshots.
+        Returns (snapshots removed, chunks removed).
+        """
+        removed_snapshots = 0
+        live = set()
+        for snap_dir in sorted(p for p in (self.root / 'snapshots').glob('*') if p.is_dir()):
+            stamps = self.snapshots(snap_dir.name)
+            keep = set(stamps[-1:])
+            days: Dict[str, str] = {}
+            weeks: Dict[Tuple[int, int], str] = {}
+            for stamp in reversed(stamps):
+                when = _parse_timestamp(stamp)
+                day = when.strftime('%Y%m%d')
+                if day not in days and len(days) < keep_daily:
+                    days[day] = stamp
+                week = tuple(when.isocalendar()[:2])
+                if week not in weeks and len(weeks) < keep_weekly:
+                    weeks[week] = stamp
+            keep.update(days.values())
+            keep.update(weeks.values())
+            for stamp in stamps:
+                path = snap_dir / f'{stamp}.json'
+                if stamp not in keep:
+                    path.unlink()
+                    removed_snapshots += 1
+                    continue
+                for m in json.loads(path.read_text())['members']:
+                    live.update(m['chunks'])
+
+        removed_chunks = 0
+        for obj in (self.root / 'objects').glob('*/*'):
+            if obj.name not in live and not obj.name.startswith('.'):
+                obj.unlink()
+                removed_chunks += 1
+        return removed_snapshots, removed_chunks
+
+    def disk_usage(self) -> int:
+        """Bytes used by stored chunks."""
+        return sum(p.stat().st_size for p in (self.root / 'objects').glob('*/*'))
+
+
+def retention_from_env() -> Tuple[int, int]:
+    """(keep_daily, keep_weekly) from BACKUP_KEEP_DAILY / BACKUP_KEEP_WEEKLY."""
+    return int(os.getenv('BACKUP_KEEP_DAILY', '7')), int(os.getenv('BACKUP_KEEP_WEEKLY', '4'))
+
+
+def backup_master(master_path: Path | str, prune: bool = True) -> Path:
+    """Snapshot master_path into its store and apply the retention policy."""
+    store = BackupStore.for_master(master_path)
+    snapshot = store.backup(master_path)
+    if prune:
+        store.prune(*retention_from_env())
+    return snapshot
+
+
+def check_backup_mode(mode: str) -> str:
+    """Return mode if it is a known MASTER_BACKUP_MODE value, else raise ValueError."""
+    if mode not in BACKUP_MODES:
+        raise ValueError(f"Unknown master backup mode {mode!r} (expected one of {', '.join(BACKUP_MODES)})")
+    return mode
+
+
+def copy_master(master_path: Path | str) -> Path:
+    """Copy master_path to backups/<stem>_backup_<timestamp><suffix> next to it."""
+    master_path = Path(master_path)
+    backup_dir = master_path.parent / 'backups'
+    backup_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    backup_path = backup_dir / f'{master_path.stem}_backup_{timestamp}{master_path.suffix}'
+    shutil.copy2(master_path, backup_path)
+    return backup_path
+
+
+def backup_master_for_mode(master_path: Path | str, mode: Optional[str] = None) -> Optional[Path]:
+    """Back up master_path before it is modified, as a store snapshot or a full copy.
+
+    Args:
+        master_path: Master workbook to back up
+        mode: 'store' or 'copy'; defaults to MASTER_BACKUP_MODE ('store')
+
+    Returns:
+        The snapshot manifest or backup copy, or None if the master is missing or the
+        backup failed (printed). An unknown mode raises ValueError instead.
+    """
+    master_path = Path(master_path)
+    mode = check_backup_mode(os.getenv('MASTER_BACKUP_MODE', 'store') if mode is None else mode)
+    if not master_path.exists():
+        print(f"Master table not found for backup: {master_path}")
+        return None
+    try:
+        backup_path = backup_master(master_path) if mode == 'store' else copy_master(master_path)
+    except Exception as e:
+        print(f"Failed to create backup of master table: {e}")
+        return None
+    print(f"Created backup: {backup_path}")
+    return backup_path
+
+
+def restore_master(master_path: Path | str, stamp: str, out_path: Optional[Path | str] = None) -> Path:
+    """Restore a snapshot of master_path (to out_path, default over master_path itself).
+    When overwriting the master, its current state is snapshotted first so a restore can be undone.
+    """
+    master_path = Path(master_path)
+    store = BackupStore.for_master(master_path)
+    stamp = store.resolve(master_path.name, stamp)
+    target = Path(out_path) if out_path is not None else master_path
+    if target == master_path and master_path.exists():
+        store.backup(master_path)
+    return store.restore(master_path.name, stamp, target)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark write_updated_master_copy engines: wall time and peak RSS.
+
+Transforms a Hudson .xlsm into master rows once, then runs write_updated_master_copy
+with each engine in a fresh subprocess (so peak RSS is not shared between runs) and
+checks that every engine writes the same cell values as the legacy openpyxl path.
+
+Usage:
+    python benchmark_master_write.py [<hudson.xlsm>] [<master.xlsx>] [<engines,...>]
+"""
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+DEFAULT_SOURCE = 'HudsonMatrixPrices08272025020701PM.xlsm'
+DEFAULT_MASTER = Path('2-copy-reformat') / 'Master-Table.xlsx'
+ENGINES = ('openpyxl', 'write_only', 'stream')
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(engine: str, df_path: str, master: str, out_dir: str) -> None:
+    """Run one engine and print 'seconds peak_mb base_mb' for the parent."""
+    import excel_processor as ep
+
+    with open(df_path, 'rb') as f:
+        master_df = pickle.load(f)
+    base = _peak_rss_mb()
+    master = Path(master)
+    t0 = time.perf_counter()
+    ep.write_updated_master_copy(master_df, master.parent, master.name, str(Path(out_dir) / f'{engine}.xlsx'),
+                                 engine=engine)
+    print(f'RESULT {time.perf_counter() - t0:.3f} {_peak_rss_mb():.1f} {base:.1f}')
+
+
+def _sheet_values(path: Path):
+    from openpyxl import load_workbook
+
+    # Trailing empty cells depend on how each engine pads rows, not on the data
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = []
+        for row in wb.active.iter_rows(values_only=True):
+            row = list(row)
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(row)
+        return rows
+    finally:
+        wb.close()
+
+
+def run_benchmark(src: Path, master: Path, engines=ENGINES) -> bool:
+    import excel_reader as xr
+
+    warnings.simplefilter('ignore')
+    master_df = xr.transform_input_to_master_df(src, start_id=1)
+    print(f"Master: {master} ({master.stat().st_size / 1e6:.1f} MB); appending {len(master_df)} rows\n")
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        df_path = Path(tmp) / 'master_df.pkl'
+        with open(df_path, 'wb') as f:
+            pickle.dump(master_df, f)
+
+        print(f"{'engine':<12} {'time':>8} {'peak RSS':>10} {'RSS added':>10}")
+        for engine in engines:
+            proc = subprocess.run([sys.executable, __file__, '--child', engine, str(df_path), str(master), tmp],
+                                  capture_output=True, text=True)
+            line = next((l for l in proc.stdout.splitlines() if l.startswith('RESULT ')), None)
+            if proc.returncode != 0 or line is None:
+                print(f"{engine:<12} FAILED\n{proc.stderr.strip()}")
+                ok = False
+                continue
+            secs, peak, base = (float(x) for x in line.split()[1:])
+            print(f"{engine:<12} {secs:>7.2f}s {peak:>8.0f}MB {peak - base:>8.0f}MB")
+
+        # Every engine must write the same cells as the legacy path
+        outputs = [Path(tmp) / f'{e}.xlsx' for e in engines if (Path(tmp) / f'{e}.xlsx').exists()]
+        if len(outputs) > 1:
+            reference = _sheet_values(outputs[0])
+            for out in outputs[1:]:
+                same = _sheet_values(out) == reference
+                ok &= same
+                print(f"{out.stem} vs {outputs[0].stem}: {'identical values' if same else 'DIFFERENT values'}")
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == '--child':
+        _child(*sys.argv[2:6])
+        sys.exit(0)
+    source = Path(sys.argv[1]) if len(sys.argv) >= 2 else Path(DEFAULT_SOURCE)
+    master_path = Path(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_MASTER
+    selected = tuple(sys.argv[3].split(',')) if len(sys.argv) >= 4 else ENGINES
+    for p in (source, master_path):
+        if not p.exists():
+            print(f"ERROR: File not found: {p}")
+            sys.exit(2)
+    sys.exit(0 if run_benchmark(source, master_path, selected) else 1)
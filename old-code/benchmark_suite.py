@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the read -> transform -> append path, with stored baselines.
+
+Times each stage on synthetic inputs from workload_generator.py at several sizes
+and reports wall time (best of N), rows/second and peak traced memory (tracemalloc,
+measured in a separate run so it does not slow the timed ones):
+- transform_input_to_master_df  Matrix Table workbook of <size> rows, read + transform
+- hda_matrix_to_master_cols     Matrix Table frame of <size> rows
+- filter_sheet                  ERCOT-style sheet frame of <size> rows
+- a                             one day's <size> rows appended to a master of --master-rows rows
+- write_updated_master_copy     same, written to a new copy
+- append_l_aa                   <size> L..AA source rows appended to the same master
+
+Results are compared with benchmarks/baseline.json. A stage regresses when its time
+or peak memory exceeds the baseline by more than --threshold (default 25%, or
+BENCH_THRESHOLD) and by more than a small absolute floor, so timer noise on
+millisecond stages does not fail the run. Baselines are machine specific: record
+them with --update-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmark_suite.py [--sizes 1000,5000,20000] [--cases a,filter_sheet]
+                              [--repeats 3] [--threshold 0.25] [--update-baseline]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+
+import excel_processor as ep
+import excel_reader as xr
+from workload_generator import ercot_sheet, master_frame, matrix_table_frame, write_master, write_matrix_workbook
+
+BASELINE_PATH = Path(__file__).parent / 'benchmarks' / 'baseline.json'
+DEFAULT_SIZES = (1000, 5000, 20000)
+DEFAULT_MASTER_ROWS = 20000
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.02
+MIN_PEAK_MB_DELTA = 1.0
+
+
+# --- Inputs ---
+
+def write_l_aa_source(path: Path, df: pd.DataFrame) -> Path:
+    """First sheet with the master B..Q values in L..AA (O and P swapped, as append_l_aa expects)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append([f'c{i}' for i in range(1, 28)])
+    for row in df[ep.MASTER_HEADERS].itertuples(index=False, name=None):
+        vals = list(row)
+        vals[3], vals[4] = vals[4], vals[3]
+        ws.append([None] * 11 + vals)
+    wb.save(path)
+    return path
+
+
+# --- Cases ---
+
+class Case:
+    """One benchmarked stage: setup(size, work_dir) builds fresh inputs, run(ctx) returns rows processed."""
+
+    def __init__(self, name: str, setup: Callable[[int, Path], dict], run: Callable[[dict], int],
+                 fresh_inputs: bool = False):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        # Stages that modify their inputs get a new setup for every repeat
+        self.fresh_inputs = fresh_inputs
+
+
+def build_cases(template: Path) -> Dict[str, Case]:
+    def with_master(size: int, work: Path) -> dict:
+        master = work / 'master.xlsx'
+        shutil.copyfile(template, master)
+        # One day's append, dated after everything in the template master
+        return {'master': master, 'df': master_frame(size, days=1, first_day=date(2026, 1, 1)), 'work': work}
+
+    def matrix_file(size: int, work: Path) -> dict:
+        return {'path': write_matrix_workbook(work / 'matrix.xlsm', size)}
+
+    def l_aa(size: int, work: Path) -> dict:
+        ctx = with_master(size, work)
+        ctx['src'] = write_l_aa_source(work / 'l_aa.xlsx', ctx['df'])
+        return ctx
+
+    def run_transform(ctx: dict) -> int:
+        ep.hda_matrix_to_master_cols(ctx['df'])
+        return len(ctx['df'])
+
+    def run_filter(ctx: dict) -> int:
+        ep.filter_sheet(ctx['df'])
+        return len(ctx['df'])
+
+    def run_a(ctx: dict) -> int:
+        return ep.a(ctx['df'].copy(), ctx['master'])
+
+    def run_copy(ctx: dict) -> int:
+        ep.write_updated_master_copy(ctx['df'], master_dir=ctx['work'], master_filename='master.xlsx',
+                                     out_filename='updated.xlsx')
+        return len(ctx['df'])
+
+    def run_l_aa(ctx: dict) -> int:
+        ep.append_l_aa(ctx['src'], ctx['master'])
+        return len(ctx['df'])
+
+    cases = [
+        Case('transform_input_to_master_df', matrix_file,
+             lambda ctx: len(xr.transform_input_to_master_df(ctx['path'], start_id=1))),
+        Case('hda_matrix_to_master_cols', lambda size, work: {'df': matrix_table_frame(size)}, run_transform),
+        Case('filter_sheet', lambda size, work: {'df': ercot_sheet(size)}, run_filter),
+        Case('a', with_master, run_a, fresh_inputs=True),
+        Case('write_updated_master_copy', with_master, run_copy, fresh_inputs=True),
+        Case('append_l_aa', l_aa, run_l_aa, fresh_inputs=True),
+    ]
+    return {c.name: c for c in cases}
+
+
+def _quiet(fn, *args):
+    """Run fn with stdout silenced (the stages print progress for every call)."""
+    saved = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        return fn(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved
+
+
+def measure(case: Case, size: int, repeats: int, root: Path) -> dict:
+    """Best wall time of repeats runs, plus peak traced memory of one extra run."""
+    best = None
+    rows = 0
+    ctx = None
+    for i in range(repeats + 1):
+        work = root / f'{case.name}-{size}-{i}'
+        work.mkdir()
+        if ctx is None or case.fresh_inputs:
+            ctx = _quiet(case.setup, size, work)
+        if i < repeats:
+            t0 = time.perf_counter()
+            rows = _quiet(case.run, ctx)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        else:
+            tracemalloc.start()
+            try:
+                _quiet(case.run, ctx)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        if case.fresh_inputs:
+            shutil.rmtree(work, ignore_errors=True)
+    return {'seconds': round(best, 4), 'rows': rows, 'rows_per_s': round(rows / best, 1) if best else None,
+            'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+# --- Baselines ---
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, dict]:
+    try:
+        return json.loads(path.read_text()).get('results', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results: Dict[str, dict], path: Path = BASELINE_PATH) -> None:
+    data = {'results': load_baseline(path)}
+    data['results'].update(results)
+    data['recorded'] = date.today().isoformat()
+    data['results'] = dict(sorted(data['results'].items()))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=1) + '\n')
+
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float = THRESHOLD) -> List[str]:
+    """Describe every result slower or hungrier than its baseline beyond threshold."""
+    found = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, floor in (('seconds', MIN_SECONDS_DELTA), ('peak_mb', MIN_PEAK_MB_DELTA)):
+            old, new = base.get(metric), res.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > floor:
+                found.append(f"{key}: {metric} {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return found
+
+
+def run_suite(sizes=DEFAULT_SIZES, case_names: Optional[List[str]] = None, repeats: int = 3,
+              master_rows: int = DEFAULT_MASTER_ROWS) -> Dict[str, dict]:
+    warnings.simplefilter('ignore')
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        template = _quiet(write_master, tmp / 'template.xlsx', master_rows)
+        cases = build_cases(template)
+        selected = [cases[n] for n in (case_names or cases)]
+        print(f"Master: {master_rows} rows; sizes {list(sizes)}; best of {repeats}\n")
+        print(f"{'stage':<30} {'size':>7} {'time':>9} {'rows/s':>11} {'peak':>9}")
+        for case in selected:
+            for size in sizes:
+                r = measure(case, size, repeats, tmp)
+                key = f'{case.name}@{size}'
+                results[key] = r
+                print(f"{case.name:<30} {size:>7} {r['seconds'] * 1000:>7.1f}ms {r['rows_per_s']:>11,.0f} "
+                      f"{r['peak_mb']:>7.1f}MB")
+    return results
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument('--cases', default=None, help='comma-separated stage names (default: all)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--master-rows', type=int, default=DEFAULT_MASTER_ROWS)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    cases = args.cases.split(',') if args.cases else None
+    results = run_suite(sizes, cases, args.repeats, args.master_rows)
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+    found = regressions(results, load_baseline(args.baseline), args.threshold)
+    if found:
+        print(f"\nREGRESSIONS (threshold {args.threshold:.0%}):")
+        for line in found:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Hudson Matrix Table transforms: vectorized vs row-wise engine.
+
+Loads the Matrix Table sheet of a Hudson .xlsm once, then times each transform
+with both engines and checks that the outputs are identical (values, dtypes, index).
+
+Usage:
+    python benchmark_transform.py [<hudson.xlsm>] [<repeats>]
+"""
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+import excel_processor as ep
+import excel_reader as xr
+import transform_columns as tc
+import transformer as tf
+from sheet_select import read_preferred_sheet
+
+DEFAULT_SOURCE = 'HudsonMatrixPrices08272025020701PM.xlsm'
+
+
+def _time(fn, repeats: int):
+    best = None
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(src: Path, repeats: int = 5) -> bool:
+    warnings.simplefilter('ignore')
+    name, matrix = read_preferred_sheet(src, 'matrix table')
+    if name is None:
+        return False
+    print(f"Source: {src.name} - sheet '{name}' with {len(matrix)} rows; best of {repeats}\n")
+
+    # transform_input_to_master_df reads its own input; hand it the already-loaded sheet
+    read_matrix = xr._read_matrix_table_only
+    xr._read_matrix_table_only = lambda _path: {name: matrix}
+    cases = [
+        ('hda_matrix_to_master_cols', lambda: ep.hda_matrix_to_master_cols(matrix)),
+        ('hda_matrix_to_base_cols_v2', lambda: ep.hda_matrix_to_base_cols_v2(matrix)),
+        ('transform_to_master_format', lambda: tf.transform_to_master_format(matrix)),
+        ('transform_input_to_master_df', lambda: xr.transform_input_to_master_df(src, start_id=1)),
+    ]
+
+    all_same = True
+    engine = tc.TRANSFORM_ENGINE
+    try:
+        print(f"{'transform':<30} {'rowwise':>10} {'vectorized':>11} {'speedup':>8}  output")
+        for label, fn in cases:
+            tc.TRANSFORM_ENGINE = 'rowwise'
+            t_row, df_row = _time(fn, repeats)
+            tc.TRANSFORM_ENGINE = 'vectorized'
+            t_vec, df_vec = _time(fn, repeats)
+            try:
+                pd.testing.assert_frame_equal(df_row, df_vec, check_exact=True)
+                same = df_row.to_csv() == df_vec.to_csv()
+            except AssertionError:
+                same = False
+            all_same &= same
+            print(f"{label:<30} {t_row * 1000:>8.1f}ms {t_vec * 1000:>9.1f}ms {t_row / t_vec:>7.1f}x  "
+                  f"{'identical' if same else 'DIFFERENT'} ({len(df_vec)} rows)")
+    finally:
+        tc.TRANSFORM_ENGINE = engine
+        xr._read_matrix_table_only = read_matrix
+    return all_same
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1]) if len(sys.argv) >= 2 else Path(DEFAULT_SOURCE)
+    n = int(sys.argv[2]) if len(sys.argv) >= 3 else 5
+    if not source.exists():
+        print(f"ERROR: Source file not found: {source}")
+        sys.exit(2)
+    sys.exit(0 if run_benchmark(source, n) else 1)
@@ -17,6 +17,8 @@ except Exception as e:
     print('openpyxl is not available:', e)
     sys.exit(11)
 
+from ercot_columns import add_derived_columns, mode_from_args, with_derived_columns
+
 TARGET_TERMS = {12, 24, 36, 48, 60}
 
 SRC_NAME = '2-copy-reformat/ERCOT-new.xlsx'
@@ -83,100 +85,12 @@ def filter_sheet(df):
     return filtered
 
 
-def add_formulas(path):
-    wb = load_workbook(path)
-    for ws in wb.worksheets:
-        max_row = ws.max_row
-        if max_row < 2:
-            continue
-        # Optional headers for new columns to help readability
-        headers = {
-            9: 'I (blank)',
-            10: 'J Index',
-            11: 'K Concat',
-            12: 'L ConstDate',
-            13: 'M =B',
-            14: 'N Region',
-            15: 'O LF Norm',
-            16: 'P Supplier',
-            17: 'Q TermMonths',
-            18: 'R (skip)',
-            19: 'S',
-            20: 'T',
-            21: 'U',
-            22: 'V',
-            23: 'W',
-            24: 'X',
-            25: 'Y',
-            26: 'Z',
-            27: 'AA',
-        }
-        for col_idx, name in headers.items():
-            ws.cell(row=1, column=col_idx, value=name)
-
-        for r in range(2, max_row + 1):
-            # J: index (J2 = 1; Jn = J(n-1)+1)
-            if r == 2:
-                ws.cell(row=r, column=10, value=1)
-            else:
-                ws.cell(row=r, column=10, value=f"=J{r-1}+1")
-
-            # K: CONCATENATE(C,D)
-            ws.cell(row=r, column=11, value=f"=CONCATENATE(C{r},D{r})")
-
-            # L: date constant
-            ws.cell(row=r, column=12, value=f"=DATE(2025,8,18)")
-
-            # M: =B
-            ws.cell(row=r, column=13, value=f"=A{r}")
-
-            # N: mapping by K
-            ws.cell(
-                row=r,
-                column=14,
-                value=(
-                    f"=IF(K{r}=\"CenterpointHouston LZ\",\"COAST\"," 
-                    f"IF(K{r}=\"OncorNorth LZ\",\"NORTH\"," 
-                    f"IF(K{r}=\"AEP TX CENTRALSouth LZ\",\"SOUTH\"," 
-                    f"IF(K{r}=\"AEP TX CentralWest LZ\",\"WEST\"," 
-                    f"IF(K{r}=\"TNMPHouston LZ\",\"TNMP\",\"NA\")))))"
-                ),
-            )
-
-            # O: load factor normalization
-            ws.cell(row=r, column=15, value=f"=IF(E{r}=\"LO\",\"LOW\",IF(E{r}=\"MED\",\"MED\",IF(E{r}=\"HI\",\"HIGH\",\"NA\")))")
-
-            # P: supplier when fixed price
-            ws.cell(row=r, column=16, value=f"=IF(G{r}=\"Fixed Price\",\"APG&E\",\"NA\")")
-
-            # Q: term months integer
-            ws.cell(row=r, column=17, value=f"=IF(F{r}=\"12 Months\",12,IF(F{r}=\"24 Months\",24,IF(F{r}=\"36 Months\",36,IF(F{r}=\"48 Months\",48,IF(F{r}=\"60 Months\",60,0)))))")
-
-            # R: skip for now (leave blank)
-            # ws.cell(row=r, column=18, value=None)
-
-            # S: constant 200
-            ws.cell(row=r, column=19, value="=200")
-
-            # T: =IF(N="",0,L*10)
-            ws.cell(row=r, column=20, value=f"=IF(N{r}=\"\",0,H{r}*10)")
-
-            # U: 0
-            ws.cell(row=r, column=21, value="=0")
-
-            # V: T+U
-            ws.cell(row=r, column=22, value=f"=T{r}+U{r}")
-
-            # W, X, Y, Z: 0
-            ws.cell(row=r, column=23, value="=0")
-            ws.cell(row=r, column=24, value="=0")
-            ws.cell(row=r, column=25, value="=0")
-            ws.cell(row=r, column=26, value="=0")
-
-            # AA: 10
-            ws.cell(row=r, column=27, value="=10")
-
-    wb.save(path)
+def add_formulas(path, mode=None):
+    """Write the derived columns J..AA (ercot_columns.py) on every sheet: plain values by
+    default, the legacy formulas with mode 'formulas', or formulas with cached values
+    with mode 'both'.
+    """
+    return add_derived_columns(path, mode)[0]
 
 
 def main():
@@ -200,7 +114,10 @@ def main():
         print('No sheets found')
         sys.exit(2)
 
-    # Write initial A-H
+    # --formulas: legacy formulas in J..AA; --formulas-too: formulas with cached values
+    mode = mode_from_args(sys.argv[1:])
+
+    # Write A-H, and in values mode the derived J..AA in the same pass
     with pd.ExcelWriter(root / DST_NAME, engine='openpyxl') as writer:
         for name, df in sheets.items():
             filtered = filter_sheet(df)
@@ -209,13 +126,16 @@ def main():
                 if col not in filtered.columns:
                     filtered[col] = pd.Series(dtype='object')
             filtered = filtered[BASE_COLS]
+            if mode == 'values':
+                filtered = with_derived_columns(filtered)
             filtered.to_excel(writer, sheet_name=str(name)[:31], index=False)
 
     # Add Excel formulas to columns J..AA (skipping R)
-    add_formulas(root / DST_NAME)
+    if mode != 'values':
+        add_formulas(root / DST_NAME, mode)
 
     print('SUCCESS')
-    print(f'Output written to {DST_NAME}')
+    print(f'Output written to {DST_NAME} (J..AA as {mode})')
 
 
 if __name__ == '__main__':
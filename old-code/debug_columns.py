@@ -13,8 +13,21 @@ def examine_master_table():
         print(f"Master table not found: {master_path}")
         return
     
+    # The Parquet mirror (if built and in sync) answers the same questions without reading the xlsx
+    print("=== PARQUET MIRROR ===")
+    try:
+        from master_mirror import MasterMirror, mirror_available
+        mirror = MasterMirror(master_path)
+        print(mirror)
+        if mirror.in_sync() and mirror_available():
+            df = mirror.read()
+            print(f"Columns in mirror: {list(df.columns)}")
+            print(df.tail())
+    except Exception as e:
+        print(f"Error reading mirror: {e}")
+
     # Read with pandas to see the column structure
-    print("=== PANDAS READ ===")
+    print("\n=== PANDAS READ ===")
     try:
         df = pd.read_excel(master_path)
         print(f"Columns found by pandas: {list(df.columns)}")
@@ -0,0 +1,192 @@
+"""
+Content-addressed cache for SharePoint downloads.
+
+Every download used to rename the previous local copy with a timestamp and fetch
+the whole file again, so new_files/ filled up with identical masters and Hudson
+workbooks. With the cache:
+- file bodies are stored once as blobs named by their SHA-256
+  (<cache>/blobs/ab/abcdef...)
+- index.json maps each remote item (site + folder/file) to its current blob and
+  the ETag Graph returned for it
+- the next download sends If-None-Match with that ETag; an unchanged file comes
+  back as 304 and is materialised from the blob without transferring the body
+- the local file is a copy of the blob (a reflink clone sharing its blocks where
+  the filesystem supports it), so saving the local workbook in place never touches
+  the cache; local.json records which local paths were materialised from which blob
+
+A blob whose size or mtime no longer matches what was recorded is treated as
+missing and downloaded again.
+
+DOWNLOAD_CACHE_DIR sets the location (default .download-cache); set it to an empty
+string to disable the cache.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no reflinks, materialize copies
+    fcntl = None
+
+INDEX_NAME = 'index.json'
+LOCAL_NAME = 'local.json'
+INDEX_VERSION = 1
+# ioctl(dest, FICLONE, src): copy-on-write clone on Btrfs, XFS and overlay filesystems
+FICLONE = 0x40049409
+
+
+def _clone(src: Path, dest: Path) -> None:
+    """Copy src to dest with its mtime, as a reflink clone where the filesystem supports it."""
+    if fcntl is not None and sys.platform.startswith('linux'):
+        try:
+            with open(src, 'rb') as s, open(dest, 'wb') as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            shutil.copystat(src, dest)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+
+
+class DownloadCache:
+    """Blob store + index of remote items under one directory."""
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'DownloadCache({self.root})'
+
+    # --- Index ---
+
+    def _read(self, name: str) -> Dict[str, dict]:
+        try:
+            data = json.loads((self.root / name).read_text())
+        except (OSError, ValueError):
+            return {}
+        return data.get('items', {}) if data.get('version') == INDEX_VERSION else {}
+
+    def _write(self, name: str, items: Dict[str, dict]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f'.{name}.tmp'
+        tmp.write_text(json.dumps({'version': INDEX_VERSION, 'items': items}, indent=1))
+        os.replace(tmp, self.root / name)
+
+    def _read_index(self) -> Dict[str, dict]:
+        return self._read(INDEX_NAME)
+
+    def _write_index(self, items: Dict[str, dict]) -> None:
+        self._write(INDEX_NAME, items)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / 'blobs' / sha256[:2] / sha256
+
+    def temp_path(self, name: str) -> Path:
+        """A temp file location on the same filesystem as the blobs."""
+        (self.root / 'tmp').mkdir(parents=True, exist_ok=True)
+        return self.root / 'tmp' / f'{os.getpid()}-{threading.get_ident()}-{name}.part'
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Index entry for key if its blob is still intact, else None."""
+        with self._lock:
+            entry = self._read_index().get(key)
+        if entry is None:
+            return None
+        try:
+            st = self.blob_path(entry['sha256']).stat()
+        except OSError:
+            return None
+        if st.st_size != entry['size'] or st.st_mtime_ns != entry['mtime_ns']:
+            return None
+        return entry
+
+    def store(self, key: str, tmp: Path, sha256: str, etag: Optional[str]) -> dict:
+        """Move a fully downloaded temp file into the blob store and point key at it."""
+        blob = self.blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            items = self._read_index()
+            if self._intact(blob, sha256, items):
+                tmp.unlink()
+            else:
+                # New content, or a damaged blob: take the fresh file
+                os.replace(tmp, blob)
+            st = blob.stat()
+            entry = {'sha256': sha256, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'etag': etag, 'stored': time.time()}
+            items[key] = entry
+            self._write_index(items)
+        return entry
+
+    @staticmethod
+    def _intact(blob: Path, sha256: str, items: Dict[str, dict]) -> bool:
+        try:
+            st = blob.stat()
+        except OSError:
+            return False
+        return any(e['sha256'] == sha256 and (e['size'], e['mtime_ns']) == (st.st_size, st.st_mtime_ns)
+                   for e in items.values())
+
+    def materialize(self, entry: dict, dest: Path | str) -> Path:
+        """Copy the blob of entry to dest (never a hard link: dest may be saved in place)
+        and record dest as materialised from it.
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        blob = self.blob_path(entry['sha256'])
+        tmp = dest.with_name(f'.{dest.name}.part')
+        tmp.unlink(missing_ok=True)
+        _clone(blob, tmp)
+        os.replace(tmp, dest)
+        st = dest.stat()
+        with self._lock:
+            local = self._read(LOCAL_NAME)
+            local[str(dest.resolve())] = {'sha256': entry['sha256'], 'size': st.st_size,
+                                          'mtime_ns': st.st_mtime_ns}
+            self._write(LOCAL_NAME, local)
+        return dest
+
+    def holds(self, path: Path | str) -> bool:
+        """True if path is an unmodified copy that materialize() put there, of a blob
+        the cache still has.
+        """
+        path = Path(path)
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        with self._lock:
+            placed = self._read(LOCAL_NAME).get(str(path.resolve()))
+            live = {e['sha256'] for e in self._read_index().values()}
+        # Copies keep the blob's mtime; an in-place save changes it
+        return (placed is not None and placed['sha256'] in live and self.blob_path(placed['sha256']).exists()
+                and (placed['size'], placed['mtime_ns']) == (st.st_size, st.st_mtime_ns))
+
+    def gc(self) -> int:
+        """Delete blobs that no index entry (and no hard link from older caches) refers to.
+        Returns the count.
+        """
+        with self._lock:
+            live = {entry['sha256'] for entry in self._read_index().values()}
+            removed = 0
+            for blob in (self.root / 'blobs').glob('*/*'):
+                if blob.name not in live and blob.stat().st_nlink <= 1:
+                    blob.unlink()
+                    removed += 1
+        return removed
+
+
+def default_cache() -> Optional[DownloadCache]:
+    """The cache configured by DOWNLOAD_CACHE_DIR, or None when it is disabled."""
+    root = os.getenv("DOWNLOAD_CACHE_DIR", ".download-cache")
+    return DownloadCache(root) if root else None
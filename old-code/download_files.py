@@ -3,36 +3,63 @@
 Download SharePoint files script + chain transform/append/upload.
 
 - Downloads the master table file "DAILY PRICING - new.xlsx" and the Hudson input file
-  "HudsonMatrixPrices08272025020701PM.xlsm" from SharePoint into the new_files directory.
+  "HudsonMatrixPrices08272025020701PM.xlsm" from SharePoint into the new_files directory,
+  concurrently on a small thread pool (DOWNLOAD_WORKERS, default 4).
 - Transforms the Hudson input into the 17-col master schema and writes an updated master copy
   (master-file-updated.xlsx) in new_files WITHOUT modifying the downloaded master file.
 - Uploads master-file-updated.xlsx back to SharePoint (default folder: /Kilowatt/Client Pricing Sheets).
+- Writes per-stage timings (download, read, transform, append, save, upload) of every run,
+  or of every --watch batch, to new_files/runs/ (run_metrics.py).
+- With --watch, polls SHAREPOINT_UPLOAD_FOLDER with Graph delta queries (graph_delta.py) and
+  runs the same transform/append/upload on every new or changed supplier file. The delta token
+  is kept in WATCH_STATE (default .sharepoint-delta.json) between runs.
 
 Usage:
-    python download_files.py
+    python download_files.py [input_file]
+    python download_files.py --watch [--interval SECONDS] [--once] [--all]
 """
 
+import argparse
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
 try:
-    import requests
     from dotenv import load_dotenv
-    from graph_auth import acquire_graph_token
-    import pandas as pd
-    import excel_reader as xr
-    from excel_processor import write_updated_master_copy
+    from download_cache import default_cache
+    from graph_delta import WATCH_INTERVAL, DeltaWatcher
+    from lazy_imports import lazy_attr, lazy_module
+    from run_metrics import run_report
 except ImportError as e:
     print('DEPENDENCY_ERROR: Required libraries are not installed.')
     print('Please install: pip install requests python-dotenv msal pandas openpyxl')
     print(e)
     sys.exit(1)
 
+# The Graph client (requests, msal) and the transform/append stack (pandas, openpyxl)
+# are imported on first use, not for --help or a watch poll that finds nothing
+pd = lazy_module('pandas')
+xr = lazy_module('excel_reader')
+default_client = lazy_attr('graph_client', 'default_client')
+write_updated_master_copy = lazy_attr('excel_processor', 'write_updated_master_copy')
+
 # Load environment variables
 load_dotenv()
 
+# Concurrent downloads in the download stage
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+
+MASTER_FILENAME_REMOTE = "DAILY PRICING - new.xlsx"
+MASTER_FOLDER = "/Kilowatt/Client Pricing Sheets"
+UPDATED_MASTER_FILENAME = "master-file-updated.xlsx"
+DEFAULT_INPUT_FILENAME = "HudsonMatrixPrices08272025020701PM.xlsm"
+
+# Delta token and processed items of the --watch mode
+WATCH_STATE = Path(os.getenv("WATCH_STATE", ".sharepoint-delta.json"))
+
 
 def download_sharepoint_file(file_name: str, download_path: Path, sharepoint_folder_override: str = None) -> bool:
     """Download a file from SharePoint using Microsoft Graph API.
@@ -60,60 +87,8 @@ def download_sharepoint_file(file_name: str, download_path: Path, sharepoint_fol
 
     try:
         print(f"Downloading {file_name} from SharePoint...")
-
-        # Acquire access token
-        token = acquire_graph_token(tenant_id, client_id, client_secret)
-        headers = {"Authorization": f"Bearer {token['access_token']}"}
-
-        # Get the site ID
-        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_hostname}:/sites/{site_path}"
-        site_response = requests.get(site_url, headers=headers)
-
-        if site_response.status_code != 200:
-            print(f"Failed to get site info. Status: {site_response.status_code}")
-            print(f"Response: {site_response.text}")
-            return False
-
-        site_data = site_response.json()
-        site_id = site_data['id']
-        print(f"Found SharePoint site ID: {site_id}")
-
-        # Get the default drive (document library)
-        drive_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
-        drive_response = requests.get(drive_url, headers=headers)
-
-        if drive_response.status_code != 200:
-            print(f"Failed to get drive info. Status: {drive_response.status_code}")
-            print(f"Response: {drive_response.text}")
-            return False
-
-        drive_data = drive_response.json()
-        drive_id = drive_data['id']
-        print(f"Found drive ID: {drive_id}")
-
-        # Construct the file path and download URL
-        file_path = f"{sharepoint_folder}/{file_name}".replace('//', '/')
-        if file_path.startswith('/'):
-            file_path = file_path[1:]  # Remove leading slash
-
-        file_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{file_path}:/content"
-        print(f"Downloading from: {file_url}")
-
-        # Download the file
-        response = requests.get(file_url, headers=headers)
-
-        if response.status_code == 200:
-            # Ensure directory exists
-            download_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with open(download_path, "wb") as local_file:
-                local_file.write(response.content)
-            print(f"Successfully downloaded: {download_path}")
-            return True
-        else:
-            print(f"Failed to download file. Status: {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
+        # Token, site ID and drive ID are resolved once per process by the shared client
+        return default_client().download(file_name, download_path, sharepoint_folder) is not None
 
     except Exception as e:
         print(f"Error during SharePoint download: {str(e)}")
@@ -142,48 +117,21 @@ def upload_sharepoint_file(local_path: Path, remote_name: str, sharepoint_folder
 
     try:
         print(f"Uploading {local_path} to SharePoint folder: {sharepoint_folder} as {remote_name} ...")
-        token = acquire_graph_token(tenant_id, client_id, client_secret)
-        headers = {"Authorization": f"Bearer {token['access_token']}", "Content-Type": "application/octet-stream"}
-
-        # Resolve site/drive
-        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_hostname}:/sites/{site_path}"
-        site_response = requests.get(site_url, headers=headers)
-        if site_response.status_code != 200:
-            print(f"Failed to get site info. Status: {site_response.status_code}")
-            print(f"Response: {site_response.text}")
-            return False
-        site_id = site_response.json()['id']
-
-        drive_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
-        drive_response = requests.get(drive_url, headers=headers)
-        if drive_response.status_code != 200:
-            print(f"Failed to get drive info. Status: {drive_response.status_code}")
-            print(f"Response: {drive_response.text}")
-            return False
-        drive_id = drive_response.json()['id']
-
-        # Build upload path and PUT
-        remote_path = f"{sharepoint_folder}/{remote_name}".replace('//','/')
-        if remote_path.startswith('/'):
-            remote_path = remote_path[1:]
-        upload_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{remote_path}:/content"
-
-        with open(local_path, 'rb') as f:
-            data = f.read()
-        resp = requests.put(upload_url, headers=headers, data=data)
-        if resp.status_code in (200, 201):
-            print(f"Successfully uploaded to: {remote_path}")
-            return True
-        else:
-            print(f"Failed to upload. Status: {resp.status_code}\n{resp.text}")
-            return False
+        return default_client().upload(local_path, remote_name, sharepoint_folder)
     except Exception as e:
         print(f"Error during SharePoint upload: {e}")
         return False
 
 
 def rename_existing_file(file_path: Path) -> None:
-    """Rename existing file by appending timestamp if it exists."""
+    """Rename existing file by appending timestamp if it exists.
+    A file that is just a copy from the download cache is left to be replaced: its
+    content is kept in the cache, so a timestamped copy would only duplicate it.
+    """
+    cache = default_cache()
+    if file_path.exists() and cache is not None and cache.holds(file_path):
+        print(f"Existing file is kept in the download cache; replacing: {file_path}")
+        return
     if file_path.exists():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         renamed_path = file_path.with_name(f"{file_path.stem}_{timestamp}{file_path.suffix}")
@@ -191,69 +139,60 @@ def rename_existing_file(file_path: Path) -> None:
         print(f"Existing file renamed to: {renamed_path}")
 
 
-def main():
-    """Main function to download both files from SharePoint and chain transform/append/upload."""
-    # Define target directory
-    new_files_dir = Path("new_files")
-
-    # Define files to download
-    master_filename_remote = "DAILY PRICING - new.xlsx"
-    hudson_filename_remote = "HudsonMatrixPrices08272025020701PM.xlsm"
-
-    files_to_download = [
-        {
-            "name": master_filename_remote,
-            "local_name": master_filename_remote,
-            "folder_override": "/Kilowatt/Client Pricing Sheets"  # Master table location
-        },
-        {
-            "name": hudson_filename_remote,
-            "local_name": hudson_filename_remote,
-            "folder_override": None  # Use default SHAREPOINT_UPLOAD_FOLDER
-        }
-    ]
-
-    print(f"Starting download process to: {new_files_dir.absolute()}")
-    print("=" * 60)
-
-    success_count = 0
-
-    for file_info in files_to_download:
-        file_name = file_info["name"]
-        local_name = file_info["local_name"]
-        folder_override = file_info["folder_override"]
-
-        # Define local path
-        local_path = new_files_dir / local_name
-
-        # Rename existing file if present
+def _download_one(file_info: dict, new_files_dir: Path) -> dict:
+    """Rename any previous copy, then download one file. Returns its result record."""
+    file_name = file_info["name"]
+    local_path = new_files_dir / file_info["local_name"]
+    t0 = time.perf_counter()
+    try:
         rename_existing_file(local_path)
+        ok = download_sharepoint_file(file_name, local_path, file_info["folder_override"])
+        error = None if ok else "download failed"
+    except Exception as e:
+        ok, error = False, str(e)
+    return {"name": file_name, "path": local_path, "ok": bool(ok),
+            "seconds": time.perf_counter() - t0, "error": error}
 
-        # Download the file
-        print(f"\nDownloading: {file_name}")
-        if download_sharepoint_file(file_name, local_path, folder_override):
-            success_count += 1
-            print(f"✓ Successfully downloaded: {local_path}")
-        else:
-            print(f"✗ Failed to download: {file_name}")
 
-        print("-" * 40)
+def download_all(files_to_download: list, new_files_dir: Path, max_workers: int = DOWNLOAD_WORKERS) -> list:
+    """Download every listed file concurrently on a bounded thread pool.
 
-    print(f"\nDownload Summary:")
-    print(f"Successfully downloaded: {success_count}/{len(files_to_download)} files")
-    print(f"Files saved to: {new_files_dir.absolute()}")
+    Downloads are network bound, so wall time is roughly the slowest file rather than
+    the sum. Returns one result dict per file (name, path, ok, seconds, error) in the
+    order of files_to_download.
+    """
+    workers = max(1, min(max_workers, len(files_to_download)))
+    print(f"Downloading {len(files_to_download)} files with {workers} worker(s)...")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_download_one, info, new_files_dir) for info in files_to_download]
+        results = []
+        for future in futures:
+            r = future.result()
+            status = "✓ Successfully downloaded" if r["ok"] else "✗ Failed to download"
+            print(f"{status}: {r['name']} in {r['seconds']:.2f}s")
+            results.append(r)
+    print(f"Download stage finished in {time.perf_counter() - t0:.2f}s")
+    return results
+
+
+def print_graph_stats() -> None:
+    """Print the shared client's transport counters (retries, throttled time)."""
+    try:
+        print(f"Graph: {default_client().transport.summary()}")
+    except Exception:
+        pass
 
-    if success_count != len(files_to_download):
-        print("Some downloads failed. Check the output above for details.")
-        return 1
 
-    # Chain: transform Hudson and write updated master copy (non-destructive)
-    master_local_path = new_files_dir / master_filename_remote
-    hudson_local_path = new_files_dir / hudson_filename_remote
+def process_inputs(input_paths: list, master_local_path: Path, new_files_dir: Path) -> int:
+    """Transform the supplier input files, write one updated master copy and upload it.
 
-    print("\nStarting transformation of Hudson input...")
+    Returns 0 on success, 2/3/4 when the transform/write/upload step failed.
+    """
+    print(f"\nStarting transformation of {len(input_paths)} input file(s)...")
     try:
-        df_master = xr.transform_input_to_master_df(hudson_local_path, master_path=master_local_path)
+        frames = [xr.transform_input_to_master_df(p, master_path=master_local_path) for p in input_paths]
+        df_master = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
         print(f"Transformed DataFrame shape: {df_master.shape}")
     except Exception as e:
         print("ERROR during transform_input_to_master_df:", e)
@@ -264,8 +203,8 @@ def main():
         out_path = write_updated_master_copy(
             df_master,
             master_dir=new_files_dir,
-            master_filename=master_filename_remote,
-            out_filename='master-file-updated.xlsx'
+            master_filename=master_local_path.name,
+            out_filename=UPDATED_MASTER_FILENAME
         )
         print(f"Updated master copy written to: {out_path}")
     except Exception as e:
@@ -273,10 +212,10 @@ def main():
         return 3
 
     # Upload the updated master copy back to SharePoint (default to parent folder)
-    upload_folder = os.getenv('MASTER_UPLOAD_FOLDER', '/Kilowatt/Client Pricing Sheets')
+    upload_folder = os.getenv('MASTER_UPLOAD_FOLDER', MASTER_FOLDER)
     print(f"\nUploading updated master to SharePoint folder: {upload_folder}")
     try:
-        uploaded = upload_sharepoint_file(Path(out_path), 'master-file-updated.xlsx', sharepoint_folder_override=upload_folder)
+        uploaded = upload_sharepoint_file(Path(out_path), UPDATED_MASTER_FILENAME, sharepoint_folder_override=upload_folder)
         if uploaded:
             print("Upload completed successfully.")
         else:
@@ -285,7 +224,115 @@ def main():
     except Exception as e:
         print("ERROR during upload:", e)
         return 4
+    return 0
+
+
+def watch(new_files_dir: Path, interval: float = WATCH_INTERVAL, once: bool = False,
+          process_existing: bool = False) -> int:
+    """Poll SHAREPOINT_UPLOAD_FOLDER with Graph delta queries and run the pipeline on new files.
+
+    Every batch of new or changed supplier files is transformed against a fresh copy
+    of the master (a 304 from the download cache when it has not changed) and
+    uploaded as one updated master.
+    """
+    folder = os.getenv("SHAREPOINT_UPLOAD_FOLDER")
+    if not folder:
+        print("ERROR: SHAREPOINT_UPLOAD_FOLDER is not set.")
+        return 1
+    watcher = DeltaWatcher(default_client(), folder, WATCH_STATE, download_dir=new_files_dir,
+                           ignore=(MASTER_FILENAME_REMOTE, UPDATED_MASTER_FILENAME),
+                           process_existing=process_existing)
+
+    def handle(paths: list) -> bool:
+        master = _download_one({"name": MASTER_FILENAME_REMOTE, "local_name": MASTER_FILENAME_REMOTE,
+                                "folder_override": MASTER_FOLDER}, new_files_dir)
+        if not master["ok"]:
+            print(f"Could not download the master: {master['error']}")
+            return False
+        return process_inputs(paths, master["path"], new_files_dir) == 0
+
+    def handle_with_report(paths: list) -> bool:
+        with run_report('watch', new_files_dir) as report:
+            ok = handle(paths)
+            if not ok:
+                report.error = 'batch failed'
+        return ok
+
+    watcher.run(handle_with_report, interval, max_polls=1 if once else None)
+    return 0
+
+
+def main(argv: list = None):
+    """Main function to download both files from SharePoint and chain transform/append/upload."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("input_file", nargs="?", default=os.getenv("HUDSON_FILE", DEFAULT_INPUT_FILENAME),
+                        help="supplier file in SHAREPOINT_UPLOAD_FOLDER (default: HUDSON_FILE)")
+    parser.add_argument("--watch", action="store_true", help="poll the upload folder for new/changed files")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="with --watch: poll once and exit")
+    parser.add_argument("--all", action="store_true",
+                        help="with --watch and no saved state: process files already in the folder")
+    args = parser.parse_args(argv)
+
+    # Define target directory
+    new_files_dir = Path("new_files")
+    if args.watch:
+        return watch(new_files_dir, args.interval, args.once, args.all)
+
+    with run_report('download_files', new_files_dir) as report:
+        code = run_once(args.input_file, new_files_dir)
+        if code:
+            report.error = f'exit {code}'
+    return code
+
+
+def run_once(input_file: str, new_files_dir: Path) -> int:
+    """Download the master and input_file, transform, write the updated copy and upload it."""
+    # Define files to download
+    master_filename_remote = MASTER_FILENAME_REMOTE
+    hudson_filename_remote = input_file
+
+    files_to_download = [
+        {
+            "name": master_filename_remote,
+            "local_name": master_filename_remote,
+            "folder_override": MASTER_FOLDER  # Master table location
+        },
+        {
+            "name": hudson_filename_remote,
+            "local_name": hudson_filename_remote,
+            "folder_override": None  # Use default SHAREPOINT_UPLOAD_FOLDER
+        }
+    ]
+
+    print(f"Starting download process to: {new_files_dir.absolute()}")
+    print("=" * 60)
+
+    results = download_all(files_to_download, new_files_dir)
+    success_count = sum(1 for r in results if r["ok"])
+
+    print(f"\nDownload Summary:")
+    for r in results:
+        status = "✓" if r["ok"] else "✗"
+        detail = f" ({r['error']})" if r.get("error") else ""
+        print(f"  {status} {r['name']}: {r['seconds']:.2f}s{detail}")
+    print(f"Successfully downloaded: {success_count}/{len(files_to_download)} files")
+    print(f"Files saved to: {new_files_dir.absolute()}")
+    print_graph_stats()
+
+    if success_count != len(files_to_download):
+        failed = [r["name"] for r in results if not r["ok"]]
+        print(f"Some downloads failed: {', '.join(failed)}. Check the output above for details.")
+        return 1
+
+    # Chain: transform Hudson and write updated master copy (non-destructive)
+    master_local_path = new_files_dir / master_filename_remote
+    hudson_local_path = new_files_dir / hudson_filename_remote
+    code = process_inputs([hudson_local_path], master_local_path, new_files_dir)
+    if code:
+        return code
 
+    print_graph_stats()
     print("\nAll steps completed successfully.")
     return 0
 
@@ -0,0 +1,350 @@
+"""
+Derived ERCOT columns J..AA, written as plain values instead of Excel formulas.
+
+add_formulas (build_ercot_product_term_formulas.py, filtration.py and the legacy
+default path of excel_processor.py) wrote a formula into every cell of J..AA:
+row index, CONCATENATE(C,D), a region from nested IFs over it, load factor and
+term normalisation, supplier, T=H*10 and constants. Excel then had to
+recalculate all of it on open, and readers using data_only=True (pandas
+included) got None, because openpyxl stores no cached values.
+
+derived_frame() computes the same columns over whole pandas Series, with the
+formulas' Excel semantics:
+- text comparisons are case-insensitive, and a number never equals text
+- a blank cell reads as "" in CONCATENATE and comparisons, and as 0 in =A and
+  in arithmetic
+- a non-numeric H gives #VALUE! in T and V; the value is then left empty
+- J is the row's position (row - 1), which the J2=1, Jn=J(n-1)+1 chain evaluates to
+
+ERCOT_DERIVED_COLUMNS selects what is written:
+- 'values'   - plain values (default)
+- 'formulas' - the legacy formulas only
+- 'both'     - the formulas, with the computed values stored as their cached
+               results; auditable in Excel, readable with data_only=True
+
+The ERCOT sheets hold the source columns in A..H. The legacy master table of
+excel_processor.py has the sequence ID in A and the same columns in B..I; pass
+first_col=2 there, so the values (and the formulas' A..H references) are taken
+from B..I while the derived columns stay in J..AA.
+"""
+from __future__ import annotations
+
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, to_excel
+
+from xlsx_stream import CHUNK_SIZE, ZIP64_LIMIT, clone_zipinfo, copy_member, workbook_sheets, workbook_uses_1904
+
+DERIVED_COLUMNS_MODE = os.getenv("ERCOT_DERIVED_COLUMNS", "values")
+MODES = ('values', 'formulas', 'both')
+
+# Column headers of I..AA (1-based column index -> header)
+HEADERS: Dict[int, str] = {
+    9: 'I (blank)', 10: 'J Index', 11: 'K Concat', 12: 'L ConstDate',
+    13: 'M =B', 14: 'N Region', 15: 'O LF Norm', 16: 'P Supplier',
+    17: 'Q TermMonths', 18: 'R (skip)', 19: 'S', 20: 'T',
+    21: 'U', 22: 'V', 23: 'W', 24: 'X', 25: 'Y', 26: 'Z', 27: 'AA',
+}
+# Columns that get a value or formula (I and R stay blank)
+DERIVED_COLS = [c for c in HEADERS if c not in (9, 18)]
+
+CONST_DATE = date(2025, 8, 18)
+# openpyxl's formats for datetime and date cells, indexed by `is date`
+_DATE_FORMATS = ('yyyy-mm-dd h:mm:ss', 'yyyy-mm-dd')
+REGIONS = {
+    'CenterpointHouston LZ': 'COAST',
+    'OncorNorth LZ': 'NORTH',
+    'AEP TX CENTRALSouth LZ': 'SOUTH',
+    'AEP TX CentralWest LZ': 'WEST',
+    'TNMPHouston LZ': 'TNMP',
+}
+LOAD_FACTORS = {'LO': 'LOW', 'MED': 'MED', 'HI': 'HIGH'}
+TERM_MONTHS = {'12 Months': 12, '24 Months': 24, '36 Months': 36, '48 Months': 48, '60 Months': 60}
+SUPPLIER_PRODUCT, SUPPLIER = 'Fixed Price', 'APG&E'
+
+
+def mode_from_args(argv: list) -> str:
+    """--formulas / --formulas-too on the command line, else ERCOT_DERIVED_COLUMNS."""
+    if '--formulas-too' in argv:
+        return 'both'
+    if '--formulas' in argv:
+        return 'formulas'
+    return check_mode(None)
+
+
+def check_mode(mode: Optional[str]) -> str:
+    mode = mode or DERIVED_COLUMNS_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown ERCOT derived column mode {mode!r} (expected one of {', '.join(MODES)})")
+    return mode
+
+
+# --- Formulas ---
+
+def check_first_col(first_col: int) -> int:
+    """The source columns must end before J, where the derived columns start."""
+    if not 1 <= first_col <= 2:
+        raise ValueError(f"Source columns must start in A or B, not column {first_col}")
+    return first_col
+
+
+def row_formulas(r: int, first_col: int = 1) -> Dict[int, object]:
+    """The legacy formulas of row r, by column index, with the source columns A..H
+    starting at sheet column first_col.
+    """
+    a, c, d, e, f, g, h = (get_column_letter(check_first_col(first_col) + i) for i in (0, 2, 3, 4, 5, 6, 7))
+    return {
+        10: 1 if r == 2 else f"=J{r-1}+1",
+        11: f"=CONCATENATE({c}{r},{d}{r})",
+        12: f"=DATE({CONST_DATE.year},{CONST_DATE.month},{CONST_DATE.day})",
+        13: f"={a}{r}",
+        14: "=" + "".join(f'IF(K{r}="{k}","{v}",' for k, v in REGIONS.items()) + '"NA"' + ")" * len(REGIONS),
+        15: "=" + "".join(f'IF({e}{r}="{k}","{v}",' for k, v in LOAD_FACTORS.items()) + '"NA"' + ")" * len(LOAD_FACTORS),
+        16: f'=IF({g}{r}="{SUPPLIER_PRODUCT}","{SUPPLIER}","NA")',
+        17: "=" + "".join(f'IF({f}{r}="{k}",{v},' for k, v in TERM_MONTHS.items()) + "0" + ")" * len(TERM_MONTHS),
+        19: "=200",
+        20: f'=IF(N{r}="",0,{h}{r}*10)',
+        21: "=0",
+        22: f"=T{r}+U{r}",
+        23: "=0", 24: "=0", 25: "=0", 26: "=0",
+        27: "=10",
+    }
+
+
+# --- Values ---
+
+def _excel_text(v) -> str:
+    """A cell value as CONCATENATE sees it."""
+    if v is None or (isinstance(v, float) and v != v) or v is pd.NaT:
+        return ''
+    if isinstance(v, (bool, np.bool_)):
+        return 'TRUE' if v else 'FALSE'
+    if isinstance(v, (float, np.floating)) and float(v).is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _excel_texts(s: pd.Series) -> np.ndarray:
+    """_excel_text of every cell, converting each distinct value once."""
+    codes, uniques = pd.factorize(s.astype(object), use_na_sentinel=True)
+    texts = np.array([_excel_text(u) for u in uniques] + [''], dtype=object)
+    return texts[codes]
+
+
+def _text_key(s: pd.Series) -> pd.Series:
+    """Case-folded text for Excel's case-insensitive '='; non-text cells become None (never equal)."""
+    values = s.to_numpy(dtype=object)
+    is_text = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    return pd.Series(np.where(is_text, s.astype(str).str.lower().to_numpy(dtype=object), None),
+                     index=s.index, dtype=object)
+
+
+def _lookup(s: pd.Series, mapping: Dict[str, object], default) -> pd.Series:
+    keyed = {k.lower(): v for k, v in mapping.items()}
+    return _text_key(s).map(keyed).where(lambda x: x.notna(), default)
+
+
+def _blank_is_zero(s: pd.Series) -> pd.Series:
+    """What =A2 shows: the value, or 0 for a blank cell."""
+    return s.astype(object).where(s.notna(), 0)
+
+
+def derived_frame(base: pd.DataFrame, first_row: int = 2) -> pd.DataFrame:
+    """Values of J..AA (columns keyed by 1-based index, I and R left out) for the rows of
+    base, whose first eight columns are the sheet's A..H in order and whose first row is
+    sheet row first_row.
+    """
+    base = base.iloc[:, :8]
+    a, _, c, d, e, f, g, h = (base.iloc[:, i] for i in range(8))
+    n = len(base)
+
+    concat = pd.Series(_excel_texts(c) + _excel_texts(d), index=base.index, dtype=object)
+    numeric_h = pd.to_numeric(h, errors='coerce')
+    # A blank H multiplies as 0; text that is not a number is #VALUE! and stays empty
+    t = numeric_h.where(numeric_h.notna() | h.notna(), 0.0) * 10
+
+    out = pd.DataFrame(index=base.index)
+    out[10] = np.arange(first_row - 1, first_row - 1 + n, dtype=np.int64)
+    out[11] = concat
+    out[12] = [CONST_DATE] * n
+    out[13] = _blank_is_zero(a)
+    out[14] = _lookup(concat, REGIONS, 'NA')
+    out[15] = _lookup(e, LOAD_FACTORS, 'NA')
+    out[16] = _lookup(g, {SUPPLIER_PRODUCT: SUPPLIER}, 'NA')
+    out[17] = _lookup(f, TERM_MONTHS, 0).astype(np.int64)
+    out[19] = 200
+    out[20] = t
+    out[21] = 0
+    out[22] = t
+    for col in (23, 24, 25, 26):
+        out[col] = 0
+    out[27] = 10
+    return out
+
+
+def with_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """df (A..H) followed by the I..AA columns with their headers, as values, ready to
+    write in one pass (no second load/save of the workbook).
+    """
+    derived = derived_frame(df).rename(columns=HEADERS)
+    out = pd.concat([df.iloc[:, :8].reset_index(drop=True), derived.reset_index(drop=True)], axis=1)
+    out.insert(8, HEADERS[9], None)
+    out.insert(17, HEADERS[18], None)
+    return out
+
+
+# --- Writing ---
+
+def _sheet_base(ws, first_row: int, last_row: int, first_col: int = 1) -> pd.DataFrame:
+    rows = ws.iter_rows(min_row=first_row, max_row=last_row, min_col=first_col, max_col=first_col + 7,
+                        values_only=True)
+    return pd.DataFrame(list(rows), columns=list('ABCDEFGH'))
+
+
+def write_derived_columns(ws, first_row: int, last_row: int, mode: Optional[str] = None,
+                          headers: bool = True, first_col: int = 1) -> Optional[pd.DataFrame]:
+    """Write J..AA for rows first_row..last_row of an openpyxl worksheet, from the
+    source columns A..H starting at sheet column first_col. Returns the computed
+    values in 'both' mode (for fill_cached_values after saving), else None.
+    """
+    mode = check_mode(mode)
+    check_first_col(first_col)
+    if last_row < first_row:
+        return None
+    if headers:
+        for col_idx, name in HEADERS.items():
+            # 'I (blank)' is a source column when they start in B
+            if col_idx >= first_col + 8:
+                ws.cell(row=1, column=col_idx, value=name)
+    first_row = max(first_row, 2)
+    if last_row < first_row:
+        return None
+
+    values = None
+    if mode in ('values', 'both'):
+        values = derived_frame(_sheet_base(ws, first_row, last_row, first_col), first_row)
+    if mode == 'values':
+        for r, row in enumerate(values.itertuples(index=False, name=None), start=first_row):
+            for col_idx, v in zip(DERIVED_COLS, row):
+                if v == v:
+                    ws.cell(row=r, column=col_idx, value=v)
+        return None
+    for r in range(first_row, last_row + 1):
+        for col_idx, formula in row_formulas(r, first_col).items():
+            ws.cell(row=r, column=col_idx, value=formula)
+    if values is not None:
+        values.index = range(first_row, last_row + 1)
+        # Cached dates are serials; format L and M as values mode would so they read back as dates
+        for col_idx in (12, 13):
+            for r, v in values[col_idx].items():
+                if isinstance(v, (date, datetime)):
+                    ws.cell(row=r, column=col_idx).number_format = _DATE_FORMATS[type(v) is date]
+    return values
+
+
+# --- Cached values for formula cells ---
+
+_FORMULA_CELL_RE = re.compile(rb'<c r="([A-Z]{1,3})(\d+)"([^>]*)><f>([^<]*)</f>(?:<v\s*/>|<v></v>)?</c>')
+_T_ATTR_RE = re.compile(rb'\s+t="[^"]*"')
+
+
+def _col_index(letters: bytes) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ch - 64
+    return n
+
+
+def _cached_cell(m: re.Match, values: pd.DataFrame, epoch) -> bytes:
+    col, row = _col_index(m.group(1)), int(m.group(2))
+    if col not in values.columns or row not in values.index:
+        return m.group(0)
+    v = values.at[row, col]
+    head = b'<c r="' + m.group(1) + m.group(2) + b'"' + _T_ATTR_RE.sub(b'', m.group(3))
+    formula = b'<f>' + m.group(4) + b'</f>'
+    if v is None or (isinstance(v, float) and v != v):
+        return m.group(0)
+    if isinstance(v, str):
+        return head + b' t="str">' + formula + b'<v>' + escape(v).encode('utf-8') + b'</v></c>'
+    if isinstance(v, (bool, np.bool_)):
+        return head + b' t="b">' + formula + b'<v>' + (b'1' if v else b'0') + b'</v></c>'
+    if isinstance(v, (datetime, date)):
+        v = to_excel(v, epoch)
+    if isinstance(v, (int, np.integer)):
+        text = str(int(v))
+    elif isinstance(v, (float, np.floating)):
+        text = '%.16g' % float(v)
+    else:
+        return m.group(0)
+    return head + b'>' + formula + b'<v>' + text.encode('ascii') + b'</v></c>'
+
+
+def _fill_sheet(src, dst, values: pd.DataFrame, epoch) -> None:
+    buf = b''
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        buf += chunk
+        if chunk:
+            cut = buf.rfind(b'</row>')
+            if cut == -1:
+                continue
+            block, buf = buf[:cut + 6], buf[cut + 6:]
+        else:
+            block, buf = buf, b''
+        dst.write(_FORMULA_CELL_RE.sub(lambda m: _cached_cell(m, values, epoch), block))
+        if not chunk:
+            break
+
+
+def fill_cached_values(path: Path | str, cached: Dict[str, pd.DataFrame]) -> None:
+    """Store computed values as the cached results of the J..AA formula cells of the
+    named sheets (values indexed by sheet row, columns by index), rewriting the saved
+    workbook in one streamed pass.
+    """
+    path = Path(path)
+    tmp = path.with_name(f'.{path.name}.cached.tmp')
+    with zipfile.ZipFile(path) as zin:
+        parts = {sh['path']: cached[sh['name']] for sh in workbook_sheets(zin) if sh['name'] in cached}
+        epoch = MAC_EPOCH if workbook_uses_1904(zin) else WINDOWS_EPOCH
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                if info.filename not in parts:
+                    copy_member(zin, info, zout)
+                    continue
+                # Cached values make the part larger; leave headroom as master_stream does
+                with zin.open(info) as src, zout.open(clone_zipinfo(info), 'w',
+                                                      force_zip64=info.file_size > ZIP64_LIMIT // 2) as dst:
+                    _fill_sheet(src, dst, parts[info.filename], epoch)
+    os.replace(tmp, path)
+
+
+def add_derived_columns(path: Path | str, mode: Optional[str] = None) -> Tuple[int, str]:
+    """Write J..AA on every sheet of the workbook at path (rows 2..max_row) and save it.
+    Returns (rows written across sheets, mode used).
+    """
+    mode = check_mode(mode)
+    wb = load_workbook(path)
+    cached: Dict[str, pd.DataFrame] = {}
+    rows = 0
+    for ws in wb.worksheets:
+        max_row = ws.max_row
+        if max_row < 2:
+            continue
+        values = write_derived_columns(ws, 2, max_row, mode)
+        if values is not None:
+            cached[ws.title] = values
+        rows += max_row - 1
+    wb.save(path)
+    if cached:
+        fill_cached_values(path, cached)
+    return rows, mode
@@ -4,22 +4,35 @@ from pathlib import Path
 import re
 from datetime import datetime, date
 import shutil
-import openpyxl
-import requests
+import time
+import weakref
+
+from lazy_imports import lazy_attr, lazy_module
+from run_metrics import add_rows, run_report, span, spanned
 
 try:
-    import pandas as pd
-    from openpyxl import load_workbook
-    from openpyxl.utils.datetime import from_excel as excel_from_serial
-    from openpyxl.utils import get_column_letter
     from dotenv import load_dotenv
-    from graph_auth import acquire_graph_token
 except ImportError as e:
     print('DEPENDENCY_ERROR: Required libraries are not installed.')
     print('Please install: pip install pandas openpyxl python-dotenv requests msal')
     print(e)
     sys.exit(1)
 
+# pandas, openpyxl and the Graph client (requests, msal) are imported on first use,
+# so --help and download-only do not pay for the ones they never touch
+pd = lazy_module('pandas')
+openpyxl = lazy_module('openpyxl')
+load_workbook = lazy_attr('openpyxl', 'load_workbook')
+excel_from_serial = lazy_attr('openpyxl.utils.datetime', 'from_excel')
+get_column_letter = lazy_attr('openpyxl.utils', 'get_column_letter')
+default_client = lazy_attr('graph_client', 'default_client')
+MasterTail = lazy_attr('master_tail', 'MasterTail')
+iter_sheets = lazy_attr('sheet_select', 'iter_sheets')
+read_preferred_sheet = lazy_attr('sheet_select', 'read_preferred_sheet')
+dates_column = lazy_attr('transform_columns', 'dates_column')
+terms_column = lazy_attr('transform_columns', 'terms_column')
+zone_load_columns = lazy_attr('transform_columns', 'zone_load_columns')
+
 # Load environment variables
 load_dotenv()
 
@@ -31,6 +44,26 @@ DST_MASTER_TABLE_NAME = '2-copy-reformat/Master-Table.xlsx'
 
 TARGET_TERMS = {12, 24, 36, 48, 60}
 
+# Append engine for master-table writes:
+#   'stream'   - single pass over the workbook zip, existing rows copied through (master_stream.py)
+#   'openpyxl' - legacy path: load the full workbook, write cell by cell, save
+#   'write_only' - write_updated_master_copy only: read-only source copied through a
+#                  write-only workbook (master_copy.py); other appends fall back to 'stream'.
+#                  Flat memory but slower than 'openpyxl' (25.0s vs 21.1s on a 42k-row master)
+APPEND_ENGINE = os.getenv("MASTER_APPEND_ENGINE", "stream")
+
+# Skip incoming rows whose natural key (Price_Date..Max_MWh) is already in the master,
+# using the persistent hash index of master_keys.py; set MASTER_DEDUPE=0 to append everything
+DEDUPE_APPENDS = os.getenv("MASTER_DEDUPE", "1").lower() not in ('0', 'false', 'no')
+
+# Worker processes for the transform stage of batch process-hda
+HDA_WORKERS = int(os.getenv("HDA_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Master-table backups before appends:
+#   'store' - deduplicating snapshot in backups/store (backup_store.py)
+#   'copy'  - legacy: full timestamped copy of the workbook in backups/
+BACKUP_MODE = os.getenv("MASTER_BACKUP_MODE", "store")
+
 # Columns that will be written to the master table after filtering
 BASE_COLS = [
     'Start Month',
@@ -45,37 +78,20 @@ BASE_COLS = [
 
 # --- Backup Functions ---
 
+@spanned('backup')
 def create_master_table_backup(master_path):
-    """Create a timestamped backup copy of the master table before modifications.
+    """Create a timestamped backup of the master table before modifications.
+    With BACKUP_MODE 'store' this is a deduplicated snapshot (see backup_store.py),
+    with 'copy' a full copy in backups/; any other mode raises ValueError.
 
     Args:
         master_path (Path): Path to the master table file
 
     Returns:
-        Path: Path to the backup file if successful, None if failed
+        Path: Path to the backup file (or snapshot manifest) if successful, None if failed
     """
-    if not master_path.exists():
-        print(f"Master table not found for backup: {master_path}")
-        return None
-
-    try:
-        # Create backup directory if it doesn't exist
-        backup_dir = master_path.parent / "backups"
-        backup_dir.mkdir(exist_ok=True)
-
-        # Generate timestamped backup filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{master_path.stem}_backup_{timestamp}{master_path.suffix}"
-        backup_path = backup_dir / backup_name
-
-        # Copy the master table to backup location
-        shutil.copy2(master_path, backup_path)
-        print(f"Created backup: {backup_path}")
-        return backup_path
-
-    except Exception as e:
-        print(f"Failed to create backup of master table: {e}")
-        return None
+    from backup_store import backup_master_for_mode
+    return backup_master_for_mode(master_path, BACKUP_MODE)
 
 
 # --- SharePoint Integration Functions ---
@@ -111,56 +127,8 @@ def download_sharepoint_file(file_name, download_path=None):
         download_path = Path(download_path)
 
     try:
-        # Acquire access token
-        token = acquire_graph_token(tenant_id, client_id, client_secret)
-        headers = {"Authorization": f"Bearer {token['access_token']}"}
-
-        # First, get the site ID
-        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_hostname}:/sites/{site_path}"
-        site_response = requests.get(site_url, headers=headers)
-
-        if site_response.status_code != 200:
-            print(f"Failed to get site info. Status: {site_response.status_code}")
-            print(f"Response: {site_response.text}")
-            return None
-
-        site_data = site_response.json()
-        site_id = site_data['id']
-        print(f"Found SharePoint site ID: {site_id}")
-
-        # Get the default drive (document library)
-        drive_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
-        drive_response = requests.get(drive_url, headers=headers)
-
-        if drive_response.status_code != 200:
-            print(f"Failed to get drive info. Status: {drive_response.status_code}")
-            print(f"Response: {drive_response.text}")
-            return None
-
-        drive_data = drive_response.json()
-        drive_id = drive_data['id']
-        print(f"Found drive ID: {drive_id}")
-
-        # Construct the file path and download URL
-        file_path = f"{sharepoint_folder}/{file_name}".replace('//', '/')
-        if file_path.startswith('/'):
-            file_path = file_path[1:]  # Remove leading slash
-
-        file_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{file_path}:/content"
-        print(f"Downloading from SharePoint: {file_url}")
-
-        # Download the file
-        response = requests.get(file_url, headers=headers)
-
-        if response.status_code == 200:
-            with open(download_path, "wb") as local_file:
-                local_file.write(response.content)
-            print(f"Successfully downloaded from SharePoint: {download_path}")
-            return download_path
-        else:
-            print(f"Failed to download file from SharePoint. Status: {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
+        # Token, site ID and drive ID are resolved once per process by the shared client
+        return default_client().download(file_name, download_path, sharepoint_folder)
 
     except Exception as e:
         print(f"Error during SharePoint download: {str(e)}")
@@ -277,9 +245,9 @@ def download_and_process_sharepoint_file(file_name, dst_master_path=None, sheet_
         else:
             # For other Excel files, use the standard filtering approach
             try:
-                sheets = pd.read_excel(downloaded_file, sheet_name=None)
+                # Parse and filter one sheet at a time instead of holding every raw sheet
                 filtered_data = []
-                for _, df in sheets.items():
+                for _, df in iter_sheets(downloaded_file):
                     filtered_data.append(filter_sheet(df))
 
                 combined_df = pd.concat(filtered_data, ignore_index=True)
@@ -343,6 +311,7 @@ def get_next_id(ws):
                 max_id = vi
     return max_id + 1
 
+@spanned('transform', rows=len)
 def filter_sheet(df):
     prod_col = next((col for col in df.columns if col.strip().lower() in ['product', 'products']), None)
     term_col = next((col for col in df.columns if col.strip().lower() in ['term', 'terms']), None)
@@ -359,42 +328,21 @@ def filter_sheet(df):
 
     return filtered
 
-def add_formulas(path, start_row, end_row):
-    wb = load_workbook(path)
-    for ws in wb.worksheets:
-        if end_row < 2:
-            continue
-
-        # Add headers if the workbook is new
-        headers = {
-            9: 'I (blank)', 10: 'J Index', 11: 'K Concat', 12: 'L ConstDate',
-            13: 'M =B', 14: 'N Region', 15: 'O LF Norm', 16: 'P Supplier',
-            17: 'Q TermMonths', 18: 'R (skip)', 19: 'S', 20: 'T',
-            21: 'U', 22: 'V', 23: 'W', 24: 'X', 25: 'Y', 26: 'Z', 27: 'AA',
-        }
-        if start_row == 1:
-            for col_idx, name in headers.items():
-                ws.cell(row=1, column=col_idx, value=name)
-
-        for r in range(start_row, end_row + 1):
-            # J: index (J2 = 1; Jn = J(n-1)+1)
-            if r == 1:
-                ws.cell(row=r, column=10, value=1)
-            else:
-                ws.cell(row=r, column=10, value=f"=J{r-1}+1")
-
-            # ... [all other formulas from your build_ercot script] ...
-
-            # V: T+U
-            ws.cell(row=r, column=22, value=f"=T{r}+U{r}")
-            # AA: 10
-            ws.cell(row=r, column=27, value="=10")
-
-    wb.save(path)
+def add_formulas(ws, start_row, end_row, mode=None):
+    """Write the derived columns J..AA (ercot_columns.py) for rows start_row..end_row of
+    ws: plain values by default (ERCOT_DERIVED_COLUMNS), or the legacy formulas.
+    The master has the sequence ID in A, so the BASE_COLS they derive from are B..I.
+    Headers are written when start_row is 1. In mode 'both' the computed values are
+    returned, to be stored as the formulas' cached results once the workbook is saved
+    (ercot_columns.fill_cached_values); otherwise None.
+    """
+    from ercot_columns import write_derived_columns
+    return write_derived_columns(ws, start_row, end_row, mode, headers=start_row == 1, first_col=2)
 
 
 # --- Append L..AA from source to B..Q in destination, with A as sequence and O/P swap ---
 
+@spanned('append')
 def append_l_aa(src_path: Path, dst_path: Path, sheet_index: int = 0) -> None:
     """
     Read first sheet of src_path and take columns L..AA (12..27).
@@ -413,7 +361,8 @@ def append_l_aa(src_path: Path, dst_path: Path, sheet_index: int = 0) -> None:
         return
 
     # Load workbooks
-    wb_src = load_workbook(src_path, data_only=True)
+    with span('read_sheet', sheet=sheet_index):
+        wb_src = load_workbook(src_path, data_only=True)
     ws_src = wb_src.worksheets[sheet_index]
 
     wb_dst = load_workbook(dst_path)
@@ -432,7 +381,7 @@ def append_l_aa(src_path: Path, dst_path: Path, sheet_index: int = 0) -> None:
         return
 
     # Determine destination starting row
-    last_row = last_data_row(ws_dst, scan_cols=50)
+    last_row = MasterTail.for_path(dst_path, sheet_name=ws_dst.title).last_data_row
     start_row = last_row + 1 if last_row >= 1 else 1
     print(f"Destination last data row: {last_row}. Appending starting at row {start_row} in columns A..R")
 
@@ -496,8 +445,10 @@ def append_l_aa(src_path: Path, dst_path: Path, sheet_index: int = 0) -> None:
             # Note: Master formats are already applied above, so we don't override them here
             # unless it's a special case like dates that need specific handling
 
+    add_rows(len(src_rows))
     try:
-        wb_dst.save(dst_path)
+        with span('save', rows=len(src_rows)):
+            wb_dst.save(dst_path)
         print(f"Appended {len(src_rows)} rows (L..AA -> B..Q) to {dst_path.name}.")
     except PermissionError:
         print("ERROR: Could not save destination file. If it is open in Excel or locked, please close it and re-run.")
@@ -507,7 +458,82 @@ def append_l_aa(src_path: Path, dst_path: Path, sheet_index: int = 0) -> None:
 
 # --- Helpers to process .xlsm inputs and append using the same logic ---
 
-def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path) -> int:
+@spanned('save', rows=lambda result: result[0])
+def stream_append_to_master(rows, master_path: Path, out_path: Path | None = None,
+                            first_visible: bool = False) -> tuple[int, int]:
+    """Append B..Q value rows to the master with the streaming engine.
+    IDs in column A continue from the current max ID and master formats are applied.
+    Returns (rows_appended, first_id).
+    """
+    from master_stream import stream_append_rows
+    from master_mirror import MasterMirror, mirror_available
+    from master_keys import KEY_COLS, MasterKeyIndex, hash_rows
+
+    in_place = out_path is None or Path(out_path) == Path(master_path)
+
+    # Keep an existing, in-sync Parquet mirror of this master up to date with a new part
+    mirror = None
+    if mirror_available() and in_place:
+        mirror = MasterMirror(master_path)
+        if mirror.in_sync():
+            rows = list(rows)
+        else:
+            mirror = None
+
+    # Same for the natural-key index
+    key_index = MasterKeyIndex(master_path) if in_place else None
+    if key_index is not None:
+        if key_index.in_sync():
+            rows = list(rows)
+        else:
+            key_index = None
+
+    rows_appended, first_id = stream_append_rows(master_path, rows,
+                                                 formats=MASTER_FORMATS,
+                                                 align_right=('F',),
+                                                 out_path=out_path,
+                                                 first_visible=first_visible)
+    if mirror is not None:
+        try:
+            mirror.append_rows(rows, first_id)
+        except Exception as e:
+            print(f"Warning: could not update master mirror ({e}); it will be rebuilt on next sync")
+    if key_index is not None:
+        try:
+            key_index.add(hash_rows(r[:len(KEY_COLS)] for r in rows))
+        except Exception as e:
+            print(f"Warning: could not update master key index ({e}); it will be rebuilt on next sync")
+    return rows_appended, first_id
+
+
+def drop_known_rows(master_df: 'pd.DataFrame', master_path: Path) -> 'pd.DataFrame':
+    """Remove rows of master_df whose natural key is already in the master at master_path.
+    The key index is built on first use and kept up to date by the append paths, so this
+    costs O(len(master_df)) when the index is in sync.
+    """
+    from master_keys import MasterKeyIndex, hash_frame
+
+    known = MasterKeyIndex(master_path).sync().contains(hash_frame(master_df))
+    if not known.any():
+        return master_df
+    print(f"Skipping {int(known.sum())} rows already present in {Path(master_path).name}")
+    return master_df[~known].copy()
+
+
+def build_master_mirror(master_path: Path) -> 'MasterMirror':
+    """Build (or rebuild) the Parquet mirror for master_path."""
+    from master_mirror import MasterMirror
+    return MasterMirror(master_path).build()
+
+
+def export_master_from_mirror(master_path: Path, out_path: Path) -> Path:
+    """Regenerate a formatted master xlsx from its Parquet mirror (syncing it first)."""
+    from master_mirror import MasterMirror
+    return MasterMirror(master_path).sync().write_xlsx(out_path, formats=MASTER_FORMATS, align_right=('F',))
+
+
+@spanned('append', rows=int)
+def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path, engine: str | None = None) -> int:
     """Append filtered rows in combined_df into the master table at dst.
     Uses proper column mapping based on master table structure.
     Returns number of rows appended.
@@ -529,36 +555,6 @@ def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path)
         'Daily_No_Ruc','RUC_Nodal','Daily','Com_Disc','HOA_Disc','Broker_Fee','Meter_Fee','Max_Meters'
     ]
 
-
-
-    wb_dst = load_workbook(dst)
-    ws_dst = wb_dst.active
-
-    # Determine current max ID in column A
-    max_id = 0
-    for r in range(2, ws_dst.max_row + 1):
-        v = ws_dst.cell(row=r, column=1).value
-        if isinstance(v, (int, float)):
-            try:
-                vi = int(v)
-                if vi > max_id:
-                    max_id = vi
-            except Exception:
-                continue
-    next_id = max_id + 1
-
-    # Find the first blank ID row (column A) to start writing
-    first_blank_row = None
-    for r in range(2, ws_dst.max_row + 1):
-        v = ws_dst.cell(row=r, column=1).value
-        if v in (None, ''):
-            first_blank_row = r
-            break
-    if first_blank_row is None:
-        first_blank_row = ws_dst.max_row + 1
-
-
-
     # Create mapping from BASE_COLS to MASTER_HEADERS positions
     # BASE_COLS: ['Start Month', 'State', 'Utility', 'Congestion Zone', 'Load Factor', 'Term', 'Product', '0-200,000']
     # MASTER_HEADERS: ['Price_Date','Date','Zone','REP1','Load','Term','Min_MWh','Max_MWh', ...]
@@ -573,6 +569,31 @@ def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path)
         '0-200,000': None,   # No direct mapping
     }
 
+    if (engine or APPEND_ENGINE) in ('stream', 'write_only'):
+        def mapped_rows():
+            for row_data in combined_df.itertuples(index=False):
+                values = [None] * len(MASTER_HEADERS)
+                for i, col_name in enumerate(BASE_COLS):
+                    master_col_idx = col_mapping.get(col_name)
+                    if i < len(row_data) and master_col_idx is not None:
+                        values[master_col_idx] = row_data[i]
+                yield values
+
+        try:
+            rows_appended, _ = stream_append_to_master(mapped_rows(), dst)
+        except PermissionError:
+            print("ERROR: Could not save destination file. Please close it if it's open and re-run.")
+            sys.exit(4)
+        return rows_appended
+
+    # Max ID and first blank ID row (column A) from a single read-only pass
+    tail = MasterTail.for_path(dst)
+    next_id = tail.next_id
+    first_blank_row = tail.blank_row
+
+    wb_dst = load_workbook(dst)
+    ws_dst = wb_dst.active
+
     # Append filtered data rows
     rows_appended = 0
     write_row = first_blank_row
@@ -599,7 +620,8 @@ def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path)
 
     # Save
     try:
-        wb_dst.save(dst)
+        with span('save', rows=rows_appended):
+            wb_dst.save(dst)
     except PermissionError:
         print("ERROR: Could not save destination file. Please close it if it's open and re-run.")
         sys.exit(4)
@@ -607,12 +629,15 @@ def append_filtered_dataframe_to_master(combined_df: 'pd.DataFrame', dst: Path)
     return rows_appended
 
 
-def a(master_df, dst_master_path):
+@spanned('append', rows=int)
+def a(master_df, dst_master_path, engine=None, dedupe=None):
     """Append a DataFrame that already has master table column structure to the master table.
 
     Args:
         master_df: DataFrame with columns matching master table structure (ID, Price_Date, Date, Zone, etc.)
         dst_master_path: Path to the master table Excel file
+        engine: 'stream' or 'openpyxl'; defaults to APPEND_ENGINE
+        dedupe: Skip rows whose natural key is already in the master; defaults to DEDUPE_APPENDS
 
     Returns:
         int: Number of rows appended
@@ -623,6 +648,12 @@ def a(master_df, dst_master_path):
         print("No data to append after filtering.")
         return 0
 
+    if DEDUPE_APPENDS if dedupe is None else dedupe:
+        master_df = drop_known_rows(master_df, dst_master_path)
+        if master_df.empty:
+            print("All rows are already in the master table; nothing to append.")
+            return 0
+
     # Create backup before modifying master table
     backup_path = create_master_table_backup(dst_master_path)
     if backup_path is None:
@@ -636,11 +667,6 @@ def a(master_df, dst_master_path):
         'Daily_No_Ruc','RUC_Nodal','Daily','Com_Disc','HOA_Disc','Broker_Fee','Meter_Fee','Max_Meters'
     ]
 
-    # Load the master workbook
-    wb_dst = load_workbook(dst_master_path)
-    ws_dst = wb_dst.active
-
-    from datetime import date
     # Column B (Price_Date) should be today's date - this is already set correctly in the transformation
     # Column C (Date) should be the start date from input file - keep the original transformed value
     # Do NOT override the Date column here as it should contain the start date from input
@@ -650,14 +676,24 @@ def a(master_df, dst_master_path):
     # format Zone according to email sent last evening
     # format Load according to email sent last evening
 
-    # Find the first blank row
-    first_blank_row = find_first_blank_row(ws_dst)
-    if first_blank_row == 0:
-        print("ERROR: Could not determine where to append data in master table")
-        return 0
+    if (engine or APPEND_ENGINE) in ('stream', 'write_only'):
+        # Columns B-Q in MASTER_HEADERS order; the ID column is assigned by the engine
+        rows = master_df.reindex(columns=MASTER_HEADERS).itertuples(index=False, name=None)
+        rows_appended, _ = stream_append_to_master(rows, dst_master_path)
+        return rows_appended
+
+    # Find the first blank row and the next ID number in one pass
+    tail = MasterTail.for_path(dst_master_path)
+    first_blank_row = tail.blank_row
+    next_id = tail.next_id
 
-    # Get the next ID number
-    next_id = get_next_id(ws_dst)
+    from master_keys import MasterKeyIndex, hash_frame
+    key_index = MasterKeyIndex(dst_master_path)
+    keys_in_sync = key_index.in_sync()
+
+    # Load the master workbook
+    wb_dst = load_workbook(dst_master_path)
+    ws_dst = wb_dst.active
 
     # Append data rows
     rows_appended = 0
@@ -684,8 +720,11 @@ def a(master_df, dst_master_path):
         rows_appended += 1
 
     # Save the workbook
-    wb_dst.save(dst_master_path)
+    with span('save', rows=rows_appended):
+        wb_dst.save(dst_master_path)
     wb_dst.close()
+    if keys_in_sync:
+        key_index.add(hash_frame(master_df))
 
     return rows_appended
 
@@ -693,16 +732,20 @@ def a(master_df, dst_master_path):
 # Some callers expect append_master_formatted_dataframe_to_master
 # Use existing implementation in a()
 
-def append_master_formatted_dataframe_to_master(master_df: 'pd.DataFrame', dst_master: Path) -> int:
-    return a(master_df, dst_master)
+def append_master_formatted_dataframe_to_master(master_df: 'pd.DataFrame', dst_master: Path,
+                                               engine: str | None = None, dedupe: bool | None = None) -> int:
+    return a(master_df, dst_master, engine=engine, dedupe=dedupe)
 
 
 
 
+@spanned('append')
 def write_updated_master_copy(master_df: 'pd.DataFrame',
                                master_dir: Path | str = Path('2-copy-reformat'),
                                master_filename: str = 'Master-Table.xlsx',
-                               out_filename: str = 'master-file-updated.xlsx') -> Path:
+                               out_filename: str = 'master-file-updated.xlsx',
+                               engine: str | None = None,
+                               dedupe: bool | None = None) -> Path:
     """Append master_df to the Master-Table but save as a new file without modifying the original.
 
     - Reads master from master_dir/master_filename
@@ -710,6 +753,9 @@ def write_updated_master_copy(master_df: 'pd.DataFrame',
     - Renumbers master_df['ID'] starting at that next ID
     - Appends rows to a workbook copy and saves to master_dir/out_filename
     - Returns the output path
+    - engine: 'stream' (copy the original through, rows appended at the end), 'write_only'
+      (read-only source re-emitted through a write-only workbook) or 'openpyxl'
+    - dedupe: skip rows whose natural key is already in the master (default DEDUPE_APPENDS)
     """
     from openpyxl import load_workbook
     import pandas as pd
@@ -726,38 +772,57 @@ def write_updated_master_copy(master_df: 'pd.DataFrame',
         print("No data to append: input DataFrame is empty.")
         return out_path
 
+    if DEDUPE_APPENDS if dedupe is None else dedupe:
+        master_df = drop_known_rows(master_df, master_path)
+
+    if (engine or APPEND_ENGINE) == 'stream':
+        rows = master_df.reindex(columns=MASTER_HEADERS).itertuples(index=False, name=None)
+        rows_appended, first_id = stream_append_to_master(rows, master_path, out_path=out_path)
+        add_rows(rows_appended)
+        print(f"Wrote updated master copy: {out_path} ({rows_appended} rows appended, IDs from {first_id})")
+        return out_path
+
+    if (engine or APPEND_ENGINE) == 'write_only':
+        from master_copy import write_only_append_rows
+        rows = master_df.reindex(columns=MASTER_HEADERS).itertuples(index=False, name=None)
+        with span('save') as s:
+            rows_appended, first_id = write_only_append_rows(master_path, rows, formats=MASTER_FORMATS,
+                                                             align_right=('F',), out_path=out_path)
+            s.add_rows(rows_appended)
+        add_rows(rows_appended)
+        print(f"Wrote updated master copy: {out_path} ({rows_appended} rows appended, IDs from {first_id})")
+        return out_path
+
+    # Determine write position and starting ID
+    tail = MasterTail.for_path(master_path)
+    first_blank_row = tail.blank_row
+    next_id = tail.next_id
+
     # Load the master workbook (do not modify original file)
     wb_dst = load_workbook(master_path)
     ws_dst = wb_dst.active
 
-    # Determine write position and starting ID
-    first_blank_row = find_first_blank_row(ws_dst)
-    next_id = get_next_id(ws_dst)
-
     # Renumber the DataFrame's ID starting at next_id
     master_df = master_df.copy()
     master_df['ID'] = range(next_id, next_id + len(master_df))
 
-    # Apply rows into the copy
+    # Apply rows into the copy: ID from the DataFrame, then B..Q in the MASTER_HEADERS order,
+    # values and formats written together
+    writer = master_row_writer(ws_dst)
     rows_appended = 0
-    for r_offset, row in enumerate(master_df.itertuples(index=False), start=0):
+    # Headers missing from the frame stay empty
+    cols = [master_df[h] if h in master_df.columns else [None] * len(master_df) for h in ['ID'] + MASTER_HEADERS]
+    rows = zip(*cols)
+    for r_offset, values in enumerate(rows, start=0):
         dst_row = first_blank_row + r_offset
-
-        # Column A: write ID from the DataFrame
-        apply_master_formats(ws_dst, dst_row)
-        id_value = getattr(row, 'ID') if hasattr(row, 'ID') else (next_id + r_offset)
-        ws_dst.cell(row=dst_row, column=1, value=id_value)
-
-        # Columns B..Q in the MASTER_HEADERS order
-        row_dict = row._asdict()
-        for col_idx, header in enumerate(MASTER_HEADERS):
-            if header in row_dict:
-                ws_dst.cell(row=dst_row, column=col_idx + 2, value=row_dict[header])
+        writer.write_row(dst_row, values)
 
         rows_appended += 1
 
     # Save to a new file path (do not overwrite original master)
-    wb_dst.save(out_path)
+    add_rows(rows_appended)
+    with span('save', rows=rows_appended):
+        wb_dst.save(out_path)
     wb_dst.close()
 
     print(f"Wrote updated master copy: {out_path} ({rows_appended} rows appended)")
@@ -766,6 +831,7 @@ def write_updated_master_copy(master_df: 'pd.DataFrame',
 
 
 
+@spanned('transform', rows=len)
 def hda_matrix_to_master_cols(df: 'pd.DataFrame') -> 'pd.DataFrame':
     """Transform HDA 'Matrix Table' sheet columns into master table schema.
     Attempts to be resilient to occasional header changes.
@@ -846,25 +912,6 @@ def hda_matrix_to_master_cols(df: 'pd.DataFrame') -> 'pd.DataFrame':
     if num_rows == 0:
         return out
 
-    # Helpers to derive zone and load factor from description
-    def parse_zone(text: str) -> str:
-        s = str(text or '').strip()
-        for token in [' Low Load Factor', ' Medium Load Factor', ' High Load Factor']:
-            if s.endswith(token):
-                return s[: -len(token)]
-        return s
-
-    def parse_lf(text: str) -> str:
-        print(f"parse_lf: {text}")
-        s = str(text or '').strip()
-        if 'Low Load Factor' in s:
-            return 'LOW'
-        elif 'Medium Load Factor' in s:
-            return 'MED'
-        elif 'High Load Factor' in s:
-            return 'HIGH'
-        return ''
-
     # Map to master table columns
     # Create DataFrame with proper index to avoid scalar assignment issues
     out = pd.DataFrame(index=range(num_rows), columns=master_cols)
@@ -875,13 +922,11 @@ def hda_matrix_to_master_cols(df: 'pd.DataFrame') -> 'pd.DataFrame':
     today = date_today.today()
     out['Price_Date'] = today  # Column B - today's date for all rows
 
-    start_dates = pd.to_datetime(work_df[c_start], errors='coerce')
-    out['Date'] = start_dates.dt.date  # Column C - start date from input
+    out['Date'] = dates_column(work_df[c_start])  # Column C - start date from input
 
     # Zone and Load Factor
     if c_desc is not None:
-        out['Zone'] = work_df[c_desc].map(parse_zone)
-        out['Load'] = work_df[c_desc].map(parse_lf)
+        out['Zone'], out['Load'] = zone_load_columns(work_df[c_desc])
     else:
         out['Zone'] = work_df[c_zone].astype(str) if c_zone is not None else ''
         out['Load'] = work_df[c_lf].astype(str) if c_lf is not None else ''
@@ -890,17 +935,7 @@ def hda_matrix_to_master_cols(df: 'pd.DataFrame') -> 'pd.DataFrame':
     out['REP1'] = 'HUDSON'
 
     # Term integer months with TARGET_TERMS filter
-    def term_to_int(v):
-        try:
-            iv = int(float(v))
-            return iv if iv in TARGET_TERMS else None
-        except Exception:
-            m = re.search(r"(\d+)", str(v))
-            if m:
-                iv = int(m.group(1))
-                return iv if iv in TARGET_TERMS else None
-            return None
-    out['Term'] = work_df[c_term].map(term_to_int)
+    out['Term'] = terms_column(work_df[c_term])
 
     # Usage tiers - match 2-mapping.py exactly
     out['Min_MWh'] = 0
@@ -993,46 +1028,17 @@ def hda_matrix_to_base_cols_v2(df: 'pd.DataFrame') -> 'pd.DataFrame':
     if c_desc is None and (c_zone is None and c_lf is None):
         return out
 
-    def parse_zone(text: str) -> str:
-        s = str(text or '').strip()
-        for token in [' Low Load Factor',' Medium Load Factor',' High Load Factor']:
-            if s.endswith(token):
-                return s[:-len(token)]
-        return s
-
-    def parse_lf(text: str) -> str:
-        s = str(text or '').strip()
-        if 'Low Load Factor' in s:
-            return 'LOW'
-        elif 'Medium Load Factor' in s:
-            return 'MED'
-        elif 'High Load Factor' in s:
-            return 'HIGH'
-        return ''
-
-    def term_to_int(v):
-        try:
-            iv = int(float(v))
-            return iv if iv in TARGET_TERMS else None
-        except Exception:
-            m = re.search(r"(\d+)", str(v))
-            if m:
-                iv = int(m.group(1))
-                return iv if iv in TARGET_TERMS else None
-            return None
-
-    out['Start Month'] = pd.to_datetime(work_df[c_start], errors='coerce').dt.date
+    out['Start Month'] = dates_column(work_df[c_start])
     out['State'] = 'TX'
     out['Utility'] = work_df[c_tdsp].astype(str) if c_tdsp is not None else ''
 
     if c_desc is not None:
-        out['Congestion Zone'] = work_df[c_desc].map(parse_zone)
-        out['Load Factor'] = work_df[c_desc].map(parse_lf)
+        out['Congestion Zone'], out['Load Factor'] = zone_load_columns(work_df[c_desc])
     else:
         out['Congestion Zone'] = work_df[c_zone].astype(str) if c_zone is not None else ''
         out['Load Factor'] = work_df[c_lf].astype(str) if c_lf is not None else ''
 
-    out['Term'] = work_df[c_term].map(term_to_int)
+    out['Term'] = terms_column(work_df[c_term])
     out['Product'] = 'Fixed Price'
 
     price_series = pd.to_numeric(work_df[c_price], errors='coerce') if c_price is not None else pd.Series(dtype='float64')
@@ -1065,31 +1071,15 @@ def create_template_copy_with_filtered_values(src_xlsm: Path,
 
     # Read Matrix Table and transform to BASE_COLS
     try:
-        all_sheets = pd.read_excel(src_xlsm, sheet_name=None)
+        target, sheet_df = read_preferred_sheet(src_xlsm, sheet_name_prefer)
     except Exception as e:
         print('READ_ERROR')
         print(str(e))
         return None
-
-    # Resolve sheet name
-    target = None
-    wanted = sheet_name_prefer.strip().lower()
-    for name in all_sheets.keys():
-        if str(name).strip().lower() == wanted:
-            target = name
-            break
-    if target is None:
-        words = [w for w in wanted.split() if w]
-        for name in all_sheets.keys():
-            nrm = str(name).strip().lower()
-            if all(w in nrm for w in words):
-                target = name
-                break
     if target is None:
-        print(f"WARNING: Preferred sheet '{sheet_name_prefer}' not found in {src_xlsm.name}.")
         return None
 
-    transformed = hda_matrix_to_master_cols(all_sheets[target])
+    transformed = hda_matrix_to_master_cols(sheet_df)
     if transformed.empty:
         print("No rows after transformation/filtering; template copy not created.")
         return None
@@ -1139,31 +1129,15 @@ def write_hda_filtered(src_xlsm: Path,
         return 0
 
     try:
-        all_sheets = pd.read_excel(src_xlsm, sheet_name=None)
+        target, sheet_df = read_preferred_sheet(src_xlsm, sheet_name_prefer)
     except Exception as e:
         print('READ_ERROR')
         print(str(e))
         return 0
-
-    # Resolve sheet name
-    target = None
-    wanted = sheet_name_prefer.strip().lower()
-    for name in all_sheets.keys():
-        if str(name).strip().lower() == wanted:
-            target = name
-            break
-    if target is None:
-        words = [w for w in wanted.split() if w]
-        for name in all_sheets.keys():
-            nrm = str(name).strip().lower()
-            if all(w in nrm for w in words):
-                target = name
-                break
     if target is None:
-        print(f"WARNING: Preferred sheet '{sheet_name_prefer}' not found in {src_xlsm.name}.")
         return 0
 
-    transformed = hda_matrix_to_master_cols(all_sheets[target])
+    transformed = hda_matrix_to_master_cols(sheet_df)
     if transformed.empty:
         print("No rows after transformation/filtering.")
         return 0
@@ -1193,41 +1167,14 @@ def process_xlsm_file(src_xlsm: Path, dst_master: Path, sheet_name_prefer: str |
         return 0
 
     try:
-        # Read the .xlsm file and process it using HDA matrix transformation
-        all_sheets = pd.read_excel(src_xlsm, sheet_name=None)
-
-        # Find the matrix table sheet
-        target_sheet = None
-        if sheet_name_prefer:
-            # Look for the preferred sheet name
-            wanted = sheet_name_prefer.strip().lower()
-            for name in all_sheets.keys():
-                if str(name).strip().lower() == wanted:
-                    target_sheet = name
-                    break
-            if target_sheet is None:
-                words = [w for w in wanted.split() if w]
-                for name in all_sheets.keys():
-                    nrm = str(name).strip().lower()
-                    if all(w in nrm for w in words):
-                        target_sheet = name
-                        break
-        else:
-            # Default to looking for 'matrix table' sheet
-            for name in all_sheets.keys():
-                if 'matrix' in str(name).lower() and 'table' in str(name).lower():
-                    target_sheet = name
-                    break
-
+        # Find the matrix table sheet (or the preferred one) and parse only that sheet
+        target_sheet, sheet_df = read_preferred_sheet(src_xlsm, sheet_name_prefer)
         if target_sheet is None:
-            print(f"WARNING: No suitable sheet found in {src_xlsm.name}. Available sheets: {list(all_sheets.keys())}")
             return 0
 
-        print(f"line 1092 Processing sheet '{target_sheet}' from {src_xlsm.name}")
-
         # Transform the data using HDA matrix transformation
-        print(f"line 1099 Processing sheet '{target_sheet}' from {src_xlsm.name}")
-        transformed_df = hda_matrix_to_master_cols(all_sheets[target_sheet])
+        print(f"Processing sheet '{target_sheet}' from {src_xlsm.name}")
+        transformed_df = hda_matrix_to_master_cols(sheet_df)
 
         if transformed_df.empty:
             print(f"No data to append after transformation from {src_xlsm.name}")
@@ -1242,6 +1189,88 @@ def process_xlsm_file(src_xlsm: Path, dst_master: Path, sheet_name_prefer: str |
         print(f"ERROR processing {src_xlsm.name}: {str(e)}")
         return 0
 
+def transform_xlsm_file(src_xlsm: Path, sheet_name_prefer: str | None = None) -> dict:
+    """Read the preferred sheet of one .xlsm and transform it to the master schema.
+    Runs in a worker process of process_xlsm_batch. Returns its result record
+    (path, sheet, frame, rows, seconds, error).
+    """
+    t0 = time.perf_counter()
+    target_sheet, frame, error = None, None, None
+    try:
+        target_sheet, sheet_df = read_preferred_sheet(src_xlsm, sheet_name_prefer)
+        if target_sheet is None:
+            error = 'sheet not found'
+        else:
+            frame = hda_matrix_to_master_cols(sheet_df)
+    except Exception as e:
+        error = str(e)
+    return {'path': Path(src_xlsm), 'sheet': target_sheet, 'frame': frame,
+            'rows': 0 if frame is None else len(frame),
+            'seconds': time.perf_counter() - t0, 'error': error}
+
+
+def process_xlsm_batch(src_files, dst_master: Path, sheet_name_prefer: str | None = None,
+                       max_workers: int = HDA_WORKERS) -> tuple[int, list]:
+    """Transform many .xlsm files in a process pool and append them to the master once.
+
+    Files are transformed concurrently but concatenated in the order given, so the
+    appended rows (and their contiguous IDs) do not depend on which worker finished
+    first. The master is backed up, loaded and saved a single time for the whole batch.
+    Returns (rows_appended, per-file result records without the frames). A failed
+    append is caught like in process_xlsm_file and recorded as each file's error.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    src_files = [Path(f) for f in src_files]
+    if not dst_master.exists():
+        print(f"ERROR: Master table not found: {dst_master}")
+        return 0, []
+    if not src_files:
+        return 0, []
+
+    workers = max(1, min(max_workers, len(src_files)))
+    print(f"Transforming {len(src_files)} files with {workers} worker(s)...")
+    t0 = time.perf_counter()
+    # Spans opened in the worker processes are not recorded; this one covers the whole pool
+    with span('transform', files=len(src_files), workers=workers) as s:
+        if workers == 1:
+            results = [transform_xlsm_file(f, sheet_name_prefer) for f in src_files]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(transform_xlsm_file, src_files, [sheet_name_prefer] * len(src_files)))
+        s.add_rows(sum(r['rows'] for r in results))
+    print(f"Transform stage finished in {time.perf_counter() - t0:.2f}s")
+
+    frames, appending = [], []
+    for r in results:
+        if r['error']:
+            print(f"✗ {r['path'].name}: {r['error']} ({r['seconds']:.2f}s)")
+        else:
+            print(f"✓ {r['path'].name}: {r['rows']} rows from '{r['sheet']}' in {r['seconds']:.2f}s")
+        if r['frame'] is not None and not r['frame'].empty:
+            frames.append(r['frame'])
+            appending.append(r)
+        r.pop('frame')
+
+    if not frames:
+        print("No data to append after transformation.")
+        return 0, results
+
+    t0 = time.perf_counter()
+    combined = pd.concat(frames, ignore_index=True)
+    try:
+        rows_appended = append_master_formatted_dataframe_to_master(combined, dst_master)
+    except Exception as e:
+        # Like process_xlsm_file: report and append nothing; the batch is one append, so every file fails
+        print(f"ERROR appending batch to {dst_master.name}: {str(e)}")
+        for r in appending:
+            r['error'] = f'append failed: {e}'
+            print(f"✗ {r['path'].name}: not appended ({r['rows']} rows)")
+        return 0, results
+    print(f"Append stage finished in {time.perf_counter() - t0:.2f}s: "
+          f"{rows_appended} rows appended to {dst_master.name}")
+    return rows_appended, results
+
 # === Header-mapped append (from nice-scripts pattern) ===
 # This appends rows from a template workbook by header names and applies
 # master number formats so pasted cells match the master table's formatting.
@@ -1328,23 +1357,92 @@ def build_source_mapping(ws, header_row: int) -> Dict[str, int]:
     return mapping
 
 
-def apply_master_formats(ws_dst, row_idx: int) -> None:
-    """Apply master number formats for columns A..Q to a single row."""
-    from openpyxl.styles import Alignment
+class MasterRowWriter:
+    """Writes master rows A..Q into an openpyxl worksheet with precomputed styles.
+
+    Each MASTER_FORMATS column style (plus right alignment for F) is registered once
+    as a named style ('Master A'..'Master Q') on the workbook, and its style array
+    is computed once. New cells are then stamped with a copy of that array instead
+    of assigning number_format/alignment cell by cell, which makes openpyxl hash
+    every style into its tables again. Cells that already carry their own styling
+    keep it and only get the number format and alignment, as before.
+    """
 
-    for c in range(1, 17 + 1):
-        col_letter = get_column_letter(c)
-        fmt = MASTER_FORMATS.get(col_letter)
-        cell = ws_dst.cell(row=row_idx, column=c)
-        if fmt:
-            cell.number_format = fmt
+    WIDTH = 17
+    ALIGN_RIGHT = ('F',)
 
-        # Apply right alignment to REP1 column (column F = 6)
-        if c == 6:  # Column F (REP1/HUDSON)
-            cell.alignment = Alignment(horizontal='right')
+    def __init__(self, ws, formats: Dict[str, str] | None = None):
+        from copy import copy
+        from openpyxl.styles import Alignment
 
+        from master_copy import column_style_arrays
 
-def append_from_template(template_path: Path, template_sheet: str, master_path: Path) -> None:
+        self.ws = ws
+        self._copy = copy
+        formats = MASTER_FORMATS if formats is None else formats
+        letters = [get_column_letter(c) for c in range(1, self.WIDTH + 1)]
+        self._formats: List[str | None] = [formats.get(letter) for letter in letters]
+        self._alignments: List[Alignment | None] = [
+            Alignment(horizontal='right') if letter in self.ALIGN_RIGHT else None for letter in letters]
+        self._styles = column_style_arrays(ws.parent, formats, self.ALIGN_RIGHT, width=self.WIDTH)
+
+    def _restyle(self, cell, i: int) -> None:
+        if not cell.has_style:
+            cell._style = self._copy(self._styles[i])
+            return
+        if self._formats[i]:
+            cell.number_format = self._formats[i]
+        if self._alignments[i] is not None:
+            cell.alignment = self._alignments[i]
+
+    def format_row(self, row_idx: int) -> None:
+        """Apply the master formats to A..Q of one row."""
+        ws = self.ws
+        for i in range(self.WIDTH):
+            self._restyle(ws.cell(row=row_idx, column=i + 1), i)
+
+    def write_row(self, row_idx: int, values) -> None:
+        """Write values into A.. of one row and apply the master formats to A..Q in the same pass."""
+        from openpyxl.cell.cell import Cell
+
+        ws = self.ws
+        cells = ws._cells
+        n = 0
+        for i, value in enumerate(values):
+            cell = cells.get((row_idx, i + 1))
+            if cell is None and i < self.WIDTH:
+                # New cell: created with its value and style in one step (Cell copies the array)
+                cells[(row_idx, i + 1)] = Cell(ws, row=row_idx, column=i + 1, value=value,
+                                               style_array=self._styles[i])
+            else:
+                if cell is None:
+                    cell = ws.cell(row=row_idx, column=i + 1)
+                elif i < self.WIDTH:
+                    self._restyle(cell, i)
+                cell.value = value
+            n += 1
+        for i in range(n, self.WIDTH):
+            self._restyle(ws.cell(row=row_idx, column=i + 1), i)
+
+
+_row_writers: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
+def master_row_writer(ws_dst) -> MasterRowWriter:
+    """The MasterRowWriter for a worksheet, created (and its styles registered) on first use."""
+    writer = _row_writers.get(ws_dst)
+    if writer is None:
+        writer = _row_writers[ws_dst] = MasterRowWriter(ws_dst)
+    return writer
+
+
+def apply_master_formats(ws_dst, row_idx: int) -> None:
+    """Apply master number formats for columns A..Q to a single row."""
+    master_row_writer(ws_dst).format_row(row_idx)
+
+
+def append_from_template(template_path: Path, template_sheet: str, master_path: Path,
+                         engine: str | None = None) -> None:
     """Append rows from a template workbook to the master by header mapping and apply number formats."""
     # Create backup before modifying master table
     backup_path = create_master_table_backup(master_path)
@@ -1366,6 +1464,24 @@ def append_from_template(template_path: Path, template_sheet: str, master_path:
     if missing:
         raise ValueError('Missing expected columns in template: ' + ', '.join(missing))
 
+    if (engine or APPEND_ENGINE) in ('stream', 'write_only'):
+        def template_rows():
+            for r in range(header_row + 1, ws_src.max_row + 1):
+                values: List[object] = []
+                for h in MASTER_HEADERS:
+                    v = ws_src.cell(row=r, column=src_map[h]).value
+                    values.append(v.strip() if isinstance(v, str) else v)
+                if any(v not in (None, '') for v in values):
+                    yield values
+
+        rows = list(template_rows())
+        if not rows:
+            print('No non-empty rows found to append.')
+            return
+        rows_appended, first_id = stream_append_to_master(rows, master_path, first_visible=True)
+        print(f'Appended {rows_appended} rows by header mapping. IDs {first_id}..{first_id + rows_appended - 1}.')
+        return
+
     # Open master workbook
     wb_dst = load_workbook(master_path)
     # First visible sheet
@@ -1378,28 +1494,12 @@ def append_from_template(template_path: Path, template_sheet: str, master_path:
     if ws_dst is None:
         ws_dst = wb_dst.active
 
-    # Determine current max ID in column A
-    max_id = 0
-    for r in range(2, ws_dst.max_row + 1):
-        v = ws_dst.cell(row=r, column=1).value
-        if isinstance(v, (int, float)):
-            try:
-                vi = int(v)
-            except Exception:
-                continue
-            if vi > max_id:
-                max_id = vi
-    next_id = max_id + 1
-
-    # Find the first blank ID row (column A)
-    first_blank_row = None
-    for r in range(2, ws_dst.max_row + 1):
-        v = ws_dst.cell(row=r, column=1).value
-        if v in (None, ''):
-            first_blank_row = r
-            break
-    if first_blank_row is None:
-        first_blank_row = ws_dst.max_row + 1
+    # Current max ID and first blank ID row (column A) in one pass
+    tail = MasterTail.for_path(master_path, sheet_name=ws_dst.title)
+    max_id = tail.max_id
+    next_id = tail.next_id
+    first_blank_row = tail.blank_row
+    writer = master_row_writer(ws_dst)
 
     # Iterate source rows and append
     start_data_row = header_row + 1
@@ -1421,14 +1521,8 @@ def append_from_template(template_path: Path, template_sheet: str, master_path:
         if all_empty:
             continue
 
-        dst_row = write_row
-        # ID
-        ws_dst.cell(row=dst_row, column=1, value=next_id)
-        # Apply formats to A..Q first
-        apply_master_formats(ws_dst, dst_row)
-        # Write values for B..Q in the master-defined order
-        for i, val in enumerate(values):
-            ws_dst.cell(row=dst_row, column=i + 2, value=val)
+        # ID, then values for B..Q in the master-defined order, formatted in the same pass
+        writer.write_row(write_row, [next_id] + values)
 
         write_row += 1
         rows_appended += 1
@@ -1449,27 +1543,70 @@ def print_usage():
     print("    Download and process a file from SharePoint")
     print("  python excel_processor.py download-only <filename> [<local-path>]")
     print("    Download a file from SharePoint without processing")
-    print("  python excel_processor.py process-hda <path-to-file-or-dir> [<master-table-path>]")
-    print("    Process HDA .xlsm files")
+    print("  python excel_processor.py process-hda <path-to-file-or-dir> [<master-table-path>] [--per-file]")
+    print("    Process HDA .xlsm files (a directory is transformed in parallel and appended once;")
+    print("    --per-file appends each file separately; HDA_WORKERS sets the pool size)")
     print("  python excel_processor.py append-l-aa <source-path> [<master-table-path>]")
     print("    Append L..AA columns from source to master table")
     print("  python excel_processor.py append-from-template <template-path> <sheet-name> [<master-table-path>]")
     print("    Append from template by header mapping")
+    print("  python excel_processor.py mirror-build [<master-table-path>]")
+    print("    Build the Parquet mirror of the master table (needs pyarrow)")
+    print("  python excel_processor.py mirror-export <out-path> [<master-table-path>]")
+    print("    Regenerate a master xlsx from its Parquet mirror")
+    print("  python excel_processor.py backup-list [<master-table-path>]")
+    print("    List backup snapshots of the master table")
+    print("  python excel_processor.py backup-restore <timestamp> [<master-table-path>] [<out-path>]")
+    print("    Restore a backup snapshot (timestamp may be a prefix, e.g. 20250831)")
+    print("  python excel_processor.py backup-prune [<master-table-path>]")
+    print("    Apply BACKUP_KEEP_DAILY / BACKUP_KEEP_WEEKLY retention to the backup store")
     print("  python excel_processor.py")
     print("    Default: process unfiltered source into master table")
     print()
     print("SharePoint Configuration:")
     print("  Ensure .env file contains: TENANT_ID, CLIENT_ID, CLIENT_SECRET, SITE_HOSTNAME, SITE_PATH, SHAREPOINT_UPLOAD_FOLDER")
+    print()
+    print("Run reports:")
+    print("  Processing commands write per-stage timings to runs/ next to the master table")
+    print("  (RUN_REPORTS=0 turns them off, RUN_TRACE_MEMORY=1 adds tracemalloc peaks per stage)")
 
 
-def main():
-    root = Path('.')
+# Commands that process data write a run report (run_metrics.py) to runs/ next to their output
+RUN_REPORT_COMMANDS = ('download-sharepoint', 'download-only', 'process-hda', 'append-l-aa',
+                       'append-from-template', 'default')
+RUN_REPORTS = os.getenv("RUN_REPORTS", "1").lower() not in ('0', 'false', 'no')
+
+
+def run_report_dir(argv: list) -> Path:
+    """Directory whose runs/ folder gets the report of the command in argv (sys.argv[1:])."""
+    command = argv[0] if argv else 'default'
+    args = [a for a in argv[1:] if not a.startswith('--')]
+    master_pos = {'download-sharepoint': 1, 'process-hda': 1, 'append-l-aa': 1, 'append-from-template': 2}
+    if command == 'download-only':
+        return Path(args[1]).parent if len(args) >= 2 else Path('.')
+    pos = master_pos.get(command)
+    if pos is not None and len(args) > pos:
+        return Path(args[pos]).parent
+    return Path(DST_MASTER_TABLE_NAME).parent
 
+
+def main():
     # Help mode
     if len(sys.argv) >= 2 and sys.argv[1] in ['--help', '-h', 'help']:
         print_usage()
         return
 
+    command = sys.argv[1] if len(sys.argv) >= 2 else 'default'
+    if not RUN_REPORTS or command not in RUN_REPORT_COMMANDS:
+        _run_command()
+        return
+    with run_report(command, run_report_dir(sys.argv[1:])):
+        _run_command()
+
+
+def _run_command():
+    root = Path('.')
+
     # SharePoint download and process mode
     if len(sys.argv) >= 3 and sys.argv[1] == 'download-sharepoint':
         file_name = sys.argv[2]
@@ -1496,6 +1633,55 @@ def main():
             print(f"FAILED: Could not download {file_name} from SharePoint")
         return
 
+    # Parquet mirror of the master table
+    if len(sys.argv) >= 2 and sys.argv[1] == 'mirror-build':
+        master_arg = Path(sys.argv[2]) if len(sys.argv) >= 3 else Path(DST_MASTER_TABLE_NAME)
+        if not master_arg.exists():
+            print(f"ERROR: Master file not found: {master_arg}")
+            return
+        try:
+            print(build_master_mirror(master_arg))
+        except Exception as e:
+            print('MIRROR_ERROR')
+            print(str(e))
+        return
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'mirror-export':
+        out_arg = Path(sys.argv[2])
+        master_arg = Path(sys.argv[3]) if len(sys.argv) >= 4 else Path(DST_MASTER_TABLE_NAME)
+        try:
+            export_master_from_mirror(master_arg, out_arg)
+        except Exception as e:
+            print('MIRROR_ERROR')
+            print(str(e))
+        return
+
+    # Deduplicating backup store of the master table
+    if len(sys.argv) >= 2 and sys.argv[1] in ('backup-list', 'backup-prune'):
+        from backup_store import BackupStore, retention_from_env
+        master_arg = Path(sys.argv[2]) if len(sys.argv) >= 3 else Path(DST_MASTER_TABLE_NAME)
+        store = BackupStore.for_master(master_arg)
+        if sys.argv[1] == 'backup-prune':
+            removed, chunks = store.prune(*retention_from_env())
+            print(f"Pruned {removed} snapshots and {chunks} unreferenced chunks from {store.root}")
+        for stamp in store.snapshots(master_arg.name):
+            snap = store.read_snapshot(master_arg.name, stamp)
+            print(f" - {stamp}  {snap['size']:,} bytes  (+{snap['stored_bytes']:,} stored)")
+        print(f"Store size: {store.disk_usage():,} bytes")
+        return
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'backup-restore':
+        from backup_store import restore_master
+        master_arg = Path(sys.argv[3]) if len(sys.argv) >= 4 else Path(DST_MASTER_TABLE_NAME)
+        out_arg = Path(sys.argv[4]) if len(sys.argv) >= 5 else None
+        try:
+            restored = restore_master(master_arg, sys.argv[2], out_arg)
+            print(f"SUCCESS: Restored backup {sys.argv[2]} of {master_arg.name} to {restored}")
+        except Exception as e:
+            print('RESTORE_ERROR')
+            print(str(e))
+        return
+
     # If called with explicit args (append mode), run append_l_aa and exit
     if len(sys.argv) >= 3 and sys.argv[1] == 'append-l-aa':
         src_arg = Path(sys.argv[2])
@@ -1525,8 +1711,11 @@ def main():
     # If called with 'process-hda', process a .xlsm file or all .xlsm files in a directory
     if len(sys.argv) >= 2 and sys.argv[1] == 'process-hda':
         # Allow omitting the path to default to a folder named 'HDA' if present
-        target_path = Path(sys.argv[2]) if len(sys.argv) >= 3 else Path('HDA')
-        dst_arg = Path(sys.argv[3]) if len(sys.argv) >= 4 else Path(DST_MASTER_TABLE_NAME)
+        # --per-file: legacy mode, one backup/append/save of the master per input file
+        args = [a for a in sys.argv[2:] if a != '--per-file']
+        per_file = len(args) != len(sys.argv) - 2
+        target_path = Path(args[0]) if len(args) >= 1 else Path('HDA')
+        dst_arg = Path(args[1]) if len(args) >= 2 else Path(DST_MASTER_TABLE_NAME)
 
         if not target_path.exists():
             print(f"ERROR: HDA path not found: {target_path}")
@@ -1547,9 +1736,19 @@ def main():
             if not xlsm_files:
                 print(f"No .xlsm files found under: {target_path}")
                 return
-            for f in sorted(xlsm_files):
-                appended_total += process_xlsm_file(f, dst_arg, sheet_name_prefer='matrix table')
-                processed_files.append(f)
+            if per_file:
+                for f in sorted(xlsm_files):
+                    appended_total += process_xlsm_file(f, dst_arg, sheet_name_prefer='matrix table')
+                    processed_files.append(f)
+            else:
+                appended_total, results = process_xlsm_batch(sorted(xlsm_files), dst_arg,
+                                                             sheet_name_prefer='matrix table')
+                processed_files.extend(r['path'] for r in results if not r['error'])
+                failed = [r for r in results if r['error']]
+                if failed:
+                    print(f"Files failed: {len(failed)}")
+                    for r in failed:
+                        print(f" ✗ {r['path']}: {r['error']}")
         else:
             print(f"ERROR: Unsupported HDA target: {target_path}")
             print("Provide a .xlsm file or a directory containing .xlsm files.")
@@ -1591,7 +1790,9 @@ def main():
 
     # 1. Read and filter the source data (legacy default path)
     try:
-        sheets = pd.read_excel(src, sheet_name=None)
+        with span('read_sheet', sheet='*') as s:
+            sheets = pd.read_excel(src, sheet_name=None)
+            s.add_rows(sum(len(df) for df in sheets.values()))
     except Exception as e:
         print('READ_ERROR')
         print(str(e))
@@ -1607,56 +1808,61 @@ def main():
         print("No data to append after filtering.")
         return
 
-    # 2. Load the master table workbook
-    wb_dst = load_workbook(dst)
-    ws_dst = wb_dst.active
+    with span('append', rows=len(combined_df)):
+        # 2. Load the master table workbook
+        last_row = MasterTail.for_path(dst).last_data_row
+        wb_dst = load_workbook(dst)
+        ws_dst = wb_dst.active
 
-    last_row = last_data_row(ws_dst)
-    start_row = last_row + 1 if last_row >= 1 else 1
+        start_row = last_row + 1 if last_row >= 1 else 1
 
-    # 3. Capture the formatting from the last existing row in the master table
-    dst_formats = {}
-    if last_row > 0:
-        for col_idx in range(1, len(BASE_COLS) + 1):
-            dst_formats[col_idx] = ws_dst.cell(row=last_row, column=col_idx).number_format
-    else:
-        # If the master table is empty, default to 'General' format
-        for col_idx in range(1, len(BASE_COLS) + 1):
-            dst_formats[col_idx] = 'General'
+        # 3. Capture the formatting from the last existing row in the master table
+        dst_formats = {}
+        if last_row > 0:
+            for col_idx in range(1, len(BASE_COLS) + 1):
+                dst_formats[col_idx] = ws_dst.cell(row=last_row, column=col_idx).number_format
+        else:
+            # If the master table is empty, default to 'General' format
+            for col_idx in range(1, len(BASE_COLS) + 1):
+                dst_formats[col_idx] = 'General'
 
-    # 4. Append filtered data and apply formatting
-    for r_offset, row_data in enumerate(combined_df.itertuples(index=False), start=0):
-        r = start_row + r_offset
+        # 4. Append filtered data and apply formatting
+        for r_offset, row_data in enumerate(combined_df.itertuples(index=False), start=0):
+            r = start_row + r_offset
 
-        # This part handles the automatic row numbering in column A
-        if r == 1:
-            ws_dst.cell(row=r, column=1, value=1)
-        else:
-            prev_val = ws_dst.cell(row=r-1, column=1).value
-            try:
-                val_int = int(prev_val) if prev_val is not None and str(prev_val).strip() != '' else 0
-            except (ValueError, TypeError):
-                val_int = 0
-            ws_dst.cell(row=r, column=1, value=val_int + 1)
-
-        # Paste the values from the filtered data and apply formatting
-        for c_offset, value in enumerate(row_data, start=1):
-            # This handles the column mapping from BASE_COLS to the master table
-            cell = ws_dst.cell(row=r, column=c_offset + 1, value=value)
-            cell.number_format = dst_formats.get(c_offset + 1, 'General')
-
-            # Special handling for dates
-            if isinstance(value, datetime) or isinstance(value, date):
-                cell.number_format = 'm/dd/yyyy'
+            # This part handles the automatic row numbering in column A
+            if r == 1:
+                ws_dst.cell(row=r, column=1, value=1)
+            else:
+                prev_val = ws_dst.cell(row=r-1, column=1).value
+                try:
+                    val_int = int(prev_val) if prev_val is not None and str(prev_val).strip() != '' else 0
+                except (ValueError, TypeError):
+                    val_int = 0
+                ws_dst.cell(row=r, column=1, value=val_int + 1)
+
+            # Paste the values from the filtered data and apply formatting
+            for c_offset, value in enumerate(row_data, start=1):
+                # This handles the column mapping from BASE_COLS to the master table
+                cell = ws_dst.cell(row=r, column=c_offset + 1, value=value)
+                cell.number_format = dst_formats.get(c_offset + 1, 'General')
+
+                # Special handling for dates
+                if isinstance(value, datetime) or isinstance(value, date):
+                    cell.number_format = 'm/dd/yyyy'
 
-    end_row = start_row + len(combined_df) - 1
+        end_row = start_row + len(combined_df) - 1
 
-    # 5. Add formulas to the newly appended rows
-    # The formulas are added to the columns to the right of the pasted data
-    add_formulas(dst, start_row, end_row)
+        # 5. Add the derived columns to the newly appended rows
+        # They go in the columns to the right of the pasted data
+        cached = add_formulas(ws_dst, start_row, end_row)
 
     try:
-        wb_dst.save(dst)
+        with span('save', rows=len(combined_df)):
+            wb_dst.save(dst)
+            if cached is not None:
+                from ercot_columns import fill_cached_values
+                fill_cached_values(dst, {ws_dst.title: cached})
         print(f"SUCCESS: Appended {len(combined_df)} rows and formulas to {DST_MASTER_TABLE_NAME}.")
     except PermissionError:
         print("ERROR: Could not save destination file. Please close it if it's open and re-run.")
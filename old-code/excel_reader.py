@@ -4,12 +4,12 @@ from datetime import datetime
 try:
     import requests
     from dotenv import load_dotenv
-    from graph_auth import acquire_graph_token
+    from graph_client import default_client
     load_dotenv()
 except Exception:
     # Allow excel_reader to be imported even if SharePoint deps are missing
     requests = None
-    acquire_graph_token = None
+    default_client = None
 
 import re
 from datetime import date as date_today
@@ -18,7 +18,11 @@ from typing import Optional, Dict, List, Tuple
 
 import pandas as pd
 from tempfile import NamedTemporaryFile
-from openpyxl import load_workbook
+
+from download_cache import default_cache
+from run_metrics import spanned
+from sheet_select import resolve_sheet
+from transform_columns import col_e_zone_load_columns, dates_column, terms_column
 # Master table schema (17 columns)
 MASTER_COLS: List[str] = [
     'ID', 'Price_Date', 'Date', 'Zone', 'Load', 'REP1', 'Term', 'Min_MWh', 'Max_MWh',
@@ -46,6 +50,14 @@ def _max_id_from_master(master_path: Optional[Path]) -> int:
     p = Path(master_path)
     if not p.exists():
         return 0
+    try:
+        # An in-sync Parquet mirror already knows the max ID
+        from master_mirror import MasterMirror
+        mirror = MasterMirror(p)
+        if mirror.in_sync():
+            return mirror.max_id()
+    except Exception:
+        pass
     try:
         df = pd.read_excel(p, usecols=[0])  # Column A expected to be ID
         if df.empty:
@@ -57,90 +69,19 @@ def _max_id_from_master(master_path: Optional[Path]) -> int:
         return 0
 
 
-def _parse_zone_from_col_e(val: str) -> str:
-    """Extract the word that precedes the word 'zone' in Column E and map per spec.
-    If no such pattern exists, return 'NA'.
-    Mapping: North->NORTH, West->WEST, South->SOUTH, Houston->COAST, else NA.
-    """
-    s = str(val or '').strip()
-    if not s:
-        return 'NA'
-    # Strictly require '<word> zone' pattern
-    m = re.search(r"\b([A-Za-z]+)\s+zone\b", s, flags=re.IGNORECASE)
-    if not m:
-        return 'NA'
-    w = m.group(1).strip().lower()
-    if w == 'north':
-        return 'NORTH'
-    if w == 'west':
-        return 'WEST'
-    if w == 'south':
-        return 'SOUTH'
-    if w == 'houston':
-        return 'COAST'
-    return 'NA'
-
-
-def _parse_load_from_col_e(val: str) -> str:
-    """Extract HIGH/MED/LOW from Column E text; else NA."""
-    s = str(val or '').lower()
-    if 'high' in s:
-        return 'HIGH'
-    if 'med' in s:
-        return 'MED'
-    if 'low' in s:
-        return 'LOW'
-    return 'NA'
-
-
-def _unhide_and_save_matrix_table_only(xlsx_path: Path) -> Path:
-    """Create a temporary copy of the workbook with only 'Matrix Table' visible.
-    - If the sheet is hidden, unhide it.
-    - Hide all other sheets, keeping 'Matrix Table' active.
-    Returns path to the temporary workbook copy.
+@spanned('read_sheet', rows=lambda sheets: sum(len(df) for df in sheets.values()))
+def _read_matrix_table_only(input_path: Path) -> Dict[str, pd.DataFrame]:
+    """Return a dict with only the 'Matrix Table' sheet as DataFrame.
+    The sheet is located in the workbook zip by name and only its rows are parsed;
+    hidden state does not matter for reading, so no unhidden copy is written.
     """
-    wb = load_workbook(xlsx_path)
-    target = None
-    for ws in wb.worksheets:
-        if str(ws.title).strip().lower() == 'matrix table':
-            target = ws
-            break
-    if target is None:
-        # Try fuzzy match
-        for ws in wb.worksheets:
-            title = str(ws.title).strip().lower()
-            if 'matrix' in title and 'table' in title:
-                target = ws
-                break
+    target, _ = resolve_sheet(input_path, 'matrix table')
     if target is None:
         raise ValueError("Sheet 'Matrix Table' not found in workbook")
-
-    # Unhide target, hide others
-    for ws in wb.worksheets:
-        ws.sheet_state = 'hidden' if ws is not target else 'visible'
-    wb.active = wb.sheetnames.index(target.title)
-
-    tmp_path = xlsx_path.parent / f".__matrix_only_{xlsx_path.name}"
-    wb.save(tmp_path)
-    wb.close()
-    return tmp_path
-
-
-def _read_matrix_table_only(input_path: Path) -> Dict[str, pd.DataFrame]:
-    """Return a dict with only the 'Matrix Table' sheet as DataFrame, unhidden.
-    Uses openpyxl to unhide and saves a temporary copy, then reads that sheet only.
-    """
-    tmp_copy = _unhide_and_save_matrix_table_only(input_path)
-    try:
-        # Read only the 'Matrix Table' sheet
-        return pd.read_excel(tmp_copy, sheet_name=['Matrix Table'])
-    except Exception:
-        # Fallback to fuzzy - read all and keep the one containing both 'matrix' and 'table'
-        sheets = pd.read_excel(tmp_copy, sheet_name=None)
-        filtered = {name: df for name, df in sheets.items() if 'matrix' in str(name).lower() and 'table' in str(name).lower()}
-        return filtered if filtered else sheets
+    return pd.read_excel(input_path, sheet_name=[target])
 
 
+@spanned('transform', rows=len)
 def transform_input_to_master_df(
     input_path: Path | str,
     *,
@@ -168,7 +109,7 @@ def transform_input_to_master_df(
     if not input_path.exists():
         raise FileNotFoundError(f"Input Excel not found: {input_path}")
 
-    # Read only the 'Matrix Table' sheet (unhide if necessary)
+    # Read only the 'Matrix Table' sheet (hidden or not)
     sheets = _read_matrix_table_only(input_path)
     if not sheets:
         return pd.DataFrame(columns=MASTER_COLS)
@@ -203,32 +144,20 @@ def transform_input_to_master_df(
             continue
 
         # Column G: Term from Column D
-        def term_to_int(v):
-            try:
-                iv = int(float(v))
-                return iv if iv in TARGET_TERMS else None
-            except Exception:
-                m = re.search(r"(\d+)", str(v))
-                if m:
-                    iv = int(m.group(1))
-                    return iv if iv in TARGET_TERMS else None
-                return None
-
         if cD is not None:
-            terms = work_df[cD].map(term_to_int)
+            terms = terms_column(work_df[cD])
         else:
             terms = pd.Series([None] * len(work_df), index=work_df.index)
 
         # Column C: Start Date from Column J
         if cJ is not None:
-            start_dates = pd.to_datetime(work_df[cJ], errors='coerce').dt.date
+            start_dates = dates_column(work_df[cJ])
         else:
             start_dates = pd.Series([pd.NaT] * len(work_df), index=work_df.index)
 
         # Column D/E: Zone and Load from Column E text
         if cE is not None:
-            zone_series = work_df[cE].map(_parse_zone_from_col_e)
-            load_series = work_df[cE].map(_parse_load_from_col_e)
+            zone_series, load_series = col_e_zone_load_columns(work_df[cE])
         else:
             zone_series = pd.Series(['NA'] * len(work_df), index=work_df.index)
             load_series = pd.Series(['NA'] * len(work_df), index=work_df.index)
@@ -292,10 +221,10 @@ def transform_input_to_master_df(
 # --- SharePoint helpers (download master table with rename-on-exist) ---
 
 def _download_sharepoint_file(file_name: str, download_path: Path | str) -> Optional[Path]:
-    """Download a file from SharePoint using Microsoft Graph.
+    """Download a file from SharePoint using Microsoft Graph (shared GraphDriveClient).
     Mirrors excel_processor.download_sharepoint_file but scoped here.
     """
-    if requests is None or acquire_graph_token is None:
+    if requests is None or default_client is None:
         print("SharePoint dependencies not available. Install requests, python-dotenv, and configure graph_auth.")
         return None
 
@@ -310,39 +239,8 @@ def _download_sharepoint_file(file_name: str, download_path: Path | str) -> Opti
         print("ERROR: Missing SharePoint configuration in .env (TENANT_ID, CLIENT_ID, CLIENT_SECRET, SITE_HOSTNAME, SITE_PATH, SHAREPOINT_UPLOAD_FOLDER)")
         return None
 
-    download_path = Path(download_path)
     try:
-        token = acquire_graph_token(tenant_id, client_id, client_secret)
-        headers = {"Authorization": f"Bearer {token['access_token']}"}
-
-        # Get site id
-        site_url = f"https://graph.microsoft.com/v1.0/sites/{site_hostname}:/sites/{site_path}"
-        site_resp = requests.get(site_url, headers=headers)
-        site_resp.raise_for_status()
-        site_id = site_resp.json()['id']
-
-        # Get drive id
-        drive_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
-        drive_resp = requests.get(drive_url, headers=headers)
-        drive_resp.raise_for_status()
-        drive_id = drive_resp.json()['id']
-
-        # Build download URL
-        file_path = f"{sharepoint_folder}/{file_name}".replace('//','/')
-        if file_path.startswith('/'):
-            file_path = file_path[1:]
-        file_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{file_path}:/content"
-
-        resp = requests.get(file_url, headers=headers)
-        if resp.status_code == 200:
-            download_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(download_path, 'wb') as f:
-                f.write(resp.content)
-            print(f"Downloaded SharePoint file to: {download_path}")
-            return download_path
-        else:
-            print(f"Failed to download. Status: {resp.status_code}\n{resp.text}")
-            return None
+        return default_client().download(file_name, download_path, sharepoint_folder)
     except Exception as e:
         print(f"Error during SharePoint download: {e}")
         return None
@@ -352,8 +250,9 @@ def ensure_master_table_downloaded(dest_dir: Path | str,
                                    master_file_name: str = 'Master-Table.xlsx',
                                    parent_folder_override: Optional[str] = None) -> Optional[Path]:
     """Ensure the master table is downloaded into dest_dir.
-    - If a file with that name already exists, rename it by appending a timestamp.
-    - Then download fresh from SharePoint.
+    - If a file with that name already exists, rename it by appending a timestamp
+      (copies that came from the download cache are simply replaced).
+    - Then download from SharePoint (a 304 on an unchanged file reuses the cached copy).
     - If parent_folder_override is provided, temporarily override SHAREPOINT_UPLOAD_FOLDER.
     Returns the path to the downloaded file, or None on failure.
     """
@@ -361,8 +260,11 @@ def ensure_master_table_downloaded(dest_dir: Path | str,
     dest_dir.mkdir(parents=True, exist_ok=True)
     out_path = dest_dir / master_file_name
 
-    # If file exists, rename it with date-time suffix
-    if out_path.exists():
+    # If file exists, rename it with date-time suffix (unless it is a copy from the download cache)
+    cache = default_cache()
+    if out_path.exists() and cache is not None and cache.holds(out_path):
+        print(f"Existing master is kept in the download cache; replacing: {out_path}")
+    elif out_path.exists():
         ts = datetime.now().strftime('%Y%m%d_%H%M%S')
         renamed = out_path.with_name(f"{out_path.stem}_{ts}{out_path.suffix}")
         out_path.rename(renamed)
@@ -0,0 +1,352 @@
+"""
+Local stand-in for the Microsoft Graph endpoints the SharePoint helpers use.
+
+Serves one site with one default drive from an in-memory {path: bytes} store and
+records every request, so tests can run the Graph client end to end without a
+tenant:
+
+    with FakeGraph({'Folder/file.xlsx': b'...'}) as fake:
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url,
+                                  token_provider=fake.token_provider)
+
+Supported: GET sites/<host>:/sites/<path>, GET sites/<id>/drive,
+GET/PUT drives/<id>/root:/<path>:/content (GET with ETag/If-None-Match), upload sessions
+(POST .../root:/<path>:/createUploadSession, then PUT/GET on the uploadUrl; like Graph,
+ranges out of order get a 416) and
+GET drives/<id>/root/delta (changes to self.files since a token, paged by delta_page_size).
+Setting throttle = N answers the next N file/delta/upload requests with 429 + Retry-After.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SITE_ID = 'fake-site-id'
+DRIVE_ID = 'fake-drive-id'
+
+
+class FakeGraph:
+    """Threaded HTTP server answering like Graph for one site/drive."""
+
+    def __init__(self, files: Optional[Dict[str, bytes]] = None, token: str = 'fake-token',
+                 latency: float = 0.0):
+        self.files: Dict[str, bytes] = dict(files or {})
+        self.token = token
+        # Seconds each content request takes, to make sequential vs concurrent visible
+        self.latency = latency
+        # Item paths whose downloads drop the connection halfway through the body
+        self.truncate: set = set()
+        # Upload sessions: id -> {'item', 'total', 'chunks': {start: bytes}}
+        self.sessions: Dict[str, dict] = {}
+        # Range start offsets whose first upload attempt drops the connection
+        self.fail_ranges: set = set()
+        self.requests: List[Tuple[str, str]] = []
+        self.tokens_issued = 0
+        # Delta: change counter, path -> (seq of last change, etag or None once deleted)
+        self._seq = 0
+        self._versions: Dict[str, Tuple[int, Optional[str]]] = {}
+        # Items per delta page (0: everything in one page); expire_delta = N answers the next N
+        # delta requests with 410 (True: the next one)
+        self.delta_page_size = 0
+        self.expire_delta = False
+        # lastModifiedDateTime overrides per item; by default one second per change sequence
+        self.modified: Dict[str, str] = {}
+        # Throttling: the next `throttle` drive requests get 429 with Retry-After (503 without
+        # a header when retry_after is None); max_active is the peak of concurrent downloads
+        self.throttle = 0
+        self.retry_after: Optional[str] = '1'
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1.0'
+
+    def token_provider(self) -> Dict[str, str]:
+        """Stand-in for MSAL: hands out the token the server accepts."""
+        with self._lock:
+            self.tokens_issued += 1
+        return {'access_token': self.token, 'expires_in': 3600, 'token_type': 'Bearer'}
+
+    def etag(self, item: str) -> str:
+        """ETag of a stored file (changes whenever its content does)."""
+        return '"{%s},1"' % hashlib.sha1(self.files[item]).hexdigest()
+
+    @staticmethod
+    def item_id(item: str) -> str:
+        return 'item-' + hashlib.sha1(item.encode()).hexdigest()[:12]
+
+    def _sync_versions(self) -> int:
+        """Record files added, changed or removed since the last delta request; returns the token."""
+        with self._lock:
+            for item in sorted(set(self.files) | set(self._versions)):
+                etag = self.etag(item) if item in self.files else None
+                if item not in self._versions or self._versions[item][1] != etag:
+                    if etag is None and self._versions[item][1] is None:
+                        continue
+                    self._seq += 1
+                    self._versions[item] = (self._seq, etag)
+            return self._seq
+
+    def delta_item(self, item: str) -> dict:
+        folder, _, name = item.rpartition('/')
+        entry = {'id': self.item_id(item), 'name': name,
+                 'parentReference': {'path': '/drive/root:' + (f'/{folder}' if folder else '')}}
+        etag = self._versions[item][1]
+        if etag is None:
+            entry['deleted'] = {'state': 'deleted'}
+        else:
+            modified = datetime(2025, 1, 1) + timedelta(seconds=self._versions[item][0])
+            entry.update({'eTag': etag, 'cTag': etag.replace('{', 'c:{'), 'file': {},
+                          'size': len(self.files[item]),
+                          'lastModifiedDateTime': self.modified.get(item) or modified.isoformat() + 'Z'})
+        return entry
+
+    def delta_page(self, query: Dict[str, List[str]]) -> Tuple[int, dict]:
+        """(status, body) for a delta request with the given query parameters."""
+        seq = self._sync_versions()
+        token = query.get('token', ['0'])[0]
+        if self.expire_delta or not token.isdigit() or int(token) > seq:
+            self.expire_delta = max(0, self.expire_delta - 1)
+            return 410, {'error': {'code': 'resyncRequired'}}
+        since, skip = int(token), int(query.get('skip', ['0'])[0])
+        changed = sorted((s, item) for item, (s, etag) in self._versions.items()
+                         if s > since and (etag is not None or since))
+        size = self.delta_page_size or len(changed) or 1
+        page = [self.delta_item(item) for _, item in changed[skip:skip + size]]
+        body = {'value': page}
+        if skip + size < len(changed):
+            body['@odata.nextLink'] = self._delta_url(since, skip + size)
+        else:
+            body['@odata.deltaLink'] = self._delta_url(seq)
+        return 200, body
+
+    def _delta_url(self, token: int, skip: int = 0) -> str:
+        url = f'{self.base_url}/drives/{DRIVE_ID}/root/delta?token={token}'
+        return url + (f'&skip={skip}' if skip else '')
+
+    def _take_throttle(self) -> bool:
+        with self._lock:
+            if self.throttle <= 0:
+                return False
+            self.throttle -= 1
+            return True
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def count(self, kind: str) -> int:
+        """Requests seen of one kind: 'site', 'drive', 'content'."""
+        with self._lock:
+            return sum(1 for k, _ in self.requests if k == kind)
+
+    def __enter__(self) -> 'FakeGraph':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- Request handling ---
+
+    def _record(self, kind: str, path: str) -> None:
+        with self._lock:
+            self.requests.append((kind, path))
+
+    def missing_ranges(self, sid: str) -> List[str]:
+        """nextExpectedRanges for an upload session."""
+        session = self.sessions[sid]
+        if session['total'] is None:
+            return ['0-']
+        missing, pos = [], 0
+        for start in sorted(session['chunks']):
+            if start > pos:
+                missing.append(f'{pos}-{start - 1}')
+            pos = max(pos, start + len(session['chunks'][start]))
+        if pos < session['total']:
+            missing.append(f'{pos}-')
+        return missing
+
+    def route(self, method: str, path: str) -> Tuple[str, Optional[str]]:
+        """(kind, drive item path or upload session id or None) for a request path."""
+        if path.startswith('/upload/'):
+            return ('upload_status' if method == 'GET' else 'upload_range'), path[len('/upload/'):]
+        rest = path.split('/v1.0/', 1)[-1]
+        if rest.startswith('sites/') and rest.endswith('/drive'):
+            return 'drive', None
+        if rest.startswith('sites/'):
+            return 'site', None
+        if rest == f'drives/{DRIVE_ID}/root/delta':
+            return 'delta', None
+        prefix = f'drives/{DRIVE_ID}/root:/'
+        if rest.startswith(prefix) and rest.endswith(':/content'):
+            return 'content', unquote(rest[len(prefix):-len(':/content')])
+        if rest.startswith(prefix) and rest.endswith(':/createUploadSession'):
+            return 'upload_session', unquote(rest[len(prefix):-len(':/createUploadSession')])
+        return 'unknown', None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _throttled(self, kind: str) -> bool:
+                if kind in ('site', 'drive', 'upload_status') or not fake._take_throttle():
+                    return False
+                self.send_response(429 if fake.retry_after is not None else 503)
+                if fake.retry_after is not None:
+                    self.send_header('Retry-After', fake.retry_after)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return True
+
+            def _authorized(self) -> bool:
+                if self.headers.get('Authorization') != f'Bearer {fake.token}':
+                    self._send(401, b'{"error": {"code": "InvalidAuthenticationToken"}}')
+                    return False
+                return True
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                kind, item = fake.route('GET', path)
+                fake._record(kind, path)
+                if kind == 'upload_status':
+                    self._upload_status(item)
+                    return
+                if not self._authorized() or self._throttled(kind):
+                    return
+                if kind == 'delta':
+                    status, body = fake.delta_page(parse_qs(urlsplit(self.path).query))
+                    self._send(status, json.dumps(body).encode())
+                elif kind == 'site':
+                    self._send(200, f'{{"id": "{SITE_ID}"}}'.encode())
+                elif kind == 'drive':
+                    self._send(200, f'{{"id": "{DRIVE_ID}"}}'.encode())
+                elif kind == 'content' and item in fake.files and item in fake.truncate:
+                    body = fake.files[item]
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                elif kind == 'content' and item in fake.files:
+                    etag = fake.etag(item)
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    fake._enter()
+                    try:
+                        time.sleep(fake.latency)
+                        self.send_response(200)
+                        self.send_header('ETag', etag)
+                        self.send_header('Content-Type', 'application/octet-stream')
+                        self.send_header('Content-Length', str(len(fake.files[item])))
+                        self.end_headers()
+                        self.wfile.write(fake.files[item])
+                    finally:
+                        fake._leave()
+                else:
+                    self._send(404, b'{"error": {"code": "itemNotFound"}}')
+
+            def _upload_status(self, sid: str):
+                if sid not in fake.sessions:
+                    self._send(404, b'{"error": {"code": "itemNotFound"}}')
+                    return
+                self._send(200, json.dumps({'nextExpectedRanges': fake.missing_ranges(sid)}).encode())
+
+            def _upload_range(self, sid: str, body: bytes):
+                # Like Graph, the pre-authenticated uploadUrl rejects an Authorization header
+                if sid not in fake.sessions or self.headers.get('Authorization'):
+                    self._send(404 if sid not in fake.sessions else 401, b'{"error": {"code": "invalidRequest"}}')
+                    return
+                rng = self.headers.get('Content-Range', '')
+                start = int(rng.split()[1].split('-')[0])
+                if start in fake.fail_ranges:
+                    fake.fail_ranges.discard(start)
+                    self.close_connection = True
+                    return
+                session = fake.sessions[sid]
+                # Graph takes the fragments of a session in order only
+                expected = fake.missing_ranges(sid)
+                if expected and start != int(expected[0].split('-')[0]):
+                    self._send(416, json.dumps({'error': {'code': 'invalidRange'},
+                                                'nextExpectedRanges': expected}).encode())
+                    return
+                session['chunks'][start] = body
+                if fake.missing_ranges(sid):
+                    self._send(202, json.dumps({'nextExpectedRanges': fake.missing_ranges(sid)}).encode())
+                    return
+                data = b''.join(session['chunks'][k] for k in sorted(session['chunks']))
+                created = session['item'] not in fake.files
+                fake.files[session['item']] = data
+                del fake.sessions[sid]
+                self._send(201 if created else 200, json.dumps({'name': session['item'].rsplit('/', 1)[-1],
+                                                                'size': len(data)}).encode())
+
+            def do_POST(self):
+                path = urlsplit(self.path).path
+                kind, item = fake.route('POST', path)
+                fake._record(kind, path)
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not self._authorized():
+                    return
+                if kind != 'upload_session':
+                    self._send(404, b'{"error": {"code": "itemNotFound"}}')
+                    return
+                sid = uuid.uuid4().hex
+                fake.sessions[sid] = {'item': item, 'total': None, 'chunks': {}}
+                host, port = fake._server.server_address[:2]
+                self._send(200, json.dumps({'uploadUrl': f'http://{host}:{port}/upload/{sid}',
+                                            'nextExpectedRanges': ['0-']}).encode())
+
+            def do_PUT(self):
+                path = urlsplit(self.path).path
+                kind, item = fake.route('PUT', path)
+                fake._record(kind, path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self._throttled(kind):
+                    return
+                if kind == 'upload_range':
+                    if item in fake.sessions and fake.sessions[item]['total'] is None:
+                        fake.sessions[item]['total'] = int(self.headers['Content-Range'].rsplit('/', 1)[1])
+                    self._upload_range(item, body)
+                    return
+                if not self._authorized():
+                    return
+                if kind != 'content':
+                    self._send(404, b'{"error": {"code": "itemNotFound"}}')
+                    return
+                created = item not in fake.files
+                fake.files[item] = body
+                self._send(201 if created else 200, f'{{"name": "{item.rsplit("/", 1)[-1]}"}}'.encode())
+
+        return Handler
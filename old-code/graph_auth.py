@@ -25,10 +25,9 @@ from __future__ import annotations
 import os
 from typing import Dict, Optional
 
-try:
-    import msal  # type: ignore
-except Exception:
-    msal = None  # defer import error to runtime with friendly message
+# Imported by _require_msal() when a client app is first built: msal takes ~0.3s to
+# import, which commands that never authenticate should not pay
+msal = None
 
 GRAPH_DEFAULT_SCOPE = ["https://graph.microsoft.com/.default"]
 
@@ -40,21 +39,25 @@ class MissingConfigError(RuntimeError):
 
 
 def _require_msal():
-    if msal is None:
+    global msal
+    if msal is not None:
+        return
+    try:
+        import msal as msal_module  # type: ignore
+    except Exception:
         raise MissingDependencyError(
             "The 'msal' package is required. Install with: pip install msal"
         )
+    msal = msal_module
 
 
-def acquire_graph_token(
+def confidential_client_app(
     tenant_id: Optional[str] = None,
     client_id: Optional[str] = None,
     client_secret: Optional[str] = None,
-    scopes = GRAPH_DEFAULT_SCOPE,
-) -> Dict[str, str]:
-    """Acquire an app-only access token for Microsoft Graph.
-
-    Returns the token dict from MSAL (contains 'access_token', 'expires_in', etc.).
+):
+    """Create the MSAL confidential client app. Keep it around: its token cache lets
+    repeated acquire_graph_token(app=...) calls reuse a token until it expires.
     Raises MissingConfigError if env/config is incomplete.
     """
     _require_msal()
@@ -69,12 +72,30 @@ def acquire_graph_token(
         )
 
     authority = f"https://login.microsoftonline.com/{tenant_id}"
-    app = msal.ConfidentialClientApplication(
+    return msal.ConfidentialClientApplication(
         client_id=client_id,
         client_credential=client_secret,
         authority=authority,
     )
 
+
+def acquire_graph_token(
+    tenant_id: Optional[str] = None,
+    client_id: Optional[str] = None,
+    client_secret: Optional[str] = None,
+    scopes = GRAPH_DEFAULT_SCOPE,
+    app = None,
+) -> Dict[str, str]:
+    """Acquire an app-only access token for Microsoft Graph.
+
+    Pass app (from confidential_client_app) to reuse its token cache; otherwise a new
+    app is created from the credentials/env.
+    Returns the token dict from MSAL (contains 'access_token', 'expires_in', etc.).
+    Raises MissingConfigError if env/config is incomplete.
+    """
+    if app is None:
+        app = confidential_client_app(tenant_id, client_id, client_secret)
+
     result = app.acquire_token_for_client(scopes=scopes)
 
     # MSAL returns {'error': '...', 'error_description': '...'} on failure
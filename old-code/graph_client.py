@@ -0,0 +1,360 @@
+"""
+Shared Microsoft Graph client for the SharePoint document library.
+
+Every SharePoint helper used to acquire a fresh token (new MSAL app), look up the
+site ID and then the drive ID before touching a single file, i.e. three extra
+round trips per file. GraphDriveClient does that work once:
+- one MSAL app per client; the access token is reused until shortly before
+  its expires_in runs out (and refreshed once if Graph answers 401)
+- site and drive IDs are memoized per client, and optionally on disk with a TTL
+  (GRAPH_ID_CACHE=<path>, GRAPH_ID_CACHE_TTL=<seconds>, default one day), so later
+  runs skip the lookups entirely
+- one requests.Session keeps connections to Graph alive between calls
+- from_env() clients download through the content-addressed cache in
+  download_cache.py (conditional requests, one blob per distinct file)
+- every request goes through graph_transport.GraphTransport: 429/503/504 are
+  retried after Retry-After or a jittered backoff, and in-flight requests are
+  capped per tenant (client.stats counts retries and throttled time)
+
+default_client() returns one process-wide client built from the .env settings
+(TENANT_ID, CLIENT_ID, CLIENT_SECRET, SITE_HOSTNAME, SITE_PATH), so downloading
+the master plus N supplier files costs N+1 content requests plus at most one
+site and one drive lookup per process.
+
+For tests, pass base_url pointing at a local server and a token_provider callable
+returning a token dict ({'access_token': ..., 'expires_in': ...}) instead of MSAL.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import quote
+
+import requests
+
+from download_cache import DownloadCache, default_cache
+from graph_auth import GRAPH_DEFAULT_SCOPE, MissingConfigError, acquire_graph_token, confidential_client_app
+from graph_transport import GraphTransport
+from run_metrics import note, spanned
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
+# Refresh tokens this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 120
+
+ID_CACHE_VERSION = 1
+ID_CACHE_TTL = int(os.getenv("GRAPH_ID_CACHE_TTL", str(24 * 3600)))
+
+HTTP_POOL_SIZE = 16
+
+# Downloads are streamed to disk in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Larger uploads go through a resumable upload session (Graph's simple PUT limit is 4 MB)
+UPLOAD_SIMPLE_LIMIT = 4 * 1024 * 1024
+
+CONFIG_VARS = ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET", "SITE_HOSTNAME", "SITE_PATH")
+
+
+def drive_item_path(folder: Optional[str], file_name: str) -> str:
+    """'<folder>/<file_name>' without duplicate or leading slashes, as used in root:/...: URLs."""
+    path = f"{folder or ''}/{file_name}".replace('//', '/')
+    return path[1:] if path.startswith('/') else path
+
+
+class GraphDriveClient:
+    """Token, site/drive IDs and HTTP session for one SharePoint site's default drive."""
+
+    def __init__(self, site_hostname: str, site_path: str,
+                 tenant_id: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None,
+                 token_provider: Optional[Callable[[], Dict[str, str]]] = None,
+                 base_url: str = GRAPH_BASE_URL,
+                 session: Optional[requests.Session] = None,
+                 id_cache_path: Optional[Path | str] = None,
+                 id_cache_ttl: int = ID_CACHE_TTL,
+                 cache: Optional[DownloadCache] = None,
+                 transport: Optional[GraphTransport] = None):
+        self.site_hostname = site_hostname
+        self.site_path = site_path
+        self.base_url = base_url.rstrip('/')
+        self.session = session or self._new_session()
+        self.id_cache_path = Path(id_cache_path) if id_cache_path else None
+        self.id_cache_ttl = id_cache_ttl
+        # Content-addressed download cache (None: always transfer the full file)
+        self.cache = cache
+        # Retries/backoff and the in-flight cap are shared by all clients of one tenant
+        self.transport = transport or GraphTransport(self.session, tenant=tenant_id or site_hostname)
+
+        if token_provider is None:
+            if not all([tenant_id, client_id, client_secret]):
+                raise MissingConfigError("TENANT_ID, CLIENT_ID and CLIENT_SECRET must be set.")
+            token_provider = self._msal_provider(tenant_id, client_id, client_secret)
+        self._token_provider = token_provider
+        self._token: Optional[Dict[str, str]] = None
+        self._token_expires = 0.0
+        self._site_id: Optional[str] = None
+        self._drive_id: Optional[str] = None
+        self._lock = threading.RLock()
+        # Round trips made by this client, by kind ('token', 'site', 'drive', 'request')
+        self.calls: Dict[str, int] = {'token': 0, 'site': 0, 'drive': 0, 'request': 0}
+
+    @staticmethod
+    def _new_session() -> requests.Session:
+        # Enough pooled keep-alive connections for concurrent downloads on one client
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'GraphDriveClient':
+        """Client configured from the .env settings; raises MissingConfigError if any is missing."""
+        values = {name: os.getenv(name) for name in CONFIG_VARS}
+        missing = [name for name, v in values.items() if not v]
+        if missing:
+            raise MissingConfigError(f"Missing SharePoint configuration: {', '.join(missing)}")
+        kwargs.setdefault('id_cache_path', os.getenv("GRAPH_ID_CACHE") or None)
+        kwargs.setdefault('cache', default_cache())
+        return cls(values["SITE_HOSTNAME"], values["SITE_PATH"], tenant_id=values["TENANT_ID"],
+                   client_id=values["CLIENT_ID"], client_secret=values["CLIENT_SECRET"], **kwargs)
+
+    @staticmethod
+    def _msal_provider(tenant_id: str, client_id: str, client_secret: str) -> Callable[[], Dict[str, str]]:
+        # One MSAL app for the life of the client: its in-memory cache serves repeat requests
+        app = confidential_client_app(tenant_id, client_id, client_secret)
+
+        def provider() -> Dict[str, str]:
+            return acquire_graph_token(app=app, scopes=GRAPH_DEFAULT_SCOPE)
+        return provider
+
+    # --- Token ---
+
+    def token(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Current access token dict, fetched again only when (nearly) expired."""
+        with self._lock:
+            if force_refresh or self._token is None or time.time() >= self._token_expires:
+                token = self._token_provider()
+                self.calls['token'] += 1
+                self._token = token
+                self._token_expires = time.time() + float(token.get('expires_in', 3600)) - TOKEN_EXPIRY_MARGIN
+            return self._token
+
+    def headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = {"Authorization": f"Bearer {self.token()['access_token']}"}
+        if extra:
+            headers.update(extra)
+        return headers
+
+    # --- Requests ---
+
+    def url(self, path: str) -> str:
+        return path if path.startswith('http') else f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                **kwargs) -> requests.Response:
+        """Authenticated request on the shared session; a 401 refreshes the token and retries once."""
+        url = self.url(path)
+        resp = self.transport.send(method, url, headers=self.headers(headers), **kwargs)
+        self.calls['request'] += 1
+        if resp.status_code == 401:
+            resp.close()
+            self.token(force_refresh=True)
+            data = kwargs.get('data')
+            if hasattr(data, 'seek'):
+                data.seek(0)
+            resp = self.transport.send(method, url, headers=self.headers(headers), **kwargs)
+            self.calls['request'] += 1
+        return resp
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Transport counters: requests, retries, throttled, throttled_seconds, errors."""
+        return self.transport.stats
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request('PUT', path, **kwargs)
+
+    # --- Site and drive IDs ---
+
+    def _cache_key(self) -> str:
+        return f"{self.base_url}|{self.site_hostname}|{self.site_path}"
+
+    def _load_ids(self) -> bool:
+        if self.id_cache_path is None:
+            return False
+        try:
+            data = json.loads(self.id_cache_path.read_text())
+        except (OSError, ValueError):
+            return False
+        entry = data.get('sites', {}).get(self._cache_key()) if data.get('version') == ID_CACHE_VERSION else None
+        if not entry or time.time() - entry.get('saved', 0) > self.id_cache_ttl:
+            return False
+        self._site_id, self._drive_id = entry['site_id'], entry['drive_id']
+        return True
+
+    def _save_ids(self) -> None:
+        if self.id_cache_path is None:
+            return
+        try:
+            data = json.loads(self.id_cache_path.read_text())
+            if data.get('version') != ID_CACHE_VERSION:
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+        data['version'] = ID_CACHE_VERSION
+        data.setdefault('sites', {})[self._cache_key()] = {
+            'site_id': self._site_id, 'drive_id': self._drive_id, 'saved': time.time()}
+        try:
+            self.id_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.id_cache_path.with_name(f'.{self.id_cache_path.name}.tmp')
+            tmp.write_text(json.dumps(data, indent=1))
+            os.replace(tmp, self.id_cache_path)
+        except OSError as e:
+            print(f"Warning: could not save Graph ID cache {self.id_cache_path}: {e}")
+
+    def _resolve_ids(self) -> None:
+        if self._drive_id is not None or self._load_ids():
+            return
+        resp = self.get(f"sites/{self.site_hostname}:/sites/{self.site_path}")
+        self.calls['site'] += 1
+        if resp.status_code != 200:
+            raise RuntimeError(f"Failed to get site info. Status: {resp.status_code}\nResponse: {resp.text}")
+        site_id = resp.json()['id']
+        print(f"Found SharePoint site ID: {site_id}")
+
+        resp = self.get(f"sites/{site_id}/drive")
+        self.calls['drive'] += 1
+        if resp.status_code != 200:
+            raise RuntimeError(f"Failed to get drive info. Status: {resp.status_code}\nResponse: {resp.text}")
+        self._site_id, self._drive_id = site_id, resp.json()['id']
+        print(f"Found drive ID: {self._drive_id}")
+        self._save_ids()
+
+    def site_id(self) -> str:
+        with self._lock:
+            self._resolve_ids()
+            return self._site_id
+
+    def drive_id(self) -> str:
+        with self._lock:
+            self._resolve_ids()
+            return self._drive_id
+
+    def forget_ids(self) -> None:
+        """Drop memoized site/drive IDs (e.g. after the library was moved)."""
+        with self._lock:
+            self._site_id = self._drive_id = None
+
+    # --- Files ---
+
+    def item_url(self, folder: Optional[str], file_name: str, suffix: str = '') -> str:
+        """drives/<drive>/root:/<folder>/<file>:<suffix> for a file in the default drive."""
+        path = quote(drive_item_path(folder, file_name), safe='/')
+        return f"{self.base_url}/drives/{self.drive_id()}/root:/{path}:{suffix}"
+
+    @spanned('download')
+    def download(self, file_name: str, download_path: Path | str, folder: Optional[str] = None) -> Optional[Path]:
+        """Download folder/file_name to download_path. Returns the path, or None on failure.
+
+        The body is streamed in DOWNLOAD_CHUNK_SIZE chunks into a temp file, which is
+        renamed into place only once complete, so memory stays flat and a failed
+        transfer never leaves a partial workbook at download_path. With a cache, the
+        request carries If-None-Match and an unchanged file (304) is taken from the
+        cache without transferring it.
+        """
+        download_path = Path(download_path)
+        file_url = self.item_url(folder, file_name, '/content')
+        key = f"{self._cache_key()}|{drive_item_path(folder, file_name)}"
+        entry = self.cache.lookup(key) if self.cache is not None else None
+        conditional = {'If-None-Match': entry['etag']} if entry and entry.get('etag') else None
+        print(f"Downloading from SharePoint: {file_url}")
+        note(file=file_name)
+        with self.get(file_url, stream=True, headers=conditional) as resp:
+            if resp.status_code == 304 and entry:
+                self.cache.materialize(entry, download_path)
+                note(cached=True)
+                print(f"Unchanged on SharePoint (ETag match); using cached copy: {download_path}")
+                return download_path
+            if resp.status_code != 200:
+                print(f"Failed to download file from SharePoint. Status: {resp.status_code}")
+                print(f"Response: {resp.text}")
+                return None
+            download_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.cache is not None:
+                tmp = self.cache.temp_path(download_path.name)
+            else:
+                tmp = download_path.with_name(f'.{download_path.name}.part')
+            digest = hashlib.sha256()
+            t0 = time.perf_counter()
+            n_bytes = 0
+            try:
+                with open(tmp, 'wb') as f:
+                    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        n_bytes += len(chunk)
+                if self.cache is not None:
+                    entry = self.cache.store(key, tmp, digest.hexdigest(), resp.headers.get('ETag'))
+                    self.cache.materialize(entry, download_path)
+                else:
+                    os.replace(tmp, download_path)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        elapsed = max(time.perf_counter() - t0, 1e-9)
+        note(bytes=n_bytes)
+        print(f"Successfully downloaded from SharePoint: {download_path} "
+              f"({n_bytes / 1e6:.1f} MB in {elapsed:.2f}s, {n_bytes / 1e6 / elapsed:.1f} MB/s)")
+        return download_path
+
+    @spanned('upload')
+    def upload(self, local_path: Path | str, remote_name: str, folder: Optional[str] = None) -> bool:
+        """Upload local_path as folder/remote_name (overwrites). Returns True on success.
+
+        Files up to UPLOAD_SIMPLE_LIMIT go in one PUT streamed from disk; larger ones use
+        a resumable upload session (graph_upload.py).
+        """
+        size = Path(local_path).stat().st_size
+        note(file=remote_name, bytes=size)
+        if size > UPLOAD_SIMPLE_LIMIT:
+            from graph_upload import UploadSession
+            return UploadSession(self, local_path, remote_name, folder).run()
+
+        with open(local_path, 'rb') as f:
+            resp = self.put(self.item_url(folder, remote_name, '/content'), data=f,
+                            headers={"Content-Type": "application/octet-stream"})
+        if resp.status_code in (200, 201):
+            print(f"Successfully uploaded to: {drive_item_path(folder, remote_name)}")
+            return True
+        print(f"Failed to upload. Status: {resp.status_code}\n{resp.text}")
+        return False
+
+
+_default_client: Optional[GraphDriveClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> GraphDriveClient:
+    """The process-wide client built from the environment (raises MissingConfigError)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = GraphDriveClient.from_env()
+        return _default_client
+
+
+def reset_default_client() -> None:
+    """Forget the process-wide client, e.g. after the .env settings changed."""
+    global _default_client
+    with _default_lock:
+        _default_client = None
@@ -0,0 +1,217 @@
+"""
+Watch a SharePoint folder for new or changed supplier files with Graph delta queries.
+
+Instead of listing the input folder (or editing the Hudson file name into the
+scripts), DeltaWatcher asks Graph only for what changed since the last poll:
+- GET drives/<drive>/root/delta returns changed driveItems page by page
+  (@odata.nextLink) and ends with an @odata.deltaLink for the next poll
+- the delta link is saved in a small JSON state file, so a restarted watcher
+  continues where it stopped instead of reprocessing the folder
+- only files under the watched folder with a supplier suffix (.xlsm/.xlsx) are
+  kept; folders, deleted items and ignored names (e.g. the updated master) are skipped
+- an item counts as changed when its cTag (content tag) differs from the one
+  last processed, so renames and metadata edits do not trigger a rerun
+- changed items are recorded as pending before the new delta link is saved and
+  are only marked done once the handler succeeded, so a failed or interrupted
+  run retries them on the next poll
+
+The first poll without saved state enumerates the folder once and records the
+files already there as seen, so only files that arrive later are processed
+(process_existing=True processes them too). A 410 (resyncRequired) from Graph
+drops the delta link and enumerates again, once per poll; files already seen are
+recognised by their cTag. Files are handed over oldest lastModifiedDateTime first.
+Files in subfolders of the watched folder are downloaded to the same subfolders of
+download_dir, so same-named files in different folders do not overwrite each other.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from graph_client import GraphDriveClient
+
+STATE_VERSION = 1
+SUPPLIER_SUFFIXES = ('.xlsm', '.xlsx')
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "60"))
+_NO_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def folder_path(parent_reference: dict) -> str:
+    """'/drive/root:/Inputs/Hudson' -> 'Inputs/Hudson' ('' for the drive root)."""
+    path = (parent_reference or {}).get('path', '')
+    return path.split('root:', 1)[-1].strip('/') if 'root:' in path else ''
+
+
+def modified_at(entry: dict) -> datetime:
+    """Parsed lastModifiedDateTime of a pending entry (oldest possible when missing)."""
+    text = entry.get('modified')
+    if not text:
+        return _NO_TIME
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return _NO_TIME
+
+
+class DeltaWatcher:
+    """Delta-query poller for one folder of the client's drive."""
+
+    def __init__(self, client: GraphDriveClient, folder: str, state_path: Path | str,
+                 download_dir: Path | str = Path('new_files'),
+                 suffixes: Iterable[str] = SUPPLIER_SUFFIXES, ignore: Iterable[str] = (),
+                 process_existing: bool = False):
+        self.client = client
+        self.folder = folder.strip('/')
+        self.state_path = Path(state_path)
+        self.download_dir = Path(download_dir)
+        self.suffixes = tuple(s.lower() for s in suffixes)
+        self.ignore = {name.lower() for name in ignore}
+        self.process_existing = process_existing
+        self.state = self._load_state()
+
+    # --- State ---
+
+    def _key(self) -> str:
+        return f"{self.client._cache_key()}|{self.folder}"
+
+    def _load_state(self) -> dict:
+        empty = {'version': STATE_VERSION, 'key': self._key(), 'delta_link': None, 'seen': {}, 'pending': {}}
+        try:
+            data = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return empty
+        if data.get('version') != STATE_VERSION or data.get('key') != self._key():
+            print(f"Ignoring delta state for another folder/site: {self.state_path}")
+            return empty
+        return data
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(f'.{self.state_path.name}.tmp')
+        tmp.write_text(json.dumps(self.state, indent=1))
+        os.replace(tmp, self.state_path)
+
+    # --- Delta query ---
+
+    def _wanted(self, item: dict) -> bool:
+        if 'file' not in item or 'deleted' in item:
+            return False
+        name = item.get('name', '')
+        if name.lower() in self.ignore or not name.lower().endswith(self.suffixes):
+            return False
+        parent = folder_path(item.get('parentReference'))
+        return parent == self.folder or parent.startswith(self.folder + '/') or not self.folder
+
+    def _delta_pages(self, url: str) -> Iterable[dict]:
+        while url:
+            resp = self.client.get(url)
+            if resp.status_code == 410:
+                raise LookupError('resyncRequired')
+            if resp.status_code != 200:
+                raise RuntimeError(f"Delta query failed. Status: {resp.status_code}\n{resp.text}")
+            page = resp.json()
+            yield page
+            url = page.get('@odata.nextLink')
+
+    def changes(self) -> List[dict]:
+        """Supplier file items new or changed since the last poll; saves the new delta link.
+
+        The items are added to the pending set in the same state write as the delta
+        link, so none is lost if processing them fails.
+        """
+        for attempt in range(2):
+            link = self.state['delta_link']
+            baseline = link is None and not self.state['seen'] and not self.process_existing
+            if link is None:
+                link = f"drives/{self.client.drive_id()}/root/delta"
+            items: Dict[str, dict] = {}
+            try:
+                for page in self._delta_pages(link):
+                    for item in page.get('value', []):
+                        items[item['id']] = item
+                    delta_link = page.get('@odata.deltaLink')
+                break
+            except LookupError:
+                if attempt:
+                    raise RuntimeError('Delta query still answers resyncRequired after a full resync')
+                print("Delta token expired (resyncRequired); resyncing the folder")
+                self.state['delta_link'] = None
+
+        found = []
+        for item_id, item in items.items():
+            if not self._wanted(item):
+                # Deleted (or moved away) before it could be processed
+                self.state['pending'].pop(item_id, None)
+                continue
+            ctag = item.get('cTag') or item.get('eTag')
+            if self.state['seen'].get(item_id) == ctag:
+                continue
+            if baseline:
+                self.state['seen'][item_id] = ctag
+                continue
+            entry = {'name': item['name'], 'folder': folder_path(item.get('parentReference')), 'ctag': ctag,
+                     'modified': item.get('lastModifiedDateTime')}
+            self.state['pending'][item_id] = entry
+            found.append(entry)
+        self.state['delta_link'] = delta_link
+        self._save_state()
+        if baseline:
+            print(f"Watching from now on; {len(self.state['seen'])} existing file(s) in /{self.folder} skipped")
+        return found
+
+    # --- Processing ---
+
+    def local_path(self, entry: dict) -> Path:
+        """download_dir/<folder below the watched one>/<name> for a pending entry."""
+        folder = entry['folder']
+        if self.folder and (folder == self.folder or folder.startswith(self.folder + '/')):
+            folder = folder[len(self.folder):]
+        return self.download_dir.joinpath(*folder.split('/'), entry['name'])
+
+    def poll(self, handler: Optional[Callable[[List[Path]], bool]] = None) -> List[Path]:
+        """Download pending and newly changed files and hand them to handler in one batch.
+
+        handler receives the local paths (oldest change first) and returns True when
+        they were processed; only then are the items marked as seen. Returns the paths.
+        """
+        self.changes()
+        pending = self.state['pending']
+        if not pending:
+            return []
+        paths, done = [], []
+        for item_id, entry in sorted(pending.items(), key=lambda kv: modified_at(kv[1])):
+            local = self.local_path(entry)
+            if self.client.download(entry['name'], local, entry['folder']) is None:
+                print(f"Could not download {entry['folder']}/{entry['name']}; will retry next poll")
+                continue
+            paths.append(local)
+            done.append(item_id)
+        if not paths:
+            return []
+        print(f"New or changed supplier files: {', '.join(p.name for p in paths)}")
+        if handler is not None and not handler(paths):
+            print("Processing failed; files stay pending for the next poll")
+            return paths
+        for item_id in done:
+            self.state['seen'][item_id] = pending.pop(item_id)['ctag']
+        self._save_state()
+        return paths
+
+    def run(self, handler: Callable[[List[Path]], bool], interval: float = WATCH_INTERVAL,
+            max_polls: Optional[int] = None) -> None:
+        """Poll every interval seconds (forever, or max_polls times)."""
+        print(f"Watching SharePoint folder /{self.folder} every {interval:g}s (state: {self.state_path})")
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            try:
+                self.poll(handler)
+            except Exception as e:
+                print(f"Watch poll failed: {e}")
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(interval)
@@ -0,0 +1,158 @@
+"""
+Throttling-aware HTTP transport for Microsoft Graph.
+
+SharePoint answers bursts of requests with 429 (Too Many Requests) or 503/504 and
+a Retry-After header. Every Graph call used to treat those like any other error,
+so one throttled download aborted the whole run. GraphTransport sits between the
+Graph helpers and their requests.Session:
+- 429/503/504 responses are retried after Retry-After (seconds or HTTP date), or
+  after a jittered exponential backoff when the header is missing
+- a Retry-After pauses every request of the same tenant, not just the throttled
+  one, so concurrent workers back off together instead of hammering the service
+- connection errors are retried with the same backoff for idempotent methods
+  (GET/HEAD/PUT/DELETE; request bodies read from files are rewound first)
+- at most max_in_flight requests per tenant wait on Graph at the same time (the
+  limit covers sending and receiving headers; streamed bodies are read afterwards)
+- stats counts requests, retries, throttled responses and the seconds spent
+  waiting because of throttling
+
+Settings: GRAPH_MAX_IN_FLIGHT (default 8), GRAPH_MAX_RETRIES (default 6),
+GRAPH_RETRY_BASE (seconds, default 1), GRAPH_RETRY_MAX (seconds, default 60).
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+
+MAX_IN_FLIGHT = int(os.getenv("GRAPH_MAX_IN_FLIGHT", "8"))
+MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "6"))
+RETRY_BASE = float(os.getenv("GRAPH_RETRY_BASE", "1"))
+RETRY_MAX = float(os.getenv("GRAPH_RETRY_MAX", "60"))
+
+RETRY_STATUSES = (429, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+# Per-tenant limits shared by every transport in the process: tenant -> state
+_tenants: Dict[str, dict] = {}
+_tenants_lock = threading.Lock()
+
+
+def _tenant_state(tenant: str, max_in_flight: int) -> dict:
+    with _tenants_lock:
+        state = _tenants.get(tenant)
+        if state is None or state['limit'] != max_in_flight:
+            state = {'limit': max_in_flight, 'slots': threading.BoundedSemaphore(max_in_flight),
+                     'paused_until': 0.0, 'lock': threading.Lock()}
+            _tenants[tenant] = state
+        return state
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class GraphTransport:
+    """Sends requests on a session with retries, backoff and a per-tenant concurrency cap."""
+
+    def __init__(self, session: requests.Session, tenant: str = 'default',
+                 max_in_flight: int = MAX_IN_FLIGHT, max_retries: int = MAX_RETRIES,
+                 retry_base: float = RETRY_BASE, retry_max: float = RETRY_MAX,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.session = session
+        self.tenant = tenant
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._sleep = sleep
+        self._tenant = _tenant_state(tenant, max(1, max_in_flight))
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, float] = {'requests': 0, 'retries': 0, 'throttled': 0,
+                                        'throttled_seconds': 0.0, 'errors': 0}
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (attempt - 1)))
+
+    def _wait_for_tenant(self) -> None:
+        # Honour a Retry-After another request of this tenant received
+        wait = self._tenant['paused_until'] - time.time()
+        if wait > 0:
+            self._count('throttled_seconds', wait)
+            self._sleep(wait)
+
+    def _pause_tenant(self, seconds: float) -> None:
+        with self._tenant['lock']:
+            self._tenant['paused_until'] = max(self._tenant['paused_until'], time.time() + seconds)
+
+    def send(self, method: str, url: str, retry_errors: bool = True, **kwargs) -> requests.Response:
+        """session.request(method, url, **kwargs) with throttling and transient-error retries.
+
+        Returns the last response when retries run out (the caller reports its status);
+        re-raises the connection error when one persists, or at once with
+        retry_errors=False (for callers with their own recovery, like upload sessions).
+        """
+        method = method.upper()
+        body = kwargs.get('data')
+        offset = body.tell() if hasattr(body, 'seek') and hasattr(body, 'tell') else None
+        attempt = 0
+        while True:
+            if attempt and offset is not None:
+                body.seek(offset)
+            self._wait_for_tenant()
+            try:
+                with self._tenant['slots']:
+                    resp = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError:
+                self._count('errors')
+                if not retry_errors or attempt >= self.max_retries or method not in IDEMPOTENT_METHODS:
+                    raise
+                attempt += 1
+                self._count('retries')
+                self._sleep(self.backoff(attempt))
+                continue
+            finally:
+                self._count('requests')
+
+            if resp.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return resp
+            attempt += 1
+            retry_after = retry_after_seconds(resp.headers.get('Retry-After'))
+            resp.close()
+            self._count('retries')
+            self._count('throttled')
+            if retry_after is not None:
+                print(f"Graph throttled ({resp.status_code}); retrying in {retry_after:.1f}s "
+                      f"(attempt {attempt}/{self.max_retries})")
+                self._pause_tenant(retry_after)
+                self._wait_for_tenant()
+            else:
+                delay = self.backoff(attempt)
+                print(f"Graph returned {resp.status_code}; retrying in {delay:.1f}s "
+                      f"(attempt {attempt}/{self.max_retries})")
+                self._count('throttled_seconds', delay)
+                self._sleep(delay)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{s['requests']} request(s), {s['retries']} retr{'y' if s['retries'] == 1 else 'ies'}, "
+                f"{s['throttled']} throttled, {s['throttled_seconds']:.1f}s waiting on throttling")
@@ -0,0 +1,199 @@
+"""
+Resumable Graph upload sessions for large files (the updated master).
+
+Instead of reading the whole workbook into memory and sending it in one PUT, the
+file is uploaded through a Graph upload session:
+- createUploadSession returns a pre-authenticated uploadUrl
+- the file is streamed from disk in fixed-size byte ranges (a multiple of 320 KiB,
+  as Graph requires), each sent with a Content-Range header
+- after a failed range the session status (nextExpectedRanges) is queried and
+  only the missing ranges are sent again
+- the uploadUrl is saved in a small sidecar next to the local file
+  (.<name>.upload.json, keyed by size and mtime), so a run that died mid-upload
+  resumes the same session next time instead of starting over
+- ranges are sent one at a time, in order: Graph rejects fragments that arrive out
+  of sequence, so an upload session cannot be parallelised
+
+Settings: GRAPH_UPLOAD_CHUNK (bytes, default 10 MiB), GRAPH_UPLOAD_RETRIES (default 5).
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import requests
+
+from graph_client import GraphDriveClient, drive_item_path
+
+# Graph requires range sizes in multiples of 320 KiB (except the last range)
+RANGE_UNIT = 320 * 1024
+UPLOAD_CHUNK_SIZE = int(os.getenv("GRAPH_UPLOAD_CHUNK", str(32 * RANGE_UNIT)))
+UPLOAD_RETRIES = int(os.getenv("GRAPH_UPLOAD_RETRIES", "5"))
+# First pause before a resume attempt; doubles per attempt, capped at 30s
+UPLOAD_RETRY_DELAY = 1.0
+
+STATE_VERSION = 1
+
+
+def state_path(local_path: Path | str) -> Path:
+    local_path = Path(local_path)
+    return local_path.with_name(f'.{local_path.name}.upload.json')
+
+
+def parse_ranges(next_expected: List[str], total: int) -> List[Tuple[int, int]]:
+    """['0-', '500-999'] -> [(0, total - 1), (500, 999)] (inclusive byte ranges)."""
+    ranges = []
+    for text in next_expected or []:
+        start, _, end = str(text).partition('-')
+        ranges.append((int(start), int(end) if end else total - 1))
+    return sorted(ranges)
+
+
+def split_ranges(ranges: List[Tuple[int, int]], chunk_size: int) -> List[Tuple[int, int]]:
+    """Cut inclusive byte ranges into pieces of at most chunk_size bytes."""
+    pieces = []
+    for start, end in ranges:
+        while start <= end:
+            stop = min(start + chunk_size - 1, end)
+            pieces.append((start, stop))
+            start = stop + 1
+    return pieces
+
+
+class UploadSession:
+    """One resumable upload of local_path to folder/remote_name through a client."""
+
+    def __init__(self, client: GraphDriveClient, local_path: Path | str, remote_name: str,
+                 folder: Optional[str] = None, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_retries: int = UPLOAD_RETRIES, retry_delay: float = UPLOAD_RETRY_DELAY):
+        self.client = client
+        self.local_path = Path(local_path)
+        self.remote_name = remote_name
+        self.folder = folder
+        # Round down to whole 320 KiB units, but never below one unit
+        self.chunk_size = max(RANGE_UNIT, chunk_size // RANGE_UNIT * RANGE_UNIT)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        st = self.local_path.stat()
+        self.total = st.st_size
+        self._key = {'version': STATE_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'remote': f'{folder or ""}/{remote_name}'}
+        self.upload_url: Optional[str] = None
+        self.ranges_sent = 0
+
+    # --- Session state ---
+
+    def _load_state(self) -> Optional[str]:
+        try:
+            data = json.loads(state_path(self.local_path).read_text())
+        except (OSError, ValueError):
+            return None
+        if any(data.get(k) != v for k, v in self._key.items()):
+            return None
+        return data.get('upload_url')
+
+    def _save_state(self) -> None:
+        path = state_path(self.local_path)
+        try:
+            path.write_text(json.dumps(dict(self._key, upload_url=self.upload_url)))
+        except OSError as e:
+            print(f"Warning: could not save upload session state {path}: {e}")
+
+    def _clear_state(self) -> None:
+        state_path(self.local_path).unlink(missing_ok=True)
+
+    def _create(self) -> List[Tuple[int, int]]:
+        body = {'item': {'@microsoft.graph.conflictBehavior': 'replace'}}
+        resp = self.client.request('POST', self.client.item_url(self.folder, self.remote_name,
+                                                                 '/createUploadSession'), json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Failed to create upload session. Status: {resp.status_code}\n{resp.text}")
+        data = resp.json()
+        self.upload_url = data['uploadUrl']
+        self._save_state()
+        return parse_ranges(data.get('nextExpectedRanges') or ['0-'], self.total)
+
+    def status(self) -> Optional[List[Tuple[int, int]]]:
+        """Ranges the server still expects, or None if the session is gone/expired."""
+        # The uploadUrl is pre-authenticated: no Authorization header
+        resp = self.client.transport.send('GET', self.upload_url)
+        if resp.status_code != 200:
+            return None
+        return parse_ranges(resp.json().get('nextExpectedRanges', []), self.total)
+
+    # --- Sending ranges ---
+
+    def _send_range(self, f, start: int, end: int) -> Optional[dict]:
+        """PUT one byte range of the open file f. Returns the driveItem when this range
+        completed the file.
+        """
+        f.seek(start)
+        data = f.read(end - start + 1)
+        # Throttled ranges are retried by the transport; dropped ones resume via status()
+        resp = self.client.transport.send('PUT', self.upload_url, retry_errors=False, data=data, headers={
+            'Content-Length': str(len(data)),
+            'Content-Range': f'bytes {start}-{end}/{self.total}',
+        })
+        self.ranges_sent += 1
+        if resp.status_code == 202:
+            return None
+        if resp.status_code in (200, 201):
+            return resp.json()
+        raise RuntimeError(f"Range {start}-{end} rejected. Status: {resp.status_code}\n{resp.text}")
+
+    def _send(self, ranges: List[Tuple[int, int]]) -> Optional[dict]:
+        pieces = split_ranges(ranges, self.chunk_size)
+        if not pieces:
+            return None
+        with open(self.local_path, 'rb') as f:
+            for start, end in pieces:
+                item = self._send_range(f, start, end)
+                if item is not None:
+                    return item
+        return None
+
+    def run(self) -> bool:
+        """Upload (or resume uploading) the file. Returns True once Graph has the whole file."""
+        self.upload_url = self._load_state()
+        ranges = self.status() if self.upload_url else None
+        if ranges is None:
+            ranges = self._create()
+        elif ranges:
+            remaining = sum(end - start + 1 for start, end in ranges)
+            print(f"Resuming upload session for {self.local_path.name}: {remaining} of {self.total} bytes left")
+
+        t0 = time.perf_counter()
+        attempts = 0
+        while True:
+            try:
+                item = self._send(ranges)
+                if item is not None or not ranges:
+                    break
+                # Every range acknowledged but no item returned: ask where the session stands
+                ranges = self.status()
+                if ranges is None:
+                    raise RuntimeError('Upload session expired')
+                if not ranges:
+                    break
+            except (requests.RequestException, RuntimeError) as e:
+                attempts += 1
+                if attempts > self.max_retries:
+                    print(f"Upload of {self.local_path.name} failed after {self.max_retries} retries: {e}")
+                    print(f"Session saved; re-running the upload resumes it ({state_path(self.local_path).name})")
+                    return False
+                time.sleep(min(self.retry_delay * 2 ** (attempts - 1), 30))
+                ranges = self.status() if self.upload_url else None
+                if ranges is None:
+                    print(f"Upload session lost ({e}); starting a new one")
+                    ranges = self._create()
+                else:
+                    print(f"Range upload failed ({e}); resuming from byte {ranges[0][0] if ranges else self.total}")
+
+        self._clear_state()
+        elapsed = max(time.perf_counter() - t0, 1e-9)
+        print(f"Successfully uploaded to: {drive_item_path(self.folder, self.remote_name)} ({self.total / 1e6:.1f} MB in "
+              f"{self.ranges_sent} range(s), {elapsed:.2f}s)")
+        return True
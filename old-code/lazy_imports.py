@@ -0,0 +1,88 @@
+"""
+Deferred imports for the command-line entry points.
+
+Importing pandas, openpyxl, requests and msal takes about two seconds, which every
+run of excel_processor.py and download_files.py used to pay at module load, even
+for --help or download-only. lazy_module() returns a stand-in that imports the
+real module on first attribute access, and lazy_attr() one for a single function
+or class of a module. The module-level names of the entry points (pd,
+load_workbook, MasterTail...) therefore keep working unchanged in function
+bodies, but each subcommand only imports what it actually touches.
+
+A missing dependency is reported the way the eager imports reported it
+(DEPENDENCY_ERROR, the install hint, exit code 1), at first use instead of at
+import time.
+
+Stand-ins for classes support calls and attribute access, not isinstance() or
+subclassing; import those eagerly or inside the function that needs them.
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+from types import ModuleType
+
+INSTALL_HINT = 'pip install pandas openpyxl python-dotenv requests msal'
+
+
+def _import(name: str, hint: str) -> ModuleType:
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        print('DEPENDENCY_ERROR: Required libraries are not installed.')
+        print(f'Please install: {hint}')
+        print(e)
+        sys.exit(1)
+
+
+class LazyModule:
+    """Stand-in for a module, imported on first attribute access."""
+
+    def __init__(self, name: str, hint: str = INSTALL_HINT):
+        self._name = name
+        self._hint = hint
+        self._module = None
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = _import(self._name, self._hint)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+
+class LazyAttr:
+    """Stand-in for a function or class of a module, imported on first call or attribute access."""
+
+    def __init__(self, module: str, attr: str, hint: str = INSTALL_HINT):
+        self._module = module
+        self._attr = attr
+        self._hint = hint
+        self._target = None
+
+    def __repr__(self) -> str:
+        return f'<lazy {self._module}.{self._attr}>'
+
+    def _load(self):
+        if self._target is None:
+            self._target = getattr(_import(self._module, self._hint), self._attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+
+def lazy_module(name: str, hint: str = INSTALL_HINT) -> LazyModule:
+    return LazyModule(name, hint)
+
+
+def lazy_attr(module: str, attr: str, hint: str = INSTALL_HINT) -> LazyAttr:
+    return LazyAttr(module, attr, hint)
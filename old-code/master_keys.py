@@ -0,0 +1,303 @@
+"""
+Persistent hash index over the master table's natural key.
+
+Re-running an append with the same supplier file used to add the same prices
+again under new IDs. The index records a 64-bit hash of every master row's
+natural key (Price_Date, Date, Zone, Load, REP1, Term, Min_MWh, Max_MWh) in a
+directory next to the master (.<name>.keys/):
+- base.npy        sorted uint64 hashes
+- delta.bin       hashes of rows appended since the last compaction (raw uint64)
+- _manifest.json  size/mtime of the master it indexes and the base/delta counts
+
+Incoming rows are filtered with a binary search in the base and a lookup in the
+small delta, so an idempotent rerun costs O(new rows) instead of a scan of the
+master. Appends add their hashes to delta.bin and re-key the manifest to the
+master's new size and mtime; the delta is merged into the base once it grows past
+an eighth of it. If the master is changed by anything else the index is out of
+sync and is rebuilt on the next sync(), from one streamed pass over the sheet XML
+that only decodes columns B..I.
+
+Key values are normalised before hashing: Price_Date/Date by calendar day (Excel
+serials included), numbers as floats (12 == 12.0), text stripped, empty/NaN as ''.
+"""
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel
+
+from master_tail import SHEETDATA_OPEN_RE, pick_sheet
+from xlsx_stream import CHUNK_SIZE, related_part_path, workbook_sheets, workbook_uses_1904
+
+KEY_COLS: List[str] = ['Price_Date', 'Date', 'Zone', 'Load', 'REP1', 'Term', 'Min_MWh', 'Max_MWh']
+
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+COMPACT_MIN = 65536
+
+# Price_Date and Date: the first two key columns, read back from the sheet as serials
+_DATE_POSITIONS = 2
+
+# Cells of columns B..I: (attributes, column letter, row number, body)
+_KEY_CELL_RE = re.compile(rb'<c\b([^>]*?\br="([B-I])(\d+)"[^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_CELL_TYPE_RE = re.compile(rb'\bt="(\w+)"')
+_VALUE_RE = re.compile(rb'<v>([^<]*)</v>')
+_TEXT_RE = re.compile(rb'<t(?:\s[^>]*)?>([^<]*)</t>')
+_SI_RE = re.compile(rb'<si>(.*?)</si>', re.S)
+_RPH_RE = re.compile(rb'<rPh\b.*?</rPh>', re.S)
+
+
+def index_dir(master_path: Path | str) -> Path:
+    master_path = Path(master_path)
+    return master_path.with_name(f'.{master_path.name}.keys')
+
+
+def _norm_date(value) -> str:
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool) and value == value:
+        try:
+            return from_excel(float(value)).date().isoformat()
+        except (ValueError, OverflowError):
+            pass
+    return _norm(value)
+
+
+def _norm(value) -> str:
+    if value is None or value != value:
+        # None, NaN, NaT
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        return repr(float(value))
+    return str(value).strip()
+
+
+def key_hash(values: Sequence) -> int:
+    """64-bit hash of one row's natural key values (in KEY_COLS order)."""
+    text = '\x1f'.join(_norm_date(v) if i < _DATE_POSITIONS else _norm(v) for i, v in enumerate(values))
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def hash_rows(rows: Iterable[Sequence]) -> np.ndarray:
+    """Hashes of rows given as natural-key value sequences."""
+    return np.fromiter((key_hash(r) for r in rows), dtype=np.uint64)
+
+
+def hash_frame(df: 'pd.DataFrame') -> np.ndarray:
+    """Hashes of the natural key of every row of a master-schema DataFrame."""
+    return hash_rows(df.reindex(columns=KEY_COLS).itertuples(index=False, name=None))
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    part = related_part_path(zf, '/sharedStrings')
+    if not part or part not in zf.namelist():
+        return []
+    data = zf.read(part)
+    return [html.unescape(b''.join(_TEXT_RE.findall(_RPH_RE.sub(b'', si))).decode('utf-8'))
+            for si in _SI_RE.findall(data)]
+
+
+def _cell_value(attrs: bytes, body: bytes, pos: int, strings: List[str], epoch):
+    t = _CELL_TYPE_RE.search(attrs)
+    t = t.group(1) if t else b'n'
+    if t == b'inlineStr':
+        return html.unescape(b''.join(_TEXT_RE.findall(body)).decode('utf-8'))
+    v = _VALUE_RE.search(body)
+    if v is None:
+        return None
+    raw = v.group(1)
+    if t == b's':
+        return strings[int(raw)]
+    if t in (b'str', b'e'):
+        return html.unescape(raw.decode('utf-8'))
+    if t == b'b':
+        return raw == b'1'
+    num = float(raw)
+    return from_excel(num, epoch).date() if pos < _DATE_POSITIONS else num
+
+
+def _block_keys(block: bytes, strings: List[str], epoch) -> Iterator[List]:
+    """Key values of the data rows in a run of whole <row> elements; rows whose
+    columns B..I are all empty are skipped.
+    """
+    values: List = [None] * len(KEY_COLS)
+    row = None
+    for attrs, letter, num, body in _KEY_CELL_RE.findall(block):
+        if num != row:
+            if any(v is not None for v in values):
+                yield values
+                values = [None] * len(KEY_COLS)
+            row = num
+        if body and int(num) >= 2:
+            pos = letter[0] - 66
+            values[pos] = _cell_value(attrs, body, pos, strings, epoch)
+    if any(v is not None for v in values):
+        yield values
+
+
+def scan_keys(master_path: Path | str) -> Iterator[List]:
+    """Yield the natural-key values (columns B..I) of every data row of the master's
+    active sheet, streaming the sheet XML without building a workbook. Cells are found
+    by their r="B2" references, which Excel, openpyxl and xlsx_stream always write.
+    """
+    with zipfile.ZipFile(master_path) as zf:
+        target = pick_sheet(workbook_sheets(zf))
+        strings = _shared_strings(zf)
+        epoch = MAC_EPOCH if workbook_uses_1904(zf) else WINDOWS_EPOCH
+        with zf.open(target['path']) as src:
+            buf = b''
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                buf += chunk
+                m = SHEETDATA_OPEN_RE.search(buf)
+                if m is not None:
+                    break
+                if not chunk:
+                    return
+            if m.group(1):
+                # <sheetData/>: no rows
+                return
+            buf = buf[m.end():]
+            done = False
+            while not done:
+                chunk = src.read(CHUNK_SIZE)
+                buf += chunk
+                end = buf.find(b'</sheetData>')
+                if end != -1 or not chunk:
+                    block, buf, done = (buf[:end] if end != -1 else buf), b'', True
+                else:
+                    cut = buf.rfind(b'</row>')
+                    if cut == -1:
+                        continue
+                    block, buf = buf[:cut + 6], buf[cut + 6:]
+                yield from _block_keys(block, strings, epoch)
+
+
+class MasterKeyIndex:
+    """Natural-key hash index of one master workbook."""
+
+    def __init__(self, master_path: Path | str, directory: Path | str | None = None):
+        self.master_path = Path(master_path)
+        self.directory = Path(directory) if directory is not None else index_dir(self.master_path)
+        self._base: Optional[np.ndarray] = None
+        self._delta: Optional[np.ndarray] = None
+
+    def __repr__(self) -> str:
+        m = self.manifest()
+        if m is None:
+            return f'MasterKeyIndex({self.master_path.name}, not built)'
+        return (f"MasterKeyIndex({self.master_path.name}, keys={m['base'] + m['delta']}, "
+                f"in_sync={self.in_sync()})")
+
+    # --- Manifest ---
+
+    def manifest(self) -> Optional[dict]:
+        try:
+            data = json.loads((self.directory / MANIFEST_NAME).read_text())
+        except (OSError, ValueError):
+            return None
+        return data if data.get('version') == MANIFEST_VERSION else None
+
+    def _write_manifest(self, base: int, delta: int) -> None:
+        st = self.master_path.stat()
+        data = {'version': MANIFEST_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                'base': base, 'delta': delta}
+        tmp = self.directory / f'.{MANIFEST_NAME}.tmp'
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.directory / MANIFEST_NAME)
+
+    def in_sync(self) -> bool:
+        """True when the manifest was written for the master as it is on disk now."""
+        m = self.manifest()
+        if m is None:
+            return False
+        try:
+            st = self.master_path.stat()
+        except OSError:
+            return False
+        return m['size'] == st.st_size and m['mtime_ns'] == st.st_mtime_ns
+
+    # --- Building ---
+
+    def _write_base(self, hashes: np.ndarray) -> int:
+        base = np.unique(hashes)
+        tmp = self.directory / '.base.tmp.npy'
+        np.save(tmp, base)
+        os.replace(tmp, self.directory / 'base.npy')
+        return len(base)
+
+    def build(self) -> 'MasterKeyIndex':
+        """Rebuild the index from the master's columns B..I (one streamed pass)."""
+        hashes = hash_rows(scan_keys(self.master_path))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._base, self._delta = None, None
+        self._write_manifest(self._write_base(hashes), 0)
+        (self.directory / 'delta.bin').write_bytes(b'')
+        return self
+
+    def sync(self) -> 'MasterKeyIndex':
+        """Make sure the index matches the master, rebuilding it if it does not."""
+        if not self.in_sync():
+            self.build()
+        return self
+
+    # --- Lookups ---
+
+    def _load(self) -> None:
+        if self._base is not None:
+            return
+        m = self.manifest()
+        if m is None:
+            raise RuntimeError(f'No key index built for {self.master_path.name}')
+        self._base = np.load(self.directory / 'base.npy', mmap_mode='r')
+        # Only the first m['delta'] hashes are committed; a torn append leaves extra bytes
+        self._delta = np.fromfile(self.directory / 'delta.bin', dtype=np.uint64, count=m['delta'])
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask: which of hashes are already in the master."""
+        self._load()
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(self._base):
+            pos = np.searchsorted(self._base, hashes)
+            found = self._base[np.minimum(pos, len(self._base) - 1)] == hashes
+        else:
+            found = np.zeros(len(hashes), dtype=bool)
+        if len(self._delta):
+            found |= np.isin(hashes, self._delta)
+        return found
+
+    # --- Maintenance ---
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Record hashes of rows just appended to the master. The master must already
+        be saved: the manifest is re-keyed to its new size and mtime.
+        """
+        m = self.manifest()
+        if m is None:
+            raise RuntimeError(f'No key index to add to for {self.master_path.name}')
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        delta_path = self.directory / 'delta.bin'
+        with open(delta_path, 'r+b' if delta_path.exists() else 'wb') as f:
+            f.seek(m['delta'] * 8)
+            f.write(hashes.tobytes())
+            f.truncate()
+        delta = m['delta'] + len(hashes)
+        self._base, self._delta = None, None
+        if delta > max(COMPACT_MIN, m['base'] // 8):
+            merged = np.concatenate([np.load(self.directory / 'base.npy'),
+                                     np.fromfile(delta_path, dtype=np.uint64, count=delta)])
+            self._write_manifest(self._write_base(merged), 0)
+            delta_path.write_bytes(b'')
+        else:
+            self._write_manifest(m['base'], delta)
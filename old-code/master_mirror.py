@@ -0,0 +1,280 @@
+"""
+Columnar Parquet mirror of the master table.
+
+The mirror keeps the 17 MASTER_COLS of the master sheet as Parquet part files in
+a directory next to the master (.<name>.mirror/):
+- _manifest.json   size/mtime of the master it mirrors, row count, max ID, part list
+- part-*.parquet   one file for the initial build, plus one per append
+
+Appends made through the streaming engine add a new part file instead of
+re-reading the xlsx, so max ID, row counts and price history queries stay in
+milliseconds. The manifest is keyed by the master's size and mtime; if the xlsx
+is changed by anything else the mirror is out of sync and is rebuilt on the next
+sync(). The xlsx stays the file people download; write_xlsx() regenerates one
+from the mirror when needed.
+
+Columns are typed (ID int, the two dates as timestamps, Zone/Load/REP1 as text,
+the rest as float). Legacy cells that do not fit their column (e.g. '12 Months'
+in Term) are stored as nulls, so the mirror is a cleaned copy for queries and
+write_xlsx() reproduces that cleaned table.
+
+pyarrow is optional: without it the mirror cannot be built or read, but max ID
+and row counts from an existing manifest still work.
+"""
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    # Mirror building/reading needs pyarrow; manifest lookups do not
+    pa = None
+    pc = None
+    pq = None
+
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+ROW_GROUP_SIZE = 65536
+
+MASTER_COLS: List[str] = [
+    'ID', 'Price_Date', 'Date', 'Zone', 'Load', 'REP1', 'Term', 'Min_MWh', 'Max_MWh',
+    'Daily_No_Ruc', 'RUC_Nodal', 'Daily', 'Com_Disc', 'HOA_Disc', 'Broker_Fee', 'Meter_Fee', 'Max_Meters'
+]
+DATE_COLS = ('Price_Date', 'Date')
+TEXT_COLS = ('Zone', 'Load', 'REP1')
+
+
+def mirror_available() -> bool:
+    """True when pyarrow is installed and the mirror can be built and read."""
+    return pq is not None
+
+
+def mirror_dir(master_path: Path | str) -> Path:
+    master_path = Path(master_path)
+    return master_path.with_name(f'.{master_path.name}.mirror')
+
+
+def _schema():
+    fields = []
+    for col in MASTER_COLS:
+        if col == 'ID':
+            fields.append(pa.field(col, pa.int64()))
+        elif col in DATE_COLS:
+            fields.append(pa.field(col, pa.timestamp('us')))
+        elif col in TEXT_COLS:
+            fields.append(pa.field(col, pa.string()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+def _to_table(df: 'pd.DataFrame'):
+    """Coerce a frame with MASTER_COLS into the mirror schema (bad values become nulls)."""
+    import pandas as pd
+
+    df = df.reindex(columns=MASTER_COLS)
+    out = {}
+    for col in MASTER_COLS:
+        s = df[col]
+        if col == 'ID':
+            out[col] = pd.to_numeric(s, errors='coerce').astype('Int64')
+        elif col in DATE_COLS:
+            out[col] = pd.to_datetime(s, errors='coerce').astype('datetime64[us]')
+        elif col in TEXT_COLS:
+            out[col] = s.astype('string')
+        else:
+            out[col] = pd.to_numeric(s, errors='coerce').astype('float64')
+    return pa.Table.from_pandas(pd.DataFrame(out), schema=_schema(), preserve_index=False)
+
+
+class MasterMirror:
+    """Parquet mirror of one master workbook."""
+
+    def __init__(self, master_path: Path | str, directory: Path | str | None = None):
+        self.master_path = Path(master_path)
+        self.directory = Path(directory) if directory is not None else mirror_dir(self.master_path)
+
+    def __repr__(self) -> str:
+        m = self.manifest()
+        if m is None:
+            return f'MasterMirror({self.master_path.name}, not built)'
+        return (f"MasterMirror({self.master_path.name}, rows={m['rows']}, max_id={m['max_id']}, "
+                f"parts={len(m['parts'])}, in_sync={self.in_sync()})")
+
+    # --- Manifest ---
+
+    def manifest(self) -> Optional[Dict[str, object]]:
+        try:
+            data = json.loads((self.directory / MANIFEST_NAME).read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+        return data
+
+    def _write_manifest(self, rows: int, max_id: int, parts: List[str]) -> None:
+        st = self.master_path.stat()
+        data = {'version': MANIFEST_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                'rows': rows, 'max_id': max_id, 'parts': parts}
+        tmp = self.directory / f'.{MANIFEST_NAME}.tmp'
+        tmp.write_text(json.dumps(data, indent=1))
+        os.replace(tmp, self.directory / MANIFEST_NAME)
+
+    def exists(self) -> bool:
+        return self.manifest() is not None
+
+    def in_sync(self) -> bool:
+        """True when the manifest was written for the master as it is on disk now."""
+        m = self.manifest()
+        if m is None:
+            return False
+        try:
+            st = self.master_path.stat()
+        except OSError:
+            return False
+        return m['size'] == st.st_size and m['mtime_ns'] == st.st_mtime_ns
+
+    def max_id(self) -> int:
+        m = self.manifest()
+        return int(m['max_id']) if m else 0
+
+    def row_count(self) -> int:
+        m = self.manifest()
+        return int(m['rows']) if m else 0
+
+    # --- Writing ---
+
+    def _write_part(self, table) -> str:
+        name = f'part-{uuid.uuid4().hex[:12]}.parquet'
+        pq.write_table(table, self.directory / name, row_group_size=ROW_GROUP_SIZE)
+        return name
+
+    def build(self, sheet_name: Optional[str] = None) -> 'MasterMirror':
+        """Rebuild the mirror from the xlsx (one full read)."""
+        if not mirror_available():
+            raise RuntimeError('pyarrow is not installed; install it to build the master mirror')
+        import pandas as pd
+        from openpyxl import load_workbook
+
+        wb = load_workbook(self.master_path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.active
+            width = len(MASTER_COLS)
+            records = [tuple(r[:width]) for r in ws.iter_rows(min_row=2, max_col=width, values_only=True)
+                       if any(v is not None for v in r[:width])]
+        finally:
+            wb.close()
+
+        table = _to_table(pd.DataFrame.from_records(records, columns=MASTER_COLS))
+        old = self.manifest()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        part = self._write_part(table)
+        max_id = pc.max(table['ID']).as_py() if table.num_rows else None
+        self._write_manifest(table.num_rows, int(max_id or 0), [part])
+
+        # Old parts are only removed once the new manifest no longer points at them
+        for name in (old or {}).get('parts', []):
+            if name != part:
+                (self.directory / name).unlink(missing_ok=True)
+        print(f"Built master mirror: {table.num_rows} rows from {self.master_path.name}")
+        return self
+
+    def sync(self, sheet_name: Optional[str] = None) -> 'MasterMirror':
+        """Make sure the mirror matches the master, rebuilding it if it does not."""
+        if not self.in_sync():
+            self.build(sheet_name)
+        return self
+
+    def append_rows(self, rows: Iterable[Sequence], first_id: int) -> int:
+        """Record rows (values for Price_Date..Max_Meters) just appended to the master with
+        IDs starting at first_id. The master must already be saved; the manifest is
+        re-keyed to its new size and mtime. Returns the number of rows added.
+        """
+        import pandas as pd
+
+        m = self.manifest()
+        if m is None:
+            raise RuntimeError(f'No mirror to append to for {self.master_path.name}')
+        df = pd.DataFrame.from_records(list(rows), columns=MASTER_COLS[1:])
+        if df.empty:
+            self._write_manifest(m['rows'], m['max_id'], m['parts'])
+            return 0
+        df.insert(0, 'ID', range(first_id, first_id + len(df)))
+        part = self._write_part(_to_table(df))
+        self._write_manifest(m['rows'] + len(df), max(m['max_id'], first_id + len(df) - 1),
+                             m['parts'] + [part])
+        return len(df)
+
+    # --- Reading ---
+
+    def _part_paths(self) -> List[str]:
+        m = self.manifest()
+        if m is None:
+            raise RuntimeError(f'No mirror built for {self.master_path.name}')
+        return [str(self.directory / name) for name in m['parts']]
+
+    def read(self, columns: Optional[List[str]] = None, filters=None) -> 'pd.DataFrame':
+        """Read the mirror into a DataFrame. filters uses the pyarrow DNF form,
+        e.g. [('Zone', '=', 'NORTH'), ('Term', '=', 12)].
+        """
+        if not mirror_available():
+            raise RuntimeError('pyarrow is not installed; install it to read the master mirror')
+        table = pq.ParquetDataset(self._part_paths(), filters=filters).read(columns=columns)
+        df = table.to_pandas()
+        if 'ID' in df.columns:
+            df = df.sort_values('ID', kind='stable', ignore_index=True)
+        return df
+
+    def price_history(self, zone: Optional[str] = None, load: Optional[str] = None,
+                      rep: Optional[str] = None, term: Optional[float] = None,
+                      columns: Optional[List[str]] = None) -> 'pd.DataFrame':
+        """Rows for one product (any of zone/load/REP1/term may be left open), oldest first."""
+        filters = []
+        for col, val in (('Zone', zone), ('Load', load), ('REP1', rep), ('Term', term)):
+            if val is not None:
+                filters.append((col, '=', float(val) if col == 'Term' else val))
+        df = self.read(columns=columns, filters=filters or None)
+        if 'Price_Date' in df.columns:
+            df = df.sort_values(['Price_Date'], kind='stable', ignore_index=True)
+        return df
+
+    def write_xlsx(self, out_path: Path | str, formats: Optional[Dict[str, str]] = None,
+                   align_right: Sequence[str] = (), sheet_title: str = 'DAILY PRICING - new') -> Path:
+        """Regenerate a master workbook from the mirror (write-only, streamed)."""
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment
+        from openpyxl.utils import get_column_letter
+
+        out_path = Path(out_path)
+        formats = formats or {}
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_title)
+        ws.append(MASTER_COLS)
+        letters = [get_column_letter(i) for i in range(1, len(MASTER_COLS) + 1)]
+        right = Alignment(horizontal='right')
+
+        for part in self._part_paths():
+            pf = pq.ParquetFile(part)
+            for batch in pf.iter_batches(batch_size=ROW_GROUP_SIZE):
+                cols = [batch.column(c).to_pylist() for c in MASTER_COLS]
+                for values in zip(*cols):
+                    row = []
+                    for letter, val in zip(letters, values):
+                        cell = WriteOnlyCell(ws, value=val)
+                        if letter in formats:
+                            cell.number_format = formats[letter]
+                        if letter in align_right:
+                            cell.alignment = right
+                        row.append(cell)
+                    ws.append(row)
+        wb.save(out_path)
+        print(f"Wrote master workbook from mirror: {out_path}")
+        return out_path
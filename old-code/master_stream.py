@@ -0,0 +1,198 @@
+"""
+Streaming append engine for the master table.
+
+Appends rows to the end of the master sheet in a single pass over the workbook zip:
+- every part except the target sheet and styles.xml is copied through unchanged
+- existing rows in the sheet XML are passed through byte for byte while the pass
+  tracks the last row number and the max numeric ID in column A
+- the new rows (ID in column A, values in B..) are written just before </sheetData>,
+  starting at MasterTail.append_row like the openpyxl engine; trailing rows that only
+  carry formatting are held back until the end, where the ones the new rows land on
+  are replaced and any further down are kept after them
+
+Memory use is bounded by the chunk size, not by the length of the master, because
+neither the existing rows nor the workbook object model are ever materialised.
+"""
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from master_tail import SHEETDATA_OPEN_RE, MasterTail, pick_sheet
+from xlsx_stream import (
+    CHUNK_SIZE,
+    ZIP64_LIMIT,
+    cell_xml,
+    clone_zipinfo,
+    copy_member,
+    ensure_cell_styles,
+    related_part_path,
+    workbook_sheets,
+    workbook_uses_1904,
+)
+
+_DIMENSION_RE = re.compile(rb'<dimension\b[^>]*?/>')
+
+ROWS_PER_WRITE = 1000
+
+
+def _row_xml(row_idx: int, row_id: int, values: Sequence, styles: List[Optional[int]],
+             date1904: bool) -> str:
+    cells = [cell_xml(f'A{row_idx}', row_id, styles[0] if styles else None, date1904)]
+    for offset, val in enumerate(values, start=2):
+        style = styles[offset - 1] if offset - 1 < len(styles) else None
+        cells.append(cell_xml(f'{get_column_letter(offset)}{row_idx}', val, style, date1904))
+    return f'<row r="{row_idx}">' + ''.join(cells) + '</row>'
+
+
+def _write_new_rows(dst, rows: Iterable[Sequence], tail: MasterTail,
+                    styles: List[Optional[int]], date1904: bool,
+                    held: Sequence[Tuple[int, bytes]] = ()) -> Tuple[int, int]:
+    """Write the new rows from tail.append_row, around the held-back value-less rows."""
+    start_row = tail.append_row
+    first_id = tail.next_id
+    dst.write(b''.join(row for r, row in held if r < start_row))
+    count = 0
+    batch: List[str] = []
+    for values in rows:
+        batch.append(_row_xml(start_row + count, first_id + count, values, styles, date1904))
+        count += 1
+        if len(batch) >= ROWS_PER_WRITE:
+            dst.write(''.join(batch).encode('utf-8'))
+            batch = []
+    if batch:
+        dst.write(''.join(batch).encode('utf-8'))
+    dst.write(b''.join(row for r, row in held if r >= start_row + count))
+    tail.record_append(start_row, count)
+    return count, first_id
+
+
+def _rewrite_sheet(src, dst, rows: Iterable[Sequence], styles: List[Optional[int]],
+                   date1904: bool, tail: MasterTail) -> Tuple[int, int]:
+    """Copy sheet XML from src to dst, inserting rows before </sheetData>.
+    tail is filled from the existing rows and updated to cover the appended ones.
+    """
+    # Header up to and including <sheetData>
+    buf = b''
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        buf += chunk
+        m = SHEETDATA_OPEN_RE.search(buf)
+        if m:
+            break
+        if not chunk:
+            raise ValueError('Worksheet XML has no <sheetData> element')
+
+    # The old <dimension> would be stale after the append; it is optional, so drop it
+    dst.write(_DIMENSION_RE.sub(b'', buf[:m.start()]))
+    if m.group(1) == b'/':
+        dst.write(b'<sheetData>')
+        result = _write_new_rows(dst, rows, tail, styles, date1904)
+        dst.write(b'</sheetData>')
+        dst.write(buf[m.end():])
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return result
+    dst.write(buf[m.start():m.end()])
+    buf = buf[m.end():]
+
+    # Existing rows pass through untouched; only complete rows are scanned. Rows
+    # without values wait in held until a row with values follows them.
+    held: List[Tuple[int, bytes]] = []
+
+    def pass_rows(block: bytes) -> None:
+        nonlocal held
+        tail.scan(block)
+        rest, blank = MasterTail.split_blank_tail(block)
+        if b'<row' in rest:
+            dst.write(b''.join(row for _, row in held))
+            held = []
+        dst.write(rest)
+        held.extend(blank)
+
+    while True:
+        end = buf.find(b'</sheetData>')
+        if end != -1:
+            pass_rows(buf[:end])
+            result = _write_new_rows(dst, rows, tail, styles, date1904, held)
+            dst.write(buf[end:])
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            return result
+        cut = buf.rfind(b'</row>')
+        if cut != -1:
+            cut += len(b'</row>')
+            pass_rows(buf[:cut])
+            buf = buf[cut:]
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            raise ValueError('Worksheet XML ended before </sheetData>')
+        buf += chunk
+
+
+def stream_append_rows(master_path: Path | str,
+                       rows: Iterable[Sequence],
+                       *,
+                       formats: Optional[Dict[str, str]] = None,
+                       align_right: Sequence[str] = (),
+                       out_path: Optional[Path | str] = None,
+                       sheet_name: Optional[str] = None,
+                       first_visible: bool = False) -> Tuple[int, int]:
+    """Append rows to the end of the master sheet without loading the workbook.
+
+    Args:
+        master_path: Existing master workbook (.xlsx/.xlsm)
+        rows: Iterable of value sequences for columns B, C, ... (column A gets the ID)
+        formats: Optional {column letter: number format}, registered once in styles.xml
+        align_right: Column letters that should also be right-aligned (e.g. ('F',))
+        out_path: Where to write the result; defaults to overwriting master_path
+        sheet_name: Target sheet name; defaults to the active sheet
+        first_visible: Target the first visible sheet when sheet_name is not given
+
+    Returns:
+        (rows_appended, first_id) where IDs continue from the max numeric ID in column A.
+    """
+    master_path = Path(master_path)
+    out_path = Path(out_path) if out_path is not None else master_path
+    tmp_path = out_path.with_name(f'.{out_path.name}.tmp')
+
+    try:
+        with zipfile.ZipFile(master_path) as zin:
+            target = pick_sheet(workbook_sheets(zin), sheet_name, first_visible)
+            date1904 = workbook_uses_1904(zin)
+
+            styles_part = related_part_path(zin, '/styles')
+            styles_xml = None
+            style_ids: List[Optional[int]] = []
+            if formats and styles_part and styles_part in zin.namelist():
+                width = max(column_index_from_string(k) for k in formats)
+                specs = []
+                for c in range(1, width + 1):
+                    letter = get_column_letter(c)
+                    specs.append((formats.get(letter, 'General'), 'right' if letter in align_right else None))
+                styles_xml, style_ids = ensure_cell_styles(zin.read(styles_part).decode('utf-8'), specs)
+
+            result = (0, 0)
+            tail = MasterTail(sheet_path=target['path'])
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename == target['path']:
+                        with zin.open(info) as src, \
+                                zout.open(clone_zipinfo(info), 'w',
+                                          force_zip64=info.file_size > ZIP64_LIMIT // 2) as dst:
+                            result = _rewrite_sheet(src, dst, rows, style_ids, date1904, tail)
+                    elif info.filename == styles_part and styles_xml is not None:
+                        zout.writestr(clone_zipinfo(info), styles_xml.encode('utf-8'))
+                    else:
+                        copy_member(zin, info, zout)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    # The pass already saw every row, so leave a fresh tail index for the next run
+    tail.save_sidecar(out_path)
+    return result
@@ -0,0 +1,250 @@
+"""
+Single-pass tail index for the master table.
+
+MasterTail reads the master sheet XML once (streamed, read-only) and records
+everything the append paths need to know about where the data ends:
+- last_row:        last row that has any cell element (the sheet's max_row)
+- last_data_row:   last row with a non-empty cell value
+- first_blank_row: first row >= 2 whose ID cell (column A) is empty
+- max_id:          largest numeric ID in column A
+
+The result is cached in a small JSON sidecar next to the master
+(.<name>.tail.json) keyed by file size and mtime, so repeat runs against an
+unchanged master skip the scan entirely.
+"""
+from __future__ import annotations
+
+import json
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from xlsx_stream import CHUNK_SIZE, workbook_sheets
+
+SHEETDATA_OPEN_RE = re.compile(rb'<sheetData\b[^>]*?(/?)>')
+_ROW_RE = re.compile(rb'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_ROW_NUM_RE = re.compile(rb'\br="(\d+)"')
+_CELL_A_RE = re.compile(rb'<c\b([^>]*?\br="A\d+"[^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_CELL_TYPE_RE = re.compile(rb'\bt="(\w+)"')
+_CELL_VALUE_RE = re.compile(rb'<v>([^<]*)</v>')
+_HAS_VALUE_RE = re.compile(rb'<v>[^<]|<t(?:\s[^>]*)?>[^<]')
+
+SIDECAR_VERSION = 1
+
+
+def pick_sheet(sheets, sheet_name: Optional[str] = None, first_visible: bool = False) -> Dict[str, object]:
+    """Choose the target sheet: by name, else first visible (if asked), else the active sheet."""
+    worksheets = [s for s in sheets if s['is_worksheet']]
+    if not worksheets:
+        raise ValueError('Workbook has no worksheets')
+    if sheet_name is not None:
+        for s in worksheets:
+            if s['name'] == sheet_name:
+                return s
+        raise ValueError(f"Sheet '{sheet_name}' not found in workbook")
+    if first_visible:
+        for s in worksheets:
+            if s['state'] == 'visible':
+                return s
+    for s in worksheets:
+        if s['active']:
+            return s
+    return worksheets[0]
+
+
+def sidecar_path(master_path: Path | str) -> Path:
+    master_path = Path(master_path)
+    return master_path.with_name(f'.{master_path.name}.tail.json')
+
+
+class MasterTail:
+    """Last row / first blank ID row / max ID of a master sheet, computed in one pass."""
+
+    def __init__(self, last_row: int = 0, last_data_row: int = 0,
+                 first_blank_row: Optional[int] = None, max_id: int = 0, sheet_path: str = ''):
+        self.last_row = last_row
+        self.last_data_row = last_data_row
+        self.first_blank_row = first_blank_row
+        self.max_id = max_id
+        self.sheet_path = sheet_path
+        self._expected_row = 2
+
+    def __repr__(self) -> str:
+        return (f'MasterTail(last_row={self.last_row}, last_data_row={self.last_data_row}, '
+                f'first_blank_row={self.blank_row}, max_id={self.max_id})')
+
+    @property
+    def next_id(self) -> int:
+        return self.max_id + 1
+
+    @property
+    def blank_row(self) -> int:
+        """First blank ID row, or the row after the last one if column A has no gaps."""
+        return self.first_blank_row if self.first_blank_row is not None else max(self.last_row + 1, 2)
+
+    @property
+    def append_row(self) -> int:
+        """Row where appending after the data starts: blank_row when it comes after all
+        data (where the openpyxl engine writes), else the row after the last value.
+        Rows from here on hold formatting at most.
+        """
+        after_data = max(self.last_data_row + 1, 2)
+        return self.blank_row if self.blank_row >= after_data else after_data
+
+    def record_append(self, start_row: int, count: int) -> None:
+        """Cover count rows written from start_row with IDs continuing from next_id."""
+        if not count:
+            return
+        end = start_row + count - 1
+        self.last_row = max(self.last_row, end)
+        self.last_data_row = end
+        self.max_id += count
+        if self.first_blank_row is not None and self.first_blank_row >= start_row:
+            self.first_blank_row = end + 1
+
+    # --- Scanning ---
+
+    def scan(self, block: bytes) -> None:
+        """Update the index from a block of complete <row> elements."""
+        for attrs, body in _ROW_RE.findall(block):
+            rn = _ROW_NUM_RE.search(attrs)
+            r = int(rn.group(1)) if rn else self.last_row + 1
+            if not body:
+                continue
+            self.last_row = r
+            if _HAS_VALUE_RE.search(body):
+                self.last_data_row = r
+
+            id_value = None
+            cell = _CELL_A_RE.search(body)
+            if cell:
+                cell_body = cell.group(2) or b''
+                if _HAS_VALUE_RE.search(cell_body):
+                    id_value = cell_body
+                    t = _CELL_TYPE_RE.search(cell.group(1))
+                    v = _CELL_VALUE_RE.search(cell_body)
+                    if v and (t is None or t.group(1) == b'n'):
+                        try:
+                            vi = int(float(v.group(1)))
+                        except ValueError:
+                            vi = None
+                        if vi is not None and vi > self.max_id:
+                            self.max_id = vi
+
+            if r < 2 or self.first_blank_row is not None:
+                continue
+            if r > self._expected_row:
+                # Rows missing from the XML are blank rows
+                self.first_blank_row = self._expected_row
+            elif id_value is None:
+                self.first_blank_row = r
+            self._expected_row = r + 1
+
+    def scan_stream(self, src) -> None:
+        """Scan a worksheet XML stream chunk by chunk."""
+        buf = b''
+        started = False
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            buf += chunk
+            if not started:
+                m = SHEETDATA_OPEN_RE.search(buf)
+                if m is None:
+                    if not chunk:
+                        return
+                    continue
+                if m.group(1) == b'/':
+                    return
+                buf = buf[m.end():]
+                started = True
+            end = buf.find(b'</sheetData>')
+            if end != -1:
+                self.scan(buf[:end])
+                return
+            cut = buf.rfind(b'</row>')
+            if cut != -1:
+                cut += len(b'</row>')
+                self.scan(buf[:cut])
+                buf = buf[cut:]
+            if not chunk:
+                self.scan(buf)
+                return
+
+    # --- Trailing rows ---
+
+    @staticmethod
+    def split_blank_tail(block: bytes) -> Tuple[bytes, List[Tuple[int, bytes]]]:
+        """Split the run of rows without cell values off the end of a block of complete
+        rows. Returns (rest, [(row number, row xml), ...]); only the end is searched.
+        """
+        held: List[Tuple[int, bytes]] = []
+        end = len(block)
+        while True:
+            start = block.rfind(b'<row', 0, end)
+            if start == -1:
+                break
+            row = block[start:end]
+            rn = _ROW_NUM_RE.search(row, 0, row.find(b'>'))
+            if rn is None or _HAS_VALUE_RE.search(row):
+                break
+            held.append((int(rn.group(1)), row))
+            end = start
+        held.reverse()
+        return block[:end], held
+
+    # --- Sidecar cache ---
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'last_row': self.last_row,
+            'last_data_row': self.last_data_row,
+            'first_blank_row': self.first_blank_row,
+            'max_id': self.max_id,
+            'sheet_path': self.sheet_path,
+        }
+
+    def save_sidecar(self, master_path: Path | str) -> None:
+        """Record the index for master_path as it is on disk right now."""
+        master_path = Path(master_path)
+        st = master_path.stat()
+        data = {'version': SIDECAR_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, **self.to_dict()}
+        try:
+            sidecar_path(master_path).write_text(json.dumps(data))
+        except OSError as e:
+            print(f"Warning: could not write tail cache for {master_path.name}: {e}")
+
+    @classmethod
+    def load_sidecar(cls, master_path: Path | str, sheet_path: Optional[str] = None) -> Optional['MasterTail']:
+        """Return the cached index if it still matches the file's size and mtime."""
+        master_path = Path(master_path)
+        try:
+            data = json.loads(sidecar_path(master_path).read_text())
+            st = master_path.stat()
+        except (OSError, ValueError):
+            return None
+        if (data.get('version') != SIDECAR_VERSION or data.get('size') != st.st_size
+                or data.get('mtime_ns') != st.st_mtime_ns):
+            return None
+        if sheet_path is not None and data.get('sheet_path') != sheet_path:
+            return None
+        return cls(data['last_row'], data['last_data_row'], data['first_blank_row'],
+                   data['max_id'], data.get('sheet_path', ''))
+
+    @classmethod
+    def for_path(cls, master_path: Path | str, sheet_name: Optional[str] = None,
+                 first_visible: bool = False, use_cache: bool = True) -> 'MasterTail':
+        """Index the master at master_path, from the sidecar cache when it is still valid."""
+        master_path = Path(master_path)
+        with zipfile.ZipFile(master_path) as zf:
+            target = pick_sheet(workbook_sheets(zf), sheet_name, first_visible)
+            if use_cache:
+                cached = cls.load_sidecar(master_path, target['path'])
+                if cached is not None:
+                    return cached
+            tail = cls(sheet_path=target['path'])
+            with zf.open(target['path']) as src:
+                tail.scan_stream(src)
+        if use_cache:
+            tail.save_sidecar(master_path)
+        return tail
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Stage-cached pipeline runner: download -> transform -> append -> upload.
+
+Replaces chaining download_files.main and the runner*.sh scripts, which each start
+a fresh interpreter and redo every step. Each stage's result is cached under
+PIPELINE_CACHE_DIR (default .pipeline-cache) in <stage>/<key>/, where the key is
+a hash of the stage's input file contents and its parameters:
+- download:  always runs; unchanged files come back as 304s from the download cache
+- transform: keyed on the supplier files and the price date; output is the master-schema
+             DataFrame (IDs are assigned by the append stage, so the master is not part of the key)
+- append:    keyed on the master and the transform output; output is the updated master copy
+- upload:    keyed on the updated master and the remote location; records a completed upload
+
+A re-run after an upload failure therefore goes straight to the upload, and an
+unchanged supplier file skips the transform. Each stage keeps its PIPELINE_CACHE_KEEP
+(default 3) most recently used entries; older ones are deleted after every stage run,
+so the cache does not grow by a master copy per day. Every run writes a per-stage timing
+report to <out dir>/runs/<timestamp>.json, with the finer spans of run_metrics.py
+(sheet reads, backup, save...) recorded inside the stages that ran.
+
+Usage:
+    python pipeline.py [input_file ...] [--local] [--no-upload] [--force STAGE ...]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import pandas as pd
+    import download_files as dl
+    import excel_reader as xr
+    from excel_processor import APPEND_ENGINE, DEDUPE_APPENDS, write_updated_master_copy
+    from run_metrics import RunReport, finish_run, start_run
+except ImportError as e:
+    print('DEPENDENCY_ERROR: Required libraries are not installed.')
+    print('Please install: pip install requests python-dotenv msal pandas openpyxl')
+    print(e)
+    sys.exit(1)
+
+PIPELINE_CACHE_DIR = Path(os.getenv("PIPELINE_CACHE_DIR", ".pipeline-cache"))
+PIPELINE_CACHE_KEEP = int(os.getenv("PIPELINE_CACHE_KEEP", "3"))
+STAGES = ('download', 'transform', 'append', 'upload')
+STAGE_RECORD = 'stage.json'
+# Bump when a stage's implementation changes what it produces
+STAGE_VERSION = 1
+# Work dirs of runs killed mid-stage are removed once this old
+STALE_WORK_SECONDS = 24 * 3600
+
+
+def file_sha256(path: Path | str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class StageCache:
+    """Stage outputs stored under <root>/<stage>/<key>/ with a stage.json record."""
+
+    def __init__(self, root: Path | str, keep: int = PIPELINE_CACHE_KEEP):
+        self.root = Path(root)
+        self.keep = max(1, keep)
+
+    def __repr__(self) -> str:
+        return f'StageCache({self.root})'
+
+    @staticmethod
+    def key(stage: str, inputs: Dict[str, str], params: Dict[str, object]) -> str:
+        """Hash of the stage name/version, the input content hashes and the parameters."""
+        blob = json.dumps({'stage': stage, 'version': STAGE_VERSION, 'inputs': inputs, 'params': params},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:32]
+
+    def entry_dir(self, stage: str, key: str) -> Path:
+        return self.root / stage / key
+
+    def lookup(self, stage: str, key: str) -> Optional[dict]:
+        """The stage record for key if it and every output it lists are present."""
+        entry = self.entry_dir(stage, key)
+        try:
+            record = json.loads((entry / STAGE_RECORD).read_text())
+        except (OSError, ValueError):
+            return None
+        if not all((entry / name).exists() for name in record.get('outputs', [])):
+            return None
+        # A hit counts as a use for retention
+        os.utime(entry / STAGE_RECORD)
+        return record
+
+    def run(self, stage: str, key: str, fn: Callable[[Path], dict]) -> dict:
+        """Run fn(work_dir), which writes its outputs into work_dir and returns the record
+        (with an 'outputs' list of file names). The entry only appears once fn succeeds.
+        """
+        entry = self.entry_dir(stage, key)
+        work = entry.with_name(f'.{key}.{uuid.uuid4().hex[:8]}.tmp')
+        work.mkdir(parents=True)
+        try:
+            record = fn(work)
+            record.setdefault('outputs', [])
+            record['created'] = datetime.now().isoformat(timespec='seconds')
+            (work / STAGE_RECORD).write_text(json.dumps(record, indent=1, default=str))
+            if entry.exists():
+                shutil.rmtree(entry)
+            os.replace(work, entry)
+        except BaseException:
+            shutil.rmtree(work, ignore_errors=True)
+            raise
+        self.prune(stage)
+        return record
+
+    def prune(self, stage: str) -> int:
+        """Delete all but the keep most recently used entries of stage (and stale work
+        dirs). Returns the number of entries removed.
+        """
+        stage_dir = self.root / stage
+        if not stage_dir.is_dir():
+            return 0
+        now = time.time()
+        entries = []
+        for d in stage_dir.iterdir():
+            try:
+                if d.name.startswith('.'):
+                    if d.name.endswith('.tmp') and now - d.stat().st_mtime > STALE_WORK_SECONDS:
+                        shutil.rmtree(d, ignore_errors=True)
+                    continue
+                entries.append(((d / STAGE_RECORD).stat().st_mtime_ns, d))
+            except OSError:
+                # No record: an entry that never completed
+                entries.append((0, d))
+        entries.sort(reverse=True)
+        for _, d in entries[self.keep:]:
+            shutil.rmtree(d, ignore_errors=True)
+        return max(0, len(entries) - self.keep)
+
+
+class Pipeline:
+    """One run of the download -> transform -> append -> upload stages."""
+
+    def __init__(self, input_names: List[str], out_dir: Path | str = Path('new_files'),
+                 cache_dir: Path | str = PIPELINE_CACHE_DIR, *, local: bool = False,
+                 upload: bool = True, force: tuple = (), engine: Optional[str] = None,
+                 dedupe: Optional[bool] = None):
+        self.input_names = list(input_names)
+        self.out_dir = Path(out_dir)
+        self.cache = StageCache(cache_dir)
+        self.local = local
+        self.upload = upload
+        self.force = set(force)
+        self.engine = engine or APPEND_ENGINE
+        self.dedupe = DEDUPE_APPENDS if dedupe is None else dedupe
+        self.stages: List[dict] = []
+        self.started = datetime.now()
+
+    # --- Stage bookkeeping ---
+
+    def _stage(self, stage: str, inputs: Dict[str, str], params: Dict[str, object],
+               fn: Callable[[Path], dict]) -> tuple:
+        """Return (entry dir, record) for stage, from the cache when the key is known."""
+        key = self.cache.key(stage, inputs, params)
+        t0 = time.perf_counter()
+        record = None if stage in self.force else self.cache.lookup(stage, key)
+        cached = record is not None
+        if not cached:
+            print(f"[{stage}] running (key {key[:12]})")
+            try:
+                record = self.cache.run(stage, key, fn)
+            except Exception as e:
+                self.stages.append({'stage': stage, 'key': key, 'cached': False,
+                                    'seconds': round(time.perf_counter() - t0, 4), 'error': str(e)})
+                raise
+        else:
+            print(f"[{stage}] cached (key {key[:12]}), skipped")
+        self.stages.append({'stage': stage, 'key': key, 'cached': cached,
+                            'seconds': round(time.perf_counter() - t0, 4),
+                            **{k: v for k, v in record.items() if k in ('rows', 'files', 'remote')}})
+        return self.cache.entry_dir(stage, key), record
+
+    # --- Stages ---
+
+    def download(self) -> List[Path]:
+        """Fetch the master and supplier files into out_dir (or use the local copies)."""
+        names = [dl.MASTER_FILENAME_REMOTE] + self.input_names
+        t0 = time.perf_counter()
+        if self.local:
+            paths = [self.out_dir / name for name in names]
+            missing = [str(p) for p in paths if not p.exists()]
+            if missing:
+                raise FileNotFoundError(f"Local inputs not found: {', '.join(missing)}")
+        else:
+            listing = [{"name": name, "local_name": name,
+                        "folder_override": dl.MASTER_FOLDER if i == 0 else None}
+                       for i, name in enumerate(names)]
+            results = dl.download_all(listing, self.out_dir)
+            failed = [r["name"] for r in results if not r["ok"]]
+            if failed:
+                raise RuntimeError(f"Download failed: {', '.join(failed)}")
+            paths = [r["path"] for r in results]
+        self.stages.append({'stage': 'download', 'key': None, 'cached': self.local,
+                            'seconds': round(time.perf_counter() - t0, 4), 'files': len(paths)})
+        return paths
+
+    def transform(self, inputs: List[Path]) -> Path:
+        hashes = {p.name: file_sha256(p) for p in inputs}
+
+        def run(work: Path) -> dict:
+            frames = [xr.transform_input_to_master_df(p) for p in inputs]
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            df.to_pickle(work / 'master_df.pkl')
+            print(f"[transform] {len(df)} rows from {len(inputs)} file(s)")
+            return {'outputs': ['master_df.pkl'], 'rows': len(df), 'inputs': hashes}
+
+        # Price_Date is "today", so a cached transform is only reused on the same day
+        entry, _ = self._stage('transform', hashes, {'price_date': date.today().isoformat()}, run)
+        return entry / 'master_df.pkl'
+
+    def append(self, master: Path, frame: Path) -> Path:
+        inputs = {'master': file_sha256(master), 'frame': file_sha256(frame)}
+        out_path = self.out_dir / dl.UPDATED_MASTER_FILENAME
+
+        def run(work: Path) -> dict:
+            df = pd.read_pickle(frame)
+            written = write_updated_master_copy(df, master_dir=master.parent, master_filename=master.name,
+                                                out_filename=dl.UPDATED_MASTER_FILENAME, engine=self.engine,
+                                                dedupe=self.dedupe)
+            shutil.copy2(written, work / dl.UPDATED_MASTER_FILENAME)
+            return {'outputs': [dl.UPDATED_MASTER_FILENAME], 'rows': len(df)}
+
+        # MASTER_DEDUPE changes which rows are written, so it is part of the key
+        entry, record = self._stage('append', inputs, {'engine': self.engine, 'dedupe': self.dedupe}, run)
+        cached_copy = entry / dl.UPDATED_MASTER_FILENAME
+        # On a cache hit the copy in out_dir may be missing or stale
+        if not out_path.exists() or file_sha256(out_path) != file_sha256(cached_copy):
+            shutil.copy2(cached_copy, out_path)
+        return out_path
+
+    def upload_master(self, updated: Path) -> None:
+        folder = os.getenv('MASTER_UPLOAD_FOLDER', dl.MASTER_FOLDER)
+        remote = f"{folder.rstrip('/')}/{dl.UPDATED_MASTER_FILENAME}"
+
+        def run(work: Path) -> dict:
+            if not dl.upload_sharepoint_file(updated, dl.UPDATED_MASTER_FILENAME, sharepoint_folder_override=folder):
+                raise RuntimeError(f"Upload of {updated.name} to {folder} failed")
+            return {'remote': remote}
+
+        self._stage('upload', {'master': file_sha256(updated)}, {'remote': remote}, run)
+
+    # --- Run ---
+
+    def run(self) -> int:
+        """Run every stage. Returns 0 on success, 1-4 for the stage that failed."""
+        t0 = time.perf_counter()
+        code, error = 0, None
+        step = 'download'
+        metrics = start_run('pipeline', self.out_dir)
+        try:
+            paths = self.download()
+            master, inputs = paths[0], paths[1:]
+            step = 'transform'
+            frame = self.transform(inputs)
+            step = 'append'
+            updated = self.append(master, frame)
+            if self.upload:
+                step = 'upload'
+                self.upload_master(updated)
+        except Exception as e:
+            code, error = STAGES.index(step) + 1, f"{step}: {e}"
+            print(f"ERROR in {step} stage: {e}")
+        finish_run(error, write=False)
+        self.write_report(time.perf_counter() - t0, error, metrics)
+        return code
+
+    def write_report(self, seconds: float, error: Optional[str], metrics: Optional[RunReport] = None) -> Path:
+        report = {'started': self.started.isoformat(timespec='seconds'), 'inputs': self.input_names,
+                  'seconds': round(seconds, 4), 'ok': error is None, 'error': error, 'stages': self.stages}
+        if metrics is not None:
+            m = metrics.to_dict()
+            report.update({k: m[k] for k in ('cpu_seconds', 'max_rss_mb', 'totals', 'spans') if k in m})
+        path = self.out_dir / 'runs' / f"{self.started.strftime('%Y%m%d_%H%M%S_%f')}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=1))
+        print("\nStage timings:")
+        for s in self.stages:
+            print(f"  {s['stage']:<10} {'cached' if s['cached'] else 'ran':<7} {s['seconds']:.2f}s")
+        if metrics is not None and metrics.spans:
+            metrics.print_summary('Spans:')
+        print(f"Run report: {path}")
+        return path
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("inputs", nargs="*", help="supplier files in SHAREPOINT_UPLOAD_FOLDER "
+                                                  "(default: HUDSON_FILE)")
+    parser.add_argument("--out-dir", type=Path, default=Path("new_files"))
+    parser.add_argument("--cache-dir", type=Path, default=PIPELINE_CACHE_DIR)
+    parser.add_argument("--local", action="store_true", help="use the files already in --out-dir, no download")
+    parser.add_argument("--no-upload", action="store_true", help="stop after the append stage")
+    parser.add_argument("--force", action="append", default=[], choices=STAGES[1:],
+                        help="re-run a stage even if it is cached (repeatable)")
+    args = parser.parse_args(argv)
+
+    inputs = args.inputs or [os.getenv("HUDSON_FILE", dl.DEFAULT_INPUT_FILENAME)]
+    pipeline = Pipeline(inputs, args.out_dir, args.cache_dir, local=args.local,
+                        upload=not args.no_upload, force=tuple(args.force))
+    return pipeline.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
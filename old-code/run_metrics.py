@@ -0,0 +1,369 @@
+"""
+Per-stage timing and memory spans with a JSON run report.
+
+Stages of a run (download, sheet read, transform, backup, append, save, upload) are
+wrapped in spans, either with the span() context manager or the @spanned decorator.
+Each span records wall time, CPU time (process-wide), rows processed and the
+process's peak RSS so far when it closed (getrusage, one system call). Spans nest:
+a 'save' inside an 'append' is listed with its parent.
+
+Spans are only recorded while a run is active (run_report(), or start_run() /
+finish_run()); otherwise they cost a function call. At the end of a run the report
+is written to <out dir>/runs/<timestamp>-<run name>.json with the spans, per-stage
+totals and the process's peak RSS, so nightly runs can be compared over time.
+
+RUN_TRACE_MEMORY=1 also traces allocations with tracemalloc, so each span reports
+peak_mb, the peak traced while it was open relative to the memory in use when it
+started. It is off by default because tracing makes pandas/openpyxl-heavy stages
+several times slower; without it peak_mb is null. Spans opened concurrently in
+threads (the parallel downloads) each see the whole process's allocations.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, the report leaves max_rss_mb out
+    resource = None
+
+TRACE_MEMORY = os.getenv("RUN_TRACE_MEMORY", "0").lower() in ('1', 'true', 'yes')
+REPORT_DIR_NAME = 'runs'
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far (None where getrusage is missing)."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6, 1)
+
+
+class Span:
+    """One timed stage of a run."""
+
+    __slots__ = ('name', 'parent', 'depth', 'started', 'seconds', 'cpu_seconds', 'rows', 'peak_mb',
+                 'max_rss_mb', 'error', 'meta', '_parent', '_t0', '_cpu0', '_mem0', '_peak', '_child_seconds')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, rows: Optional[int] = None, **meta):
+        self.name = name
+        self.parent = parent.name if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.started = datetime.now()
+        self.seconds = None
+        self.cpu_seconds = None
+        self.rows = rows
+        self.peak_mb = None
+        self.max_rss_mb = None
+        self.error = None
+        self.meta = meta
+        self._parent = parent
+        self._child_seconds = 0.0
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._mem0 = 0
+        self._peak = 0
+
+    def __repr__(self) -> str:
+        return f'Span({self.name}, seconds={self.seconds}, rows={self.rows})'
+
+    def add_rows(self, n: int) -> None:
+        self.rows = (self.rows or 0) + int(n)
+
+    @property
+    def self_seconds(self) -> Optional[float]:
+        """Wall time not spent in child spans."""
+        return None if self.seconds is None else round(max(self.seconds - self._child_seconds, 0.0), 4)
+
+    def nested_in_same_stage(self) -> bool:
+        """True when an enclosing span has the same name (e.g. a transform inside the batch transform)."""
+        p = self._parent
+        while p is not None:
+            if p.name == self.name:
+                return True
+            p = p._parent
+        return False
+
+    def to_dict(self) -> dict:
+        data = {'name': self.name, 'parent': self.parent, 'depth': self.depth,
+                'started': self.started.isoformat(timespec='milliseconds'),
+                'seconds': self.seconds, 'self_seconds': self.self_seconds,
+                'cpu_seconds': self.cpu_seconds, 'rows': self.rows,
+                'rows_per_s': round(self.rows / self.seconds) if self.rows and self.seconds else None,
+                'peak_mb': self.peak_mb, 'max_rss_mb': self.max_rss_mb, 'error': self.error}
+        data.update(self.meta)
+        return data
+
+
+class RunReport:
+    """The spans of one run, and where its report goes."""
+
+    def __init__(self, name: str, out_dir: Path | str | None = None, trace_memory: bool = TRACE_MEMORY):
+        self.name = name
+        self.out_dir = Path(out_dir) if out_dir is not None else Path('.')
+        self.trace_memory = trace_memory
+        self.started = datetime.now()
+        self.spans: List[Span] = []
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.cpu_seconds: Optional[float] = None
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def __repr__(self) -> str:
+        return f'RunReport({self.name}, spans={len(self.spans)})'
+
+    # --- Lifecycle ---
+
+    def start(self) -> 'RunReport':
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.seconds = round(time.perf_counter() - self._t0, 4)
+        self.cpu_seconds = round(time.process_time() - self._cpu0, 4)
+        self.error = error
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # --- Spans ---
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span(self) -> Optional[Span]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, rows: Optional[int] = None, **meta) -> Iterator[Span]:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        s = Span(name, parent, rows, **meta)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # The parent keeps the peak it reached so far; the child starts a fresh one
+            if parent is not None:
+                parent._peak = max(parent._peak, peak)
+            tracemalloc.reset_peak()
+            s._mem0 = s._peak = current
+        with self._lock:
+            self.spans.append(s)
+        stack.append(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            stack.pop()
+            s.seconds = round(time.perf_counter() - s._t0, 4)
+            s.cpu_seconds = round(time.process_time() - s._cpu0, 4)
+            s.max_rss_mb = max_rss_mb()
+            if parent is not None:
+                parent._child_seconds += s.seconds
+            if tracing and tracemalloc.is_tracing():
+                s._peak = max(s._peak, tracemalloc.get_traced_memory()[1])
+                s.peak_mb = round((s._peak - s._mem0) / 1e6, 2)
+                if parent is not None:
+                    parent._peak = max(parent._peak, s._peak)
+
+    # --- Report ---
+
+    def totals(self) -> Dict[str, dict]:
+        """Per span name: count, summed seconds/self seconds/CPU/rows and the largest peak.
+        A span nested in one of the same name only adds its self time, so the batch
+        transform and the per-file transforms inside it are not counted twice.
+        """
+        out: Dict[str, dict] = {}
+        for s in self.spans:
+            t = out.setdefault(s.name, {'count': 0, 'seconds': 0.0, 'self_seconds': 0.0, 'cpu_seconds': 0.0,
+                                        'rows': 0, 'peak_mb': None})
+            t['count'] += 1
+            t['self_seconds'] = round(t['self_seconds'] + (s.self_seconds or 0), 4)
+            if not s.nested_in_same_stage():
+                t['seconds'] = round(t['seconds'] + (s.seconds or 0), 4)
+                t['cpu_seconds'] = round(t['cpu_seconds'] + (s.cpu_seconds or 0), 4)
+                t['rows'] += s.rows or 0
+            if s.peak_mb is not None:
+                t['peak_mb'] = max(t['peak_mb'] or 0, s.peak_mb)
+        return out
+
+    def to_dict(self) -> dict:
+        data = {'run': self.name, 'argv': sys.argv[1:], 'pid': os.getpid(),
+                'started': self.started.isoformat(timespec='seconds'),
+                'seconds': self.seconds, 'cpu_seconds': self.cpu_seconds,
+                'ok': self.error is None, 'error': self.error, 'trace_memory': self.trace_memory}
+        if resource is not None:
+            data['max_rss_mb'] = max_rss_mb()
+        data['totals'] = self.totals()
+        data['spans'] = [s.to_dict() for s in self.spans]
+        return data
+
+    def report_path(self) -> Path:
+        stamp = self.started.strftime('%Y%m%d_%H%M%S_%f')
+        return self.out_dir / REPORT_DIR_NAME / f'{stamp}-{self.name}.json'
+
+    def write(self) -> Path:
+        path = self.report_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.tmp')
+        tmp.write_text(json.dumps(self.to_dict(), indent=1, default=str))
+        os.replace(tmp, path)
+        return path
+
+    def print_summary(self, title: str = 'Stage timings:') -> None:
+        print(f"\n{title}")
+        for name, t in self.totals().items():
+            peak = f"{t['peak_mb']:.1f}MB" if t['peak_mb'] is not None else '-'
+            rows = f"{t['rows']:,} rows" if t['rows'] else ''
+            print(f"  {name:<12} x{t['count']:<3} {t['seconds']:>8.2f}s  self {t['self_seconds']:>7.2f}s  "
+                  f"cpu {t['cpu_seconds']:>7.2f}s  peak {peak:>8}  {rows}")
+
+
+# --- Module-level run ---
+
+_current: Optional[RunReport] = None
+
+
+def _forget_run_in_child() -> None:
+    # Forked pool workers (process-hda batches) inherit the run; their spans could never
+    # reach the parent's report, so they record nothing and do not pay for tracing
+    global _current
+    if _current is not None and _current._started_tracing:
+        tracemalloc.stop()
+    _current = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_run_in_child)
+
+
+def current_run() -> Optional[RunReport]:
+    return _current
+
+
+def start_run(name: str, out_dir: Path | str | None = None, trace_memory: bool = TRACE_MEMORY) -> RunReport:
+    """Make a new run the one spans are recorded into."""
+    global _current
+    _current = RunReport(name, out_dir, trace_memory).start()
+    return _current
+
+
+def finish_run(error: Optional[str] = None, write: bool = True) -> Optional[Path]:
+    """End the active run; write its report unless write is False. Returns the report path."""
+    global _current
+    report, _current = _current, None
+    if report is None:
+        return None
+    report.finish(error)
+    if not write:
+        return None
+    try:
+        path = report.write()
+    except OSError as e:
+        print(f"Could not write run report: {e}")
+        return None
+    report.print_summary()
+    print(f"Run report: {path}")
+    return path
+
+
+@contextmanager
+def run_report(name: str, out_dir: Path | str | None = None, write: bool = True,
+               trace_memory: bool = TRACE_MEMORY) -> Iterator[RunReport]:
+    """Record spans for the duration of the block and write the report at the end,
+    also when the block raises (sys.exit(0) counts as success). A block that fails
+    without raising can set report.error itself.
+    """
+    report = start_run(name, out_dir, trace_memory)
+    try:
+        yield report
+    except SystemExit as e:
+        finish_run(None if e.code in (None, 0) else f'exit {e.code}', write)
+        raise
+    except BaseException as e:
+        finish_run(f'{type(e).__name__}: {e}', write)
+        raise
+    else:
+        finish_run(report.error, write)
+
+
+class _NoSpan:
+    """Stands in for a Span when no run is active."""
+
+    def add_rows(self, n: int) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name: str, rows: Optional[int] = None, **meta) -> Iterator[Span]:
+    """Time the block as a stage of the active run (a no-op when there is none)."""
+    report = _current
+    if report is None:
+        yield _NO_SPAN
+        return
+    with report.span(name, rows, **meta) as s:
+        yield s
+
+
+def add_rows(n: int) -> None:
+    """Count n rows against the innermost open span of this thread, if any."""
+    report = _current
+    s = report.current_span() if report is not None else None
+    if s is not None:
+        s.add_rows(n)
+
+
+def note(**meta) -> None:
+    """Attach extra fields (file name, bytes, cache hit...) to the innermost open span."""
+    report = _current
+    s = report.current_span() if report is not None else None
+    if s is not None:
+        s.meta.update(meta)
+
+
+def spanned(name: str, rows: Optional[Callable] = None):
+    """Decorator: run the function inside span(name). rows, if given, is called with the
+    return value and gives the rows processed (e.g. rows=len for a DataFrame).
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _current is None:
+                return fn(*args, **kwargs)
+            with span(name, fn=fn.__name__) as s:
+                result = fn(*args, **kwargs)
+                if rows is not None and result is not None:
+                    try:
+                        s.add_rows(rows(result))
+                    except (TypeError, ValueError):
+                        pass
+                return result
+        return inner
+    return wrap
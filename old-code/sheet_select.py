@@ -0,0 +1,80 @@
+"""
+Sheet resolution for supplier workbooks.
+
+Picks a sheet by name from the workbook metadata (workbook.xml inside the zip)
+and parses only that sheet, instead of pd.read_excel(..., sheet_name=None)
+materialising every sheet just to choose one.
+
+Matching (case-insensitive, whitespace-trimmed):
+1. exact name match with the preferred name
+2. first sheet whose name contains every word of the preferred name
+"""
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from run_metrics import span, spanned
+from xlsx_stream import workbook_sheets
+
+DEFAULT_SHEET = 'matrix table'
+
+
+def list_sheet_names(path: Path | str) -> List[str]:
+    """Worksheet names in workbook order (hidden ones included), without parsing any sheet."""
+    path = Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            return [str(s['name']) for s in workbook_sheets(zf) if s['is_worksheet']]
+    # Legacy .xls and other non-zip formats: let pandas list them
+    with pd.ExcelFile(path) as xls:
+        return [str(n) for n in xls.sheet_names]
+
+
+def match_sheet_name(names: List[str], prefer: Optional[str] = None) -> Optional[str]:
+    """Return the sheet in names matching prefer (exact first, then all words), or None."""
+    wanted = (prefer or DEFAULT_SHEET).strip().lower()
+    for name in names:
+        if str(name).strip().lower() == wanted:
+            return name
+    words = [w for w in wanted.split() if w]
+    for name in names:
+        nrm = str(name).strip().lower()
+        if all(w in nrm for w in words):
+            return name
+    return None
+
+
+def resolve_sheet(path: Path | str, prefer: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """Resolve prefer against the sheets of path. Returns (sheet name or None, all sheet names)."""
+    names = list_sheet_names(path)
+    return match_sheet_name(names, prefer), names
+
+
+@spanned('read_sheet', rows=lambda result: 0 if result[1] is None else len(result[1]))
+def read_preferred_sheet(path: Path | str, prefer: Optional[str] = None) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+    """Parse only the sheet matching prefer. Returns (name, DataFrame), or (None, None) if
+    no sheet matches (a warning listing the available sheets is printed).
+    """
+    path = Path(path)
+    target, names = resolve_sheet(path, prefer)
+    if target is None:
+        print(f"WARNING: Preferred sheet '{prefer or DEFAULT_SHEET}' not found in {path.name}. "
+              f"Available sheets: {names}")
+        return None, None
+    return target, pd.read_excel(path, sheet_name=target)
+
+
+def iter_sheets(path: Path | str) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Yield (name, DataFrame) for every sheet, parsing one sheet at a time from a
+    single open workbook so only one sheet's frame is alive at once.
+    """
+    with pd.ExcelFile(path) as xls:
+        for name in xls.sheet_names:
+            with span('read_sheet', sheet=name) as s:
+                df = xls.parse(name)
+                s.add_rows(len(df))
+            yield name, df
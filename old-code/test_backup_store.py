@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test script for the deduplicating master-table backup store (backup_store.py).
+Snapshots a small master, appends through the streaming engine, snapshots again and
+checks that only the changed chunks are stored, that restore rebuilds each version
+exactly, and that pruning keeps the newest snapshot per day/week.
+"""
+
+import tempfile
+import zipfile
+from datetime import date
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+import backup_store
+import excel_processor as ep
+from backup_store import BackupStore, restore_master
+
+
+def _make_master(path: Path, n_rows: int = 300) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'DAILY PRICING - new'
+    ws.append(['ID'] + ep.MASTER_HEADERS)
+    for i in range(n_rows):
+        ws.append([100 + i, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON', 12, 0, 1000,
+                   75.5 + i, 0, 75.5 + i, 0, 0, 0, 0, 5])
+    wb.save(path)
+
+
+def _values(path: Path):
+    return list(load_workbook(path).active.iter_rows(values_only=True))
+
+
+def test_backup_store_dedup_and_restore():
+    """A second snapshot after an append stores only the new chunks; restore is exact."""
+    print("Testing deduplicating backup store...")
+    old_rows_per_chunk = backup_store.ROWS_PER_CHUNK
+    backup_store.ROWS_PER_CHUNK = 50
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            master = Path(tmp) / 'master.xlsx'
+            _make_master(master)
+            original = master.read_bytes()
+            store = BackupStore.for_master(master)
+
+            first = store.read_snapshot(master.name, store.backup(master, '20250901_090000').stem)
+            assert first['stored_bytes'] > 0
+
+            rows = [[date(2025, 9, 2), date(2025, 10, 1), 'WEST', 'HIGH', 'HUDSON', 24, 0, 1000,
+                     80.25, 0, 80.25, 0, 0, 0, 0, 5]]
+            ep.stream_append_to_master(rows, master)
+            second = store.read_snapshot(master.name, store.backup(master, '20250902_090000').stem)
+            # Only the sheet head (dimension dropped), the last row group and styles change
+            assert 0 < second['new_chunks'] <= 4, second['new_chunks']
+            assert second['stored_bytes'] < first['stored_bytes'] / 2
+
+            # Restore by day prefix to a new file: same members and bytes as the original
+            out = Path(tmp) / 'restored.xlsx'
+            store.restore(master.name, '20250901', out)
+            (Path(tmp) / 'orig.xlsx').write_bytes(original)
+            with zipfile.ZipFile(out) as a, zipfile.ZipFile(Path(tmp) / 'orig.xlsx') as b:
+                assert a.namelist() == b.namelist()
+                assert all(a.read(n) == b.read(n) for n in a.namelist())
+
+            # Restoring over the master snapshots its current state first
+            appended = _values(master)
+            restore_master(master, '20250901_090000')
+            assert _values(master) == _values(out)
+            latest = store.snapshots(master.name)[-1]
+            restore_master(master, latest)
+            assert _values(master) == appended
+            print("✓ Backups dedupe unchanged parts and restore exactly!")
+    finally:
+        backup_store.ROWS_PER_CHUNK = old_rows_per_chunk
+
+
+def test_backup_store_retention():
+    """prune keeps the newest snapshot of the last N days and M weeks and drops dead chunks."""
+    print("Testing backup retention...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master, n_rows=5)
+        store = BackupStore.for_master(master)
+        stamps = ['20250818_090000', '20250825_090000', '20250901_090000',
+                  '20250902_090000', '20250902_170000', '20250903_090000']
+        for i, stamp in enumerate(stamps):
+            wb = load_workbook(master)
+            wb.active['D2'] = f'ZONE{i}'
+            wb.save(master)
+            store.backup(master, stamp)
+        chunks_before = sum(1 for _ in (store.root / 'objects').glob('*/*'))
+
+        removed, chunks = store.prune(keep_daily=2, keep_weekly=2)
+        kept = store.snapshots(master.name)
+        # Days: 0903, 0902 (newest of that day); weeks: 36 -> 0903, 35 -> 0825
+        assert kept == ['20250825_090000', '20250902_170000', '20250903_090000'], kept
+        assert removed == 3 and chunks > 0
+        assert sum(1 for _ in (store.root / 'objects').glob('*/*')) == chunks_before - chunks
+
+        out = Path(tmp) / 'restored.xlsx'
+        store.restore(master.name, '20250825', out)
+        assert load_workbook(out).active['D2'].value == 'ZONE1'
+        print("✓ Retention keeps daily/weekly snapshots and garbage-collects chunks!")
+
+
+def test_backup_store_empty_sheet():
+    """A blank sheet saved by Excel (<sheetData/>) is backed up and restored as is."""
+    print("Testing backup of an empty sheet...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master, n_rows=5)
+        wb = load_workbook(master)
+        wb.create_sheet('Blank')
+        wb.save(master)
+        # openpyxl writes <sheetData></sheetData>; Excel writes the self-closing form
+        patched = Path(tmp) / 'patched.xlsx'
+        with zipfile.ZipFile(master) as src, zipfile.ZipFile(patched, 'w', zipfile.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                data = src.read(info)
+                if info.filename == 'xl/worksheets/sheet2.xml':
+                    data = data.replace(b'<sheetData></sheetData>', b'<sheetData/>')
+                    assert b'<sheetData/>' in data
+                dst.writestr(info, data)
+        patched.replace(master)
+
+        assert ep.create_master_table_backup(master) is not None
+        out = Path(tmp) / 'restored.xlsx'
+        store = BackupStore.for_master(master)
+        store.restore(master.name, store.snapshots(master.name)[-1], out)
+        with zipfile.ZipFile(out) as a, zipfile.ZipFile(master) as b:
+            assert all(a.read(n) == b.read(n) for n in b.namelist())
+        print("✓ Empty sheets are backed up!")
+
+
+def test_backup_modes():
+    """excel_processor and transformer back up through one helper; unknown modes are rejected."""
+    print("\nTesting backup modes...")
+    import os
+    import transformer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'Master-Table.xlsx'
+        _make_master(master, n_rows=5)
+        copy = backup_store.backup_master_for_mode(master, 'copy')
+        assert copy.parent == Path(tmp) / 'backups' and copy.read_bytes() == master.read_bytes()
+        snapshot = backup_store.backup_master_for_mode(master, 'store')
+        assert snapshot.suffix == '.json' and BackupStore.for_master(master).snapshots(master.name)
+
+        old_env = os.environ.get('MASTER_BACKUP_MODE')
+        old_mode = ep.BACKUP_MODE
+        try:
+            os.environ['MASTER_BACKUP_MODE'] = ep.BACKUP_MODE = 'cpoy'
+            for create in (ep.create_master_table_backup, transformer.create_master_table_backup):
+                try:
+                    create(master)
+                except ValueError as e:
+                    assert 'cpoy' in str(e)
+                else:
+                    raise AssertionError(f'{create.__module__} accepted an unknown backup mode')
+        finally:
+            ep.BACKUP_MODE = old_mode
+            if old_env is None:
+                os.environ.pop('MASTER_BACKUP_MODE', None)
+            else:
+                os.environ['MASTER_BACKUP_MODE'] = old_env
+        assert backup_store.backup_master_for_mode(Path(tmp) / 'missing.xlsx', 'copy') is None
+    print("✓ Both modes work and unknown modes raise!")
+
+
+if __name__ == "__main__":
+    test_backup_store_dedup_and_restore()
+    test_backup_store_retention()
+    test_backup_store_empty_sheet()
+    test_backup_modes()
+    print("\n🎉 All backup store tests passed!")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test script for the benchmark suite (benchmark_suite.py).
+Runs the fast stages once at a tiny size and checks the regression check against
+a baseline: slower or hungrier beyond the threshold fails, noise below the floor does not.
+"""
+
+import tempfile
+from pathlib import Path
+
+import benchmark_suite as bs
+
+
+def test_regressions_respect_threshold_and_floor():
+    baseline = {'a@1000': {'seconds': 1.0, 'peak_mb': 10.0}, 'filter_sheet@1000': {'seconds': 0.002, 'peak_mb': 0.1}}
+    ok = {'a@1000': {'seconds': 1.2, 'peak_mb': 10.5}, 'filter_sheet@1000': {'seconds': 0.006, 'peak_mb': 0.4}}
+    assert bs.regressions(ok, baseline, threshold=0.25) == []
+
+    slow = {'a@1000': {'seconds': 1.5, 'peak_mb': 20.0}, 'new@1': {'seconds': 9.0, 'peak_mb': 1.0}}
+    found = bs.regressions(slow, baseline, threshold=0.25)
+    assert len(found) == 2 and all(line.startswith('a@1000') for line in found)
+    assert bs.regressions(slow, baseline, threshold=1.5) == []
+
+
+def test_suite_runs_and_records_baseline():
+    print("Testing benchmark suite...")
+    results = bs.run_suite(sizes=[200], case_names=['hda_matrix_to_master_cols', 'filter_sheet', 'a'],
+                           repeats=1, master_rows=50)
+    assert set(results) == {'hda_matrix_to_master_cols@200', 'filter_sheet@200', 'a@200'}
+    assert results['a@200']['rows'] == 200 and results['a@200']['rows_per_s'] > 0
+    assert all(r['peak_mb'] > 0 for r in results.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'baseline.json'
+        bs.save_baseline(results, path)
+        assert bs.load_baseline(path) == results
+        assert bs.regressions(results, bs.load_baseline(path)) == []
+    print("✓ Suite measures stages and compares against its baseline!")
+
+
+if __name__ == "__main__":
+    test_regressions_respect_threshold_and_floor()
+    test_suite_runs_and_records_baseline()
+    print("\n🎉 All benchmark suite tests passed!")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test script for the derived ERCOT columns J..AA (ercot_columns.py).
+Checks the computed values against what the legacy formulas evaluate to in
+Excel, and that 'values', 'formulas' and 'both' modes write what readers expect:
+plain values, formulas only, or formulas whose cached results data_only=True sees.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+import ercot_columns as ec
+import workload_generator as wg
+
+
+def _sheet(rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Start Month', 'State', 'Utility', 'Congestion Zone', 'Load Factor', 'Term', 'Product',
+               '0-200,000'])
+    for row in rows:
+        ws.append(row)
+    return wb
+
+
+ROWS = [
+    [datetime(2025, 8, 1), 'TX', 'Centerpoint', 'Houston LZ', 'LO', '12 Months', 'Fixed Price', 8.5],
+    # Excel's '=' ignores case; a numeric term never equals "24 Months"
+    [datetime(2025, 9, 1), 'TX', 'oncor', 'north lz', 'hi', 24, 'fixed price', None],
+    # Blank A and C, number in D, text in H
+    [None, 'TX', None, 5, 'RESIDENTIAL LO', '60 Months', 'Variable', 'n/a'],
+]
+
+
+def test_values_match_formulas():
+    """Each derived column equals what its legacy formula evaluates to."""
+    print("Testing derived values...")
+    base = pd.DataFrame(ROWS)
+    out = ec.derived_frame(base)
+    assert list(out.columns) == ec.DERIVED_COLS
+    assert out[10].tolist() == [1, 2, 3]
+    assert out[11].tolist() == ['CenterpointHouston LZ', 'oncornorth lz', '5']
+    assert out[12].tolist() == [date(2025, 8, 18)] * 3
+    assert out[13].tolist() == [datetime(2025, 8, 1), datetime(2025, 9, 1), 0]
+    assert out[14].tolist() == ['COAST', 'NORTH', 'NA']
+    assert out[15].tolist() == ['LOW', 'HIGH', 'NA']
+    assert out[16].tolist() == ['APG&E', 'APG&E', 'NA']
+    assert out[17].tolist() == [12, 0, 60]
+    assert out[20].tolist()[:2] == [85.0, 0.0] and pd.isna(out[20].iloc[2])
+    assert out[22].equals(out[20])
+    assert (out[19] == 200).all() and (out[27] == 10).all() and (out[[21, 23, 24, 25, 26]] == 0).all().all()
+    # Rows appended further down continue the J index
+    assert ec.derived_frame(base, first_row=10)[10].tolist() == [9, 10, 11]
+
+    formulas = ec.row_formulas(3)
+    assert formulas[10] == '=J2+1' and ec.row_formulas(2)[10] == 1
+    assert formulas[14] == ('=IF(K3="CenterpointHouston LZ","COAST",IF(K3="OncorNorth LZ","NORTH",'
+                            'IF(K3="AEP TX CENTRALSouth LZ","SOUTH",IF(K3="AEP TX CentralWest LZ","WEST",'
+                            'IF(K3="TNMPHouston LZ","TNMP","NA")))))')
+    assert formulas[17] == ('=IF(F3="12 Months",12,IF(F3="24 Months",24,IF(F3="36 Months",36,'
+                            'IF(F3="48 Months",48,IF(F3="60 Months",60,0)))))')
+    print("✓ Derived values match the formulas!")
+
+
+def test_write_modes():
+    """values: plain cells; formulas: formulas only; both: formulas with cached values."""
+    print("Testing write modes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        written = {}
+        for mode in ec.MODES:
+            path = Path(tmp) / f'{mode}.xlsx'
+            _sheet(ROWS).save(path)
+            assert ec.add_derived_columns(path, mode) == (3, mode)
+            plain = load_workbook(path).active
+            cached = load_workbook(path, data_only=True).active
+            written[mode] = ([[c.value for c in row] for row in plain.iter_rows(min_row=1, min_col=9)],
+                             [[c.value for c in row] for row in cached.iter_rows(min_row=2, min_col=10)])
+
+        headers = written['values'][0][0]
+        assert headers == list(ec.HEADERS.values())
+        values = written['values'][1]
+        assert values[0][:8] == [1, 'CenterpointHouston LZ', datetime(2025, 8, 18), datetime(2025, 8, 1),
+                                 'COAST', 'LOW', 'APG&E', 12]
+        assert values[2][10] is None and values[2][3] == 0
+        assert not any(isinstance(v, str) and v.startswith('=') for row in values for v in row)
+
+        formulas = written['formulas'][0]
+        assert formulas[2][2] == '=CONCATENATE(C3,D3)' and formulas[2][11] == '=IF(N3="",0,H3*10)'
+        assert all(v is None for v in written['formulas'][1][1][1:])
+
+        # Same formulas as 'formulas' mode, and data_only readers see the values
+        assert written['both'][0] == formulas
+        assert written['both'][1] == values
+    print("✓ All three modes write what readers expect!")
+
+
+def test_build_script_values_in_one_pass():
+    """The build script writes J..AA values with A..H; --formulas keeps the legacy output."""
+    print("Testing build_ercot_product_term_formulas.py...")
+    script = Path(__file__).parent / 'build_ercot_product_term_formulas.py'
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / '2-copy-reformat').mkdir()
+        wg.write_ercot_workbook(Path(tmp) / '2-copy-reformat' / 'ERCOT-new.xlsx', rows=1500)
+        out = Path(tmp) / '2-copy-reformat' / 'ERCOT-new-product-term-formulas.xlsx'
+        env = {k: v for k, v in os.environ.items() if k != 'ERCOT_DERIVED_COLUMNS'}
+        env['PYTHONPATH'] = str(script.parent)
+
+        sizes = {}
+        for flag in ('', '--formulas'):
+            result = subprocess.run([sys.executable, str(script)] + ([flag] if flag else []), cwd=tmp, env=env,
+                                    capture_output=True, text=True)
+            assert result.returncode == 0 and 'SUCCESS' in result.stdout, result.stdout + result.stderr
+            sizes[flag] = out.stat().st_size
+            df = pd.read_excel(out)
+            if flag:
+                assert df['N Region'].isna().all()
+            else:
+                assert len(df) > 0 and set(df['N Region'].fillna('NA')) <= {'COAST', 'NORTH', 'SOUTH', 'WEST', 'TNMP', 'NA'}
+                assert ((df['T'] - df['0-200,000'] * 10).abs() < 1e-9).all()
+                assert df['J Index'].tolist() == list(range(1, len(df) + 1))
+        assert sizes[''] < sizes['--formulas']
+    print(f"✓ Values file {sizes['']:,} bytes vs {sizes['--formulas']:,} with formulas!")
+
+
+def test_legacy_append_stub():
+    """excel_processor.add_formulas derives J..AA from B..I of the ID-in-A master."""
+    print("Testing excel_processor.add_formulas...")
+    import excel_processor as ep
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['ID'] + ep.BASE_COLS)
+    for i, row in enumerate(ROWS):
+        ws.append([100 + i] + row)
+    assert ep.add_formulas(ws, 1, 4, mode='values') is None
+    # The master's I header stays; the derived headers start at J
+    assert ws['I1'].value == '0-200,000' and ws['J1'].value == 'J Index'
+    derived = [[c.value for c in row] for row in ws.iter_rows(min_row=2, min_col=10, max_col=27)]
+    expected = ec.derived_frame(pd.DataFrame(ROWS)).astype(object)
+    expected = expected.where(expected.notna(), None).values.tolist()
+    for got, want in zip(derived, expected):
+        assert got[:8] + got[9:] == want, (got, want)
+    assert derived[0][:8] == [1, 'CenterpointHouston LZ', date(2025, 8, 18), datetime(2025, 8, 1),
+                              'COAST', 'LOW', 'APG&E', 12]
+    assert derived[0][10] == 85.0
+
+    cached = ep.add_formulas(ws, 3, 4, mode='both')
+    assert ws['J3'].value == '=J2+1' and ws['K3'].value == '=CONCATENATE(D3,E3)'
+    assert ws['M3'].value == '=B3' and ws['T3'].value == '=IF(N3="",0,I3*10)'
+    assert cached.loc[3, 14] == 'NORTH' and cached.loc[3, 20] == 0
+    print("✓ Legacy stub derives J..AA from the shifted columns!")
+
+if __name__ == "__main__":
+    test_values_match_formulas()
+    test_write_modes()
+    test_build_script_values_in_one_pass()
+    test_legacy_append_stub()
+    print("\n🎉 All ERCOT column tests passed!")
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared Graph client (graph_client.py) against a local fake
+Graph server (fake_graph.py): token, site ID and drive ID are fetched once and
+reused for every download and upload.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from fake_graph import FakeGraph
+from graph_client import GraphDriveClient
+
+
+def test_client_reuses_token_and_ids():
+    """Master + 2 supplier downloads and an upload cost one site and one drive lookup."""
+    print("Testing Graph client reuse...")
+    files = {
+        'Kilowatt/Client Pricing Sheets/DAILY PRICING - new.xlsx': b'master',
+        'Inputs/Hudson.xlsm': b'hudson',
+        'Inputs/Other.xlsx': b'other',
+    }
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph(files) as fake:
+        tmp = Path(tmp)
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider)
+        assert client.download('DAILY PRICING - new.xlsx', tmp / 'master.xlsx', '/Kilowatt/Client Pricing Sheets')
+        assert client.download('Hudson.xlsm', tmp / 'Hudson.xlsm', 'Inputs')
+        assert client.download('Other.xlsx', tmp / 'Other.xlsx', '/Inputs/')
+        assert client.download('Missing.xlsx', tmp / 'Missing.xlsx', 'Inputs') is None
+        assert client.upload(tmp / 'master.xlsx', 'master-file-updated.xlsx', '/Kilowatt/Client Pricing Sheets')
+
+        assert (tmp / 'Hudson.xlsm').read_bytes() == b'hudson'
+        assert fake.files['Kilowatt/Client Pricing Sheets/master-file-updated.xlsx'] == b'master'
+        assert fake.count('site') == 1 and fake.count('drive') == 1 and fake.count('content') == 5
+        assert fake.tokens_issued == 1
+
+        # A rejected token is refreshed once and the request retried
+        fake.token = 'rotated'
+        assert client.download('Hudson.xlsm', tmp / 'again.xlsm', 'Inputs')
+        assert fake.tokens_issued == 2
+        print("✓ Token, site ID and drive ID are reused across calls!")
+
+
+def test_id_cache_on_disk():
+    """A second client with the same ID cache file skips the site/drive lookups."""
+    print("\nTesting on-disk site/drive ID cache...")
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph({'a.xlsx': b'a'}) as fake:
+        cache = Path(tmp) / 'graph_ids.json'
+        for _ in range(2):
+            client = GraphDriveClient('host', 'site', base_url=fake.base_url,
+                                      token_provider=fake.token_provider, id_cache_path=cache)
+            assert client.download('a.xlsx', Path(tmp) / 'a.xlsx')
+        assert fake.count('site') == 1 and fake.count('drive') == 1
+
+        # Expired entries are looked up again
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider,
+                                  id_cache_path=cache, id_cache_ttl=-1)
+        client.drive_id()
+        assert fake.count('site') == 2
+        print("✓ Site/drive IDs are cached on disk with a TTL!")
+
+
+def test_download_all_runs_concurrently():
+    """download_files.download_all fetches the listed files in parallel and reports each one."""
+    print("\nTesting concurrent download stage...")
+    import os
+    import time
+
+    import download_files
+    import graph_client
+
+    files = {f'Inputs/file{i}.xlsx': f'data{i}'.encode() for i in range(3)}
+    env = {name: 'x' for name in graph_client.CONFIG_VARS + ('SHAREPOINT_UPLOAD_FOLDER',)}
+    saved = {name: os.environ.get(name) for name in env}
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph(files, latency=0.3) as fake:
+        os.environ.update(env)
+        graph_client._default_client = GraphDriveClient('host', 'site', base_url=fake.base_url,
+                                                        token_provider=fake.token_provider)
+        try:
+            listing = [{'name': f'file{i}.xlsx', 'local_name': f'file{i}.xlsx', 'folder_override': 'Inputs'}
+                       for i in range(3)]
+            listing.append({'name': 'missing.xlsx', 'local_name': 'missing.xlsx', 'folder_override': 'Inputs'})
+            t0 = time.perf_counter()
+            results = download_files.download_all(listing, Path(tmp), max_workers=4)
+            elapsed = time.perf_counter() - t0
+        finally:
+            graph_client.reset_default_client()
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        assert [r['ok'] for r in results] == [True, True, True, False]
+        assert (Path(tmp) / 'file2.xlsx').read_bytes() == b'data2'
+        # Sequential downloads would never overlap on the server
+        assert fake.max_active >= 2, fake.max_active
+        print(f"✓ 3 downloads of 0.3s each finished in {elapsed:.2f}s, {fake.max_active} at once!")
+
+def test_streamed_download_is_atomic():
+    """Large bodies arrive intact; a dropped transfer leaves the previous file untouched."""
+    print("\nTesting streamed, atomic downloads...")
+    import graph_client
+
+    big = bytes(range(256)) * (3 * graph_client.DOWNLOAD_CHUNK_SIZE // 256 + 7)
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph({'big.xlsx': big, 'cut.xlsx': big}) as fake:
+        tmp = Path(tmp)
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider)
+        assert client.download('big.xlsx', tmp / 'big.xlsx')
+        assert (tmp / 'big.xlsx').read_bytes() == big
+
+        (tmp / 'cut.xlsx').write_bytes(b'previous')
+        fake.truncate.add('cut.xlsx')
+        failed = False
+        try:
+            client.download('cut.xlsx', tmp / 'cut.xlsx')
+        except Exception:
+            failed = True
+        assert failed
+        assert (tmp / 'cut.xlsx').read_bytes() == b'previous'
+        assert sorted(p.name for p in tmp.iterdir()) == ['big.xlsx', 'cut.xlsx']
+        print("✓ Downloads stream to a temp file and are renamed into place!")
+
+def test_upload_session_resumes():
+    """Large uploads go in ranges; dropped ranges are resumed from the session status."""
+    print("\nTesting resumable upload sessions...")
+    import graph_upload
+    from graph_upload import RANGE_UNIT, UploadSession
+
+    data = bytes(range(256)) * (5 * RANGE_UNIT // 256) + b'tail'
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph() as fake:
+        local = Path(tmp) / 'master-file-updated.xlsx'
+        local.write_bytes(data)
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider)
+
+        # Ranges 2 and 4 drop the connection once; the upload still completes
+        fake.fail_ranges.update({2 * RANGE_UNIT, 4 * RANGE_UNIT})
+        upload = UploadSession(client, local, 'master-file-updated.xlsx', 'Pricing', chunk_size=RANGE_UNIT,
+                               retry_delay=0)
+        assert upload.run()
+        assert fake.files['Pricing/master-file-updated.xlsx'] == data
+        assert upload.ranges_sent == 6 and fake.count('upload_range') == 6 + 2
+        assert fake.count('upload_session') == 1
+        assert not graph_upload.state_path(local).exists()
+
+        # A run that gives up keeps its session; the next run resumes it instead of starting over
+        fake.fail_ranges.update({3 * RANGE_UNIT})
+        first = UploadSession(client, local, 'copy.xlsx', chunk_size=RANGE_UNIT, max_retries=0)
+        assert not first.run()
+        assert graph_upload.state_path(local).exists()
+        second = UploadSession(client, local, 'copy.xlsx', chunk_size=2 * RANGE_UNIT, retry_delay=0)
+        assert second.run()
+        assert fake.files['copy.xlsx'] == data
+        assert fake.count('upload_session') == 2 and second.ranges_sent == 2
+        print("✓ Upload sessions resume from the last acknowledged range!")
+
+def test_conditional_downloads_use_cache():
+    """An unchanged file costs one 304 request; identical content is stored once."""
+    print("\nTesting ETag-aware downloads with the content cache...")
+    from download_cache import DownloadCache
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph({'m.xlsx': b'v1', 'copy.xlsx': b'v1'}) as fake:
+        tmp = Path(tmp)
+        cache = DownloadCache(tmp / 'cache')
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider,
+                                  cache=cache)
+        assert client.download('m.xlsx', tmp / 'out' / 'm.xlsx')
+        assert client.download('copy.xlsx', tmp / 'out' / 'copy.xlsx')
+        assert len(list((tmp / 'cache' / 'blobs').glob('*/*'))) == 1
+
+        # Unchanged: 304, same content, still a copy of the cached blob
+        assert client.download('m.xlsx', tmp / 'out' / 'm.xlsx')
+        assert (tmp / 'out' / 'm.xlsx').read_bytes() == b'v1' and cache.holds(tmp / 'out' / 'm.xlsx')
+        statuses = [kind for kind, _ in fake.requests if kind == 'content']
+        assert len(statuses) == 3
+
+        # Changed remotely: full transfer of the new version
+        fake.files['m.xlsx'] = b'v2'
+        assert client.download('m.xlsx', tmp / 'out' / 'm.xlsx')
+        assert (tmp / 'out' / 'm.xlsx').read_bytes() == b'v2'
+
+        # Local files are copies: saving one in place leaves the blob and the other copies alone
+        assert client.download('copy.xlsx', tmp / 'out' / 'copy2.xlsx')
+        with open(tmp / 'out' / 'copy.xlsx', 'ab') as f:
+            f.write(b'-edited')
+        assert not cache.holds(tmp / 'out' / 'copy.xlsx') and cache.holds(tmp / 'out' / 'copy2.xlsx')
+        assert (tmp / 'out' / 'copy2.xlsx').read_bytes() == b'v1'
+        assert cache.lookup(f"{client._cache_key()}|copy.xlsx") is not None
+        assert client.download('copy.xlsx', tmp / 'out' / 'copy.xlsx')
+        assert (tmp / 'out' / 'copy.xlsx').read_bytes() == b'v1' and cache.holds(tmp / 'out' / 'copy.xlsx')
+
+        # holds() only vouches for paths materialised from the cache, not look-alikes
+        twin = tmp / 'twin.xlsx'
+        shutil.copy2(tmp / 'out' / 'm.xlsx', twin)
+        assert not cache.holds(twin) and cache.holds(tmp / 'out' / 'm.xlsx')
+        print("✓ Unchanged files are served from the cache after a 304!")
+
+def test_delta_watcher_picks_up_new_files():
+    """Only new/changed supplier files in the folder reach the handler; the token survives restarts."""
+    print("\nTesting delta-query folder watcher...")
+    from graph_delta import DeltaWatcher
+
+    files = {'Inputs/Old.xlsm': b'old', 'Inputs/notes.txt': b'n', 'Other/Skip.xlsx': b's'}
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph(files) as fake:
+        tmp = Path(tmp)
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider)
+        batches, order = [], []
+
+        def watcher():
+            return DeltaWatcher(client, '/Inputs', tmp / 'delta.json', download_dir=tmp / 'in',
+                                ignore=('master-file-updated.xlsx',))
+
+        def handler(paths):
+            order.append([p.name for p in paths])
+            batches.append(sorted(p.name for p in paths))
+            return True
+
+        # First poll only records what is there: existing files are not processed
+        assert watcher().poll(handler) == [] and batches == []
+
+        fake.delta_page_size = 1
+        fake.files['Inputs/Hudson1.xlsm'] = b'h1'
+        fake.files['Inputs/master-file-updated.xlsx'] = b'm'
+        fake.files['Other/Skip.xlsx'] = b's2'
+        fake.files['Inputs/Sub/Hudson2.xlsx'] = b'h2'
+        # Delta lists Hudson1 first, but Hudson2 was modified earlier
+        fake.modified['Inputs/Sub/Hudson2.xlsx'] = '2024-12-31T23:59:59Z'
+        watcher().poll(handler)
+        assert batches == [['Hudson1.xlsm', 'Hudson2.xlsx']] and order == [['Hudson2.xlsx', 'Hudson1.xlsm']]
+        assert (tmp / 'in' / 'Sub' / 'Hudson2.xlsx').read_bytes() == b'h2'
+
+        # Nothing changed; then one file changes and one is deleted
+        assert watcher().poll(handler) == []
+        fake.files['Inputs/Hudson1.xlsm'] = b'h1-v2'
+        del fake.files['Inputs/Sub/Hudson2.xlsx']
+        w = watcher()
+        assert w.poll(lambda paths: False) and len(w.state['pending']) == 1  # handler failed: stays pending
+        w.poll(handler)
+        assert batches[-1] == ['Hudson1.xlsm'] and len(batches) == 2
+
+        # A same-named file in a subfolder gets its own local path
+        fake.files['Inputs/Sub/Hudson1.xlsm'] = b'h1-sub'
+        assert watcher().poll(handler) == [tmp / 'in' / 'Sub' / 'Hudson1.xlsm']
+        assert (tmp / 'in' / 'Hudson1.xlsm').read_bytes() == b'h1-v2'
+        assert (tmp / 'in' / 'Sub' / 'Hudson1.xlsm').read_bytes() == b'h1-sub'
+
+        # An expired token resyncs without reprocessing what was already handled
+        fake.expire_delta = True
+        assert watcher().poll(handler) == [] and len(batches) == 3
+
+        # A delta that keeps answering 410 fails the poll after one resync instead of recursing
+        fake.expire_delta = 5
+        before = fake.count('delta')
+        try:
+            watcher().poll(handler)
+        except RuntimeError as e:
+            assert 'resyncRequired' in str(e)
+        else:
+            raise AssertionError('endless resyncRequired did not fail the poll')
+        assert fake.count('delta') - before == 2
+        print(f"✓ Watcher processed {len(batches)} batch(es) from {fake.count('delta')} delta request(s)!")
+
+def test_transport_retries_throttling_and_caps_concurrency():
+    """429/503 are retried after Retry-After/backoff; in-flight requests stay under the tenant cap."""
+    print("\nTesting throttling-aware Graph transport...")
+    import time
+
+    import requests
+    from graph_transport import GraphTransport
+
+    files = {f'f{i}.xlsx': b'x' for i in range(6)}
+    with tempfile.TemporaryDirectory() as tmp, FakeGraph(files, latency=0.1) as fake:
+        tmp = Path(tmp)
+        session = requests.Session()
+        transport = GraphTransport(session, tenant='test-throttle', max_in_flight=2, retry_base=0.01)
+        client = GraphDriveClient('host', 'site', base_url=fake.base_url, token_provider=fake.token_provider,
+                                  session=session, transport=transport)
+
+        fake.throttle, fake.retry_after = 2, '0.2'
+        t0 = time.perf_counter()
+        assert client.download('f0.xlsx', tmp / 'f0.xlsx')
+        assert time.perf_counter() - t0 >= 0.4  # Retry-After honoured twice
+        fake.throttle, fake.retry_after = 1, None
+        assert client.upload(tmp / 'f0.xlsx', 'up.xlsx')
+        assert fake.files['up.xlsx'] == b'x'
+        assert client.stats['retries'] == 3 and client.stats['throttled'] == 3
+        assert client.stats['throttled_seconds'] >= 0.4
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            done = list(pool.map(lambda i: client.download(f'f{i}.xlsx', tmp / f'f{i}.xlsx'), range(6)))
+        assert all(done) and fake.max_active == 2
+        print(f"✓ Throttled requests retried ({transport.summary()}); peak in-flight {fake.max_active}!")
+
+
+if __name__ == "__main__":
+    test_client_reuses_token_and_ids()
+    test_id_cache_on_disk()
+    test_download_all_runs_concurrently()
+    test_streamed_download_is_atomic()
+    test_upload_session_resumes()
+    test_conditional_downloads_use_cache()
+    test_delta_watcher_picks_up_new_files()
+    test_transport_retries_throttling_and_caps_concurrency()
+    print("\n🎉 All Graph client tests passed!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for batch process-hda (process_xlsm_batch in excel_processor.py).
+Transforms two copies of the sample Hudson workbook in a process pool and checks
+that they are appended to the master once, in file order, with contiguous IDs and
+a single backup.
+"""
+
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+import excel_processor as ep
+from backup_store import BackupStore
+
+SAMPLE_XLSM = Path(__file__).parent / 'HudsonMatrixPrices08272025020701PM.xlsm'
+
+
+def _make_master(path: Path) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'DAILY PRICING - new'
+    ws.append(['ID'] + ep.MASTER_HEADERS)
+    ws.append([100, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON', 12, 0, 1000,
+               75.5, 0, 75.5, 0, 0, 0, 0, 5])
+    wb.save(path)
+
+
+def test_process_xlsm_batch():
+    """Both files are transformed, concatenated in order and appended in one pass."""
+    print("Testing batch process-hda...")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        files = [tmp / 'b.xlsm', tmp / 'a.xlsm', tmp / 'broken.xlsm']
+        for f in files[:2]:
+            shutil.copyfile(SAMPLE_XLSM, f)
+        files[2].write_bytes(b'not a workbook')
+        master = tmp / 'master.xlsx'
+        _make_master(master)
+
+        appended, results = ep.process_xlsm_batch(files, master, 'matrix table', max_workers=2)
+        assert [r['path'] for r in results] == files
+        rows = results[0]['rows']
+        assert rows > 0 and [r['rows'] for r in results] == [rows, rows, 0]
+        assert results[2]['error'] and all('frame' not in r for r in results)
+        assert appended == 2 * rows
+
+        ids = [row[0] for row in load_workbook(master, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+        assert ids == list(range(100, 101 + appended))
+        assert len(BackupStore.for_master(master).snapshots(master.name)) == 1
+        print("✓ Batch transforms in parallel and appends once!")
+
+
+def test_process_xlsm_batch_append_failure():
+    """A failing append is reported per file instead of raising out of the batch."""
+    print("Testing batch append failure...")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        src = tmp / 'a.xlsm'
+        shutil.copyfile(SAMPLE_XLSM, src)
+        master = tmp / 'master.xlsx'
+        _make_master(master)
+        before = master.read_bytes()
+
+        def locked(df, dst):
+            raise PermissionError(f'{dst.name} is open in Excel')
+
+        saved = ep.append_master_formatted_dataframe_to_master
+        ep.append_master_formatted_dataframe_to_master = locked
+        try:
+            appended, results = ep.process_xlsm_batch([src], master, 'matrix table', max_workers=1)
+        finally:
+            ep.append_master_formatted_dataframe_to_master = saved
+        assert appended == 0 and results[0]['rows'] > 0
+        assert 'append failed' in results[0]['error'] and 'open in Excel' in results[0]['error']
+        assert master.read_bytes() == before
+        print("✓ Append failures are reported per file!")
+
+
+if __name__ == "__main__":
+    test_process_xlsm_batch()
+    test_process_xlsm_batch_append_failure()
+    print("\n🎉 All batch process-hda tests passed!")
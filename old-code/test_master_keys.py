@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the natural-key hash index (master_keys.py) that makes appends idempotent.
+Appends the same frame twice through a() with both engines and checks that the rerun
+adds nothing, that the index stays in sync without a rebuild, and that the delta is
+merged into the base once it grows.
+"""
+
+import tempfile
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+import excel_processor as ep
+import master_keys
+from master_keys import MasterKeyIndex, hash_frame, hash_rows, key_hash, scan_keys
+
+
+def _make_master(path: Path) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'DAILY PRICING - new'
+    ws.append(['ID'] + ep.MASTER_HEADERS)
+    ws.append([100, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON', 12, 0, 1000,
+               75.5, 0, 75.5, 0, 0, 0, 0, 5])
+    wb.save(path)
+
+
+def _frame(zones) -> pd.DataFrame:
+    return pd.DataFrame({
+        'ID': range(1, len(zones) + 1), 'Price_Date': [date(2025, 9, 2)] * len(zones),
+        'Date': [pd.Timestamp('2025-10-01')] * len(zones), 'Zone': zones, 'Load': ['HIGH'] * len(zones),
+        'REP1': ['HUDSON'] * len(zones), 'Term': [24.0] * len(zones), 'Min_MWh': [0] * len(zones),
+        'Max_MWh': [1000] * len(zones), 'Daily_No_Ruc': [0.8] * len(zones), 'RUC_Nodal': [0] * len(zones),
+        'Daily': [0.8] * len(zones), 'Com_Disc': [0] * len(zones), 'HOA_Disc': [0] * len(zones),
+        'Broker_Fee': [0] * len(zones), 'Meter_Fee': [0] * len(zones), 'Max_Meters': [5] * len(zones),
+    })
+
+
+def _ids(path: Path):
+    return [r[0] for r in load_workbook(path, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+
+
+def test_key_normalisation():
+    """The same key read back from the xlsx hashes like the value that was written."""
+    written = (date(2025, 9, 2), pd.Timestamp('2025-10-01'), 'WEST ', 'HIGH', 'HUDSON', 24.0, 0, 1000)
+    read_back = (datetime(2025, 9, 2), datetime(2025, 10, 1), 'WEST', 'HIGH', 'HUDSON', 24, 0.0, 1000)
+    assert key_hash(written) == key_hash(read_back)
+    assert key_hash(written) != key_hash(written[:5] + (12,) + written[6:])
+
+
+def test_scan_matches_openpyxl():
+    """The streamed XML scan hashes every row like an openpyxl read of columns B..I."""
+    print("Testing streamed key scan...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master)
+        wb = load_workbook(master)
+        wb.active.append([101, date(2025, 8, 1), date(2025, 9, 1), 'R&D <east>', None, 'HUDSON', 6, 0, 1000])
+        wb.active.append([])
+        wb.save(master)
+        ep.stream_append_to_master(
+            list(_frame(['WEST', 'SOUTH']).drop(columns=['ID']).itertuples(index=False, name=None)), master)
+
+        expected = [r for r in load_workbook(master, read_only=True).active.iter_rows(
+            min_row=2, min_col=2, max_col=9, values_only=True) if any(v is not None for v in r)]
+        scanned = list(scan_keys(master))
+        assert len(scanned) == len(expected) == 4
+        assert scanned[1][2] == 'R&D <east>'
+        assert list(hash_rows(scanned)) == list(hash_rows(expected))
+        print("✓ Streamed scan reads the same keys as openpyxl!")
+
+
+def test_reruns_are_idempotent():
+    """A rerun of a() with the same rows appends nothing, with either engine."""
+    print("Testing idempotent appends...")
+    for engine in ('stream', 'openpyxl'):
+        with tempfile.TemporaryDirectory() as tmp:
+            master = Path(tmp) / 'master.xlsx'
+            _make_master(master)
+            assert ep.a(_frame(['WEST', 'NORTH']), master, engine=engine) == 2
+            assert MasterKeyIndex(master).in_sync(), engine
+            assert ep.a(_frame(['WEST', 'NORTH', 'SOUTH']), master, engine=engine) == 1
+            assert ep.a(_frame(['WEST', 'SOUTH']), master, engine=engine) == 0
+            assert _ids(master) == [100, 101, 102, 103], (engine, _ids(master))
+
+            # A fresh rebuild from the xlsx agrees with the incrementally maintained index
+            incremental = MasterKeyIndex(master).contains(hash_frame(_frame(['WEST', 'NORTH', 'SOUTH', 'EAST'])))
+            rebuilt = MasterKeyIndex(master).build().contains(hash_frame(_frame(['WEST', 'NORTH', 'SOUTH', 'EAST'])))
+            assert incremental.tolist() == rebuilt.tolist() == [True, True, True, False]
+
+            # The updated copy also skips rows the master already has
+            out = ep.write_updated_master_copy(_frame(['WEST', 'EAST']), master_dir=tmp,
+                                               master_filename='master.xlsx', out_filename='out.xlsx',
+                                               engine=engine)
+            assert _ids(out) == [100, 101, 102, 103, 104]
+    print("✓ Reruns do not duplicate rows!")
+
+
+def test_delta_compaction():
+    """Once the delta outgrows the threshold it is merged into the sorted base."""
+    old_min = master_keys.COMPACT_MIN
+    master_keys.COMPACT_MIN = 2
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            master = Path(tmp) / 'master.xlsx'
+            _make_master(master)
+            ep.a(_frame(['WEST']), master, engine='stream')
+            assert MasterKeyIndex(master).manifest()['delta'] == 1
+            ep.a(_frame(['NORTH', 'SOUTH']), master, engine='stream')
+            m = MasterKeyIndex(master).manifest()
+            assert (m['base'], m['delta']) == (4, 0)
+            assert ep.a(_frame(['WEST', 'SOUTH', 'EAST']), master, engine='stream') == 1
+    finally:
+        master_keys.COMPACT_MIN = old_min
+
+
+if __name__ == "__main__":
+    test_key_normalisation()
+    test_scan_matches_openpyxl()
+    test_reruns_are_idempotent()
+    test_delta_compaction()
+    print("\n🎉 All master key index tests passed!")
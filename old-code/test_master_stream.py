@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming master-table append engine (master_stream.py)
+and the single-pass tail index (master_tail.py).
+Builds a small master with openpyxl, appends through the stream engine and checks
+that existing rows are untouched, new rows land at the end with continuing IDs,
+and master number formats are applied.
+"""
+
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+import excel_processor as ep
+from master_stream import stream_append_rows
+from master_tail import MasterTail, sidecar_path
+
+
+def _make_master(path: Path, n_rows: int = 5) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'DAILY PRICING - new'
+    ws.append(['ID'] + ep.MASTER_HEADERS)
+    for i in range(n_rows):
+        ws.append([100 + i, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON', 12, 0, 1000,
+                   75.5 + i, 0, 75.5 + i, 0, 0, 0, 0, 5])
+    wb.save(path)
+
+
+def test_stream_append_rows():
+    """New rows go after the last row, IDs continue from max(A), old rows are unchanged."""
+    print("Testing streaming append...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master)
+        before = list(load_workbook(master).active.iter_rows(values_only=True))
+
+        new_rows = [
+            [date(2025, 9, 2), date(2025, 10, 1), 'WEST', 'HIGH', 'HUDSON', 24, 0, 1000, 80.25, 0, 80.25, 0, 0, 0, 0, 5],
+            [date(2025, 9, 2), date(2025, 11, 1), 'COAST', 'MED', 'HUDSON', 36, 0, 1000, None, 0, 1.5, 0, 0, 0, 0, 5],
+        ]
+        appended, first_id = stream_append_rows(master, new_rows, formats=ep.MASTER_FORMATS, align_right=('F',))
+
+        ws = load_workbook(master).active
+        after = list(ws.iter_rows(values_only=True))
+
+        assert appended == 2 and first_id == 105, (appended, first_id)
+        assert after[:len(before)] == before
+        assert [r[0] for r in after[len(before):]] == [105, 106]
+        assert after[-2][3] == 'WEST' and after[-2][9] == 80.25
+        assert after[-1][9] is None and after[-1][11] == 1.5
+        assert after[-1][2].date() == date(2025, 11, 1)
+        last = ws.max_row
+        assert ws.cell(row=last, column=3).number_format == ep.MASTER_FORMATS['C']
+        assert ws.cell(row=last, column=10).number_format == ep.MASTER_FORMATS['J']
+        assert ws.cell(row=last, column=6).alignment.horizontal == 'right'
+        print("✓ Streaming append works correctly!")
+
+
+def test_stream_append_reuses_styles():
+    """Repeated appends reuse the registered styles instead of growing styles.xml."""
+    print("\nTesting style reuse across appends...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master, n_rows=1)
+        row = [[date(2025, 9, 2), date(2025, 10, 1), 'WEST', 'HIGH', 'HUDSON', 24, 0, 1000, 80.0, 0, 80.0, 0, 0, 0, 0, 5]]
+        stream_append_rows(master, row, formats=ep.MASTER_FORMATS, align_right=('F',))
+        wb = load_workbook(master)
+        n_styles = len(wb._cell_styles)
+        stream_append_rows(master, row, formats=ep.MASTER_FORMATS, align_right=('F',))
+        wb = load_workbook(master)
+        assert len(wb._cell_styles) == n_styles
+        assert [r[0] for r in wb.active.iter_rows(min_row=2, values_only=True)] == [100, 101, 102]
+        print("✓ Styles are registered once and reused!")
+
+
+def test_write_updated_master_copy_engines_match():
+    """write_updated_master_copy gives the same cell values with every engine."""
+    print("\nTesting stream, write_only and openpyxl engine output...")
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        _make_master(tmp / 'Master-Table.xlsx')
+        df = pd.DataFrame([{
+            'ID': None, 'Price_Date': date(2025, 9, 2), 'Date': date(2025, 10, 1), 'Zone': 'SOUTH', 'Load': 'LOW',
+            'REP1': 'HUDSON', 'Term': 12.0, 'Min_MWh': 0, 'Max_MWh': 1000, 'Daily_No_Ruc': 157.79999999999998,
+            'RUC_Nodal': 0.0, 'Daily': 157.79999999999998, 'Com_Disc': 0.0, 'HOA_Disc': 0.0, 'Broker_Fee': 0.0,
+            'Meter_Fee': 0.0, 'Max_Meters': 5,
+        }])
+        ep.write_updated_master_copy(df, tmp, 'Master-Table.xlsx', 'stream.xlsx', engine='stream')
+        ep.write_updated_master_copy(df, tmp, 'Master-Table.xlsx', 'legacy.xlsx', engine='openpyxl')
+        ep.write_updated_master_copy(df, tmp, 'Master-Table.xlsx', 'write_only.xlsx', engine='write_only')
+        stream_rows = list(load_workbook(tmp / 'stream.xlsx').active.iter_rows(values_only=True))
+        legacy_rows = list(load_workbook(tmp / 'legacy.xlsx').active.iter_rows(values_only=True))
+        assert stream_rows == legacy_rows, (stream_rows[-1], legacy_rows[-1])
+        ws = load_workbook(tmp / 'write_only.xlsx').active
+        assert list(ws.iter_rows(values_only=True)) == legacy_rows
+        assert ws['B7'].number_format == ep.MASTER_FORMATS['B'] and ws['F7'].alignment.horizontal == 'right'
+        print("✓ All engines produce the same rows!")
+
+
+def test_engines_fill_formatted_trailing_rows():
+    """Formatted but empty rows after the data do not push the append further down."""
+    print("\nTesting appends over formatted trailing rows...")
+    import pandas as pd
+    from openpyxl.styles import PatternFill
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        _make_master(tmp / 'Master-Table.xlsx', n_rows=3)
+        wb = load_workbook(tmp / 'Master-Table.xlsx')
+        ws = wb.active
+        fill = PatternFill('solid', fgColor='FFFF00')
+        for r in list(range(5, 10)) + [12]:
+            for c in range(1, 18):
+                ws.cell(row=r, column=c).fill = fill
+        wb.save(tmp / 'Master-Table.xlsx')
+
+        tail = MasterTail.for_path(tmp / 'Master-Table.xlsx', use_cache=False)
+        assert tail.last_row == 12 and tail.blank_row == tail.append_row == 5
+
+        df = pd.DataFrame([{
+            'ID': None, 'Price_Date': date(2025, 9, 2), 'Date': date(2025, 10, 1), 'Zone': 'SOUTH', 'Load': 'LOW',
+            'REP1': 'HUDSON', 'Term': 12.0, 'Min_MWh': 0, 'Max_MWh': 1000, 'Daily_No_Ruc': 80.5,
+            'RUC_Nodal': 0.0, 'Daily': 80.5, 'Com_Disc': 0.0, 'HOA_Disc': 0.0, 'Broker_Fee': 0.0,
+            'Meter_Fee': 0.0, 'Max_Meters': 5,
+        }] * 2)
+        for engine in ('openpyxl', 'stream', 'write_only'):
+            ep.write_updated_master_copy(df, tmp, 'Master-Table.xlsx', f'{engine}.xlsx', engine=engine)
+            ws = load_workbook(tmp / f'{engine}.xlsx').active
+            ids = [ws.cell(row=r, column=1).value for r in range(2, 13)]
+            assert ids == [100, 101, 102, 103, 104] + [None] * 6, (engine, ids)
+            assert ws['D6'].value == 'SOUTH' and ws['J6'].number_format == ep.MASTER_FORMATS['J']
+            # Formatting further down is kept where it was
+            assert ws['C7'].fill.fgColor.rgb == ws['C12'].fill.fgColor.rgb == '00FFFF00', engine
+
+        # The stream engine's refreshed tail matches a fresh scan and continues at row 7
+        stream_append_rows(tmp / 'stream.xlsx', [['x']])
+        tail = MasterTail.for_path(tmp / 'stream.xlsx')
+        assert tail.to_dict() == MasterTail.for_path(tmp / 'stream.xlsx', use_cache=False).to_dict()
+        assert load_workbook(tmp / 'stream.xlsx').active['B7'].value == 'x' and tail.append_row == 8
+        print("✓ All engines start at the first formatted empty row!")
+
+
+def test_master_tail_matches_openpyxl_scans():
+    """MasterTail agrees with last_data_row/find_first_blank_row/get_next_id and is cached."""
+    print("\nTesting MasterTail against the openpyxl scans...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = Path(tmp) / 'master.xlsx'
+        _make_master(master, n_rows=6)
+        wb = load_workbook(master)
+        ws = wb.active
+        ws['A4'] = None                                # gap in the ID column
+        ws.cell(row=9, column=3, value='trailing')     # data beyond the last ID
+        wb.save(master)
+
+        tail = MasterTail.for_path(master)
+        ws = load_workbook(master).active
+        assert tail.last_data_row == ep.last_data_row(ws) == 9
+        assert tail.blank_row == ep.find_first_blank_row(ws) == 4
+        assert tail.next_id == ep.get_next_id(ws) == 106
+        assert sidecar_path(master).exists()
+
+        cached = MasterTail.load_sidecar(master)
+        assert cached is not None and cached.to_dict() == tail.to_dict()
+
+        # Appending through the stream engine refreshes the cache for the new file
+        stream_append_rows(master, [['x']])
+        cached = MasterTail.load_sidecar(master)
+        assert cached is not None and cached.last_row == 10 and cached.max_id == 106
+        assert MasterTail.for_path(master, use_cache=False).to_dict() == cached.to_dict()
+        print("✓ MasterTail matches the openpyxl scans and caches correctly!")
+
+def test_master_row_writer():
+    """write_row and apply_master_formats give the same formats; existing styling is kept."""
+    from openpyxl.styles import Font
+
+    wb = Workbook()
+    ws = wb.active
+    ws['C3'] = 'keep'
+    ws['C3'].font = Font(bold=True)
+    writer = ep.master_row_writer(ws)
+    writer.write_row(2, [1, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON'])
+    ep.apply_master_formats(ws, 3)
+    assert ep.master_row_writer(ws) is writer
+    for row in (2, 3):
+        for letter, fmt in ep.MASTER_FORMATS.items():
+            assert ws[f'{letter}{row}'].number_format == fmt, (letter, row)
+        assert ws[f'F{row}'].alignment.horizontal == 'right'
+    assert ws['A2'].value == 1 and ws['F2'].value == 'HUDSON' and ws['Q2'].value is None
+    assert ws['C3'].font.b and ws['C3'].value == 'keep'
+    # Named styles are registered once per workbook
+    ep.MasterRowWriter(ws)
+    assert wb.named_styles.count('Master A') == 1
+    print("✓ Master row writer applies the precomputed styles!")
+
+
+if __name__ == "__main__":
+    test_stream_append_rows()
+    test_stream_append_reuses_styles()
+    test_write_updated_master_copy_engines_match()
+    test_engines_fill_formatted_trailing_rows()
+    test_master_tail_matches_openpyxl_scans()
+    test_master_row_writer()
+    print("\n🎉 All streaming append tests passed!")
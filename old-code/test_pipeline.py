@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for the stage-cached pipeline runner (pipeline.py).
+Runs the pipeline on local copies of the master and the sample Hudson workbook with
+an upload that fails once, and checks that the re-run only repeats the upload, that
+an unchanged supplier file skips the transform, and that every run leaves a report;
+also that each stage keeps only its most recently used cache entries.
+"""
+
+import json
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+import download_files
+import excel_processor as ep
+from pipeline import STAGE_RECORD, Pipeline, StageCache
+
+SAMPLE_XLSM = Path(__file__).parent / 'HudsonMatrixPrices08272025020701PM.xlsm'
+
+
+def _make_master(path: Path) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'DAILY PRICING - new'
+    ws.append(['ID'] + ep.MASTER_HEADERS)
+    ws.append([100, date(2025, 8, 1), date(2025, 9, 1), 'NORTH', 'LOW', 'HUDSON', 12, 0, 1000,
+               75.5, 0, 75.5, 0, 0, 0, 0, 5])
+    wb.save(path)
+
+
+def test_pipeline_stage_cache():
+    """Upload failure -> re-run skips to upload; a new master re-runs append but not transform."""
+    print("Testing stage-cached pipeline...")
+    uploads = []
+
+    def flaky_upload(local_path, remote_name, sharepoint_folder_override=None):
+        uploads.append(Path(local_path).read_bytes())
+        return len(uploads) > 1
+
+    saved_upload = download_files.upload_sharepoint_file
+    download_files.upload_sharepoint_file = flaky_upload
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir, cache_dir = Path(tmp) / 'new_files', Path(tmp) / 'cache'
+            out_dir.mkdir()
+            master = out_dir / download_files.MASTER_FILENAME_REMOTE
+            _make_master(master)
+            shutil.copyfile(SAMPLE_XLSM, out_dir / SAMPLE_XLSM.name)
+
+            def run():
+                pipeline = Pipeline([SAMPLE_XLSM.name], out_dir, cache_dir, local=True)
+                code = pipeline.run()
+                return code, {s['stage']: s['cached'] for s in pipeline.stages}
+
+            assert run() == (4, {'download': True, 'transform': False, 'append': False, 'upload': False})
+            assert run() == (0, {'download': True, 'transform': True, 'append': True, 'upload': False})
+            assert run() == (0, {'download': True, 'transform': True, 'append': True, 'upload': True})
+            assert len(uploads) == 2 and uploads[0] == uploads[1]
+
+            updated = out_dir / download_files.UPDATED_MASTER_FILENAME
+            ids = [r[0] for r in load_workbook(updated, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+            assert ids[0] == 100 and ids == list(range(100, 100 + len(ids))) and len(ids) > 1
+
+            # A changed master re-runs the append on the cached transform output
+            wb = load_workbook(master)
+            wb.active['A2'] = 500
+            wb.save(master)
+            assert run() == (0, {'download': True, 'transform': True, 'append': False, 'upload': False})
+            assert load_workbook(updated, read_only=True).active['A3'].value == 501
+
+            # So does a different MASTER_DEDUPE setting
+            pipeline = Pipeline([SAMPLE_XLSM.name], out_dir, cache_dir, local=True, dedupe=False)
+            assert pipeline.run() == 0
+            assert {s['stage']: s['cached'] for s in pipeline.stages}['append'] is False
+            assert run()[1]['append'] is True
+
+            reports = sorted((out_dir / 'runs').glob('*.json'))
+            assert len(reports) == 6
+            last = json.loads(reports[-1].read_text())
+            assert last['ok'] and [s['stage'] for s in last['stages']] == ['download', 'transform', 'append', 'upload']
+            print("✓ Stages are skipped when their inputs are unchanged!")
+    finally:
+        download_files.upload_sharepoint_file = saved_upload
+
+
+def test_stage_cache_retention():
+    """Only the newest entries per stage survive; a cache hit keeps an old entry alive."""
+    print("Testing stage cache retention...")
+    import os
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = StageCache(Path(tmp), keep=2)
+
+        def write(work: Path) -> dict:
+            (work / 'out.bin').write_bytes(b'x' * 1000)
+            return {'outputs': ['out.bin']}
+
+        def age(key: str, seconds: int) -> None:
+            record = cache.entry_dir('append', key) / STAGE_RECORD
+            t = time.time() - seconds
+            os.utime(record, (t, t))
+
+        cache.run('append', 'a', write)
+        age('a', 300)
+        cache.run('append', 'b', write)
+        age('b', 200)
+        # Reusing 'a' makes it the most recent, so 'b' goes when 'c' arrives
+        assert cache.lookup('append', 'a') is not None
+        cache.run('append', 'c', write)
+        cache.run('transform', 'a', write)
+        assert sorted(p.name for p in (Path(tmp) / 'append').iterdir()) == ['a', 'c']
+        assert cache.lookup('transform', 'a') is not None
+
+        age('a', 100)
+        age('c', 50)
+        cache.run('append', 'd', write)
+        assert sorted(p.name for p in (Path(tmp) / 'append').iterdir()) == ['c', 'd']
+        print("✓ Stage cache keeps the most recently used entries!")
+
+
+if __name__ == "__main__":
+    test_pipeline_stage_cache()
+    test_stage_cache_retention()
+    print("\n🎉 All pipeline tests passed!")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for per-stage run instrumentation (run_metrics.py).
+Checks span nesting, row counts, memory peaks and the JSON run report, that spans
+cost nothing outside a run, and that an append through excel_processor reports its
+backup, append and save stages.
+"""
+
+import json
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import excel_processor as ep
+import run_metrics as rm
+import workload_generator as wg
+
+
+def test_spans_and_report():
+    """Nested spans record time, rows and peaks; the report lands in runs/."""
+    print("Testing spans and run report...")
+    with tempfile.TemporaryDirectory() as tmp:
+        with rm.run_report('unit', tmp, trace_memory=True) as report:
+            with rm.span('transform', rows=10) as outer:
+                blob = bytearray(8_000_000)
+                with rm.span('save'):
+                    time.sleep(0.02)
+                    rm.add_rows(5)
+                    rm.note(file='x.xlsx')
+                with rm.span('transform'):
+                    rm.add_rows(3)
+                del blob
+        assert rm.current_run() is None
+
+        save = next(s for s in report.spans if s.name == 'save')
+        assert save.parent == 'transform' and save.depth == 1
+        assert save.rows == 5 and save.meta == {'file': 'x.xlsx'} and save.seconds >= 0.02
+        assert outer.rows == 10 and outer.peak_mb >= 8
+        assert rm.resource is None or outer.max_rss_mb >= save.max_rss_mb > 0
+        assert outer.self_seconds <= outer.seconds - save.seconds + 1e-3
+
+        totals = report.totals()
+        # The inner transform only adds its count and self time
+        assert totals['transform']['count'] == 2 and totals['transform']['rows'] == 10
+        assert totals['transform']['seconds'] == outer.seconds
+
+        paths = list((Path(tmp) / 'runs').glob('*-unit.json'))
+        assert len(paths) == 1
+        data = json.loads(paths[0].read_text())
+        assert data['ok'] and data['run'] == 'unit' and data['seconds'] >= save.seconds
+        assert [s['name'] for s in data['spans']] == ['transform', 'save', 'transform']
+        assert data['spans'][1]['file'] == 'x.xlsx' and data['spans'][1]['rows_per_s']
+    print("✓ Spans nest and the report is written!")
+
+
+def test_no_run_and_failures():
+    """Outside a run spans are no-ops; errors and exit codes mark the run failed."""
+    print("Testing inactive spans and failed runs...")
+
+    @rm.spanned('transform', rows=len)
+    def work(n):
+        return list(range(n))
+
+    assert rm.current_run() is None
+    with rm.span('save') as s:
+        s.add_rows(3)
+    rm.add_rows(1)
+    assert work(4) == [0, 1, 2, 3]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            with rm.run_report('boom', tmp) as report:
+                work(7)
+                with rm.span('append'):
+                    raise ValueError('bad row')
+        except ValueError:
+            pass
+        assert not report.to_dict()['ok'] and 'bad row' in report.error
+        # tracemalloc only runs on request
+        assert rm.TRACE_MEMORY or (not report.trace_memory and report.spans[0].peak_mb is None)
+        assert [(s.name, s.rows, s.error) for s in report.spans] == \
+            [('transform', 7, None), ('append', None, 'ValueError: bad row')]
+
+        for code, ok in ((0, True), (3, False)):
+            try:
+                with rm.run_report('exit', tmp, write=False) as report:
+                    raise SystemExit(code)
+            except SystemExit:
+                pass
+            assert (report.error is None) == ok
+    print("✓ Spans are free outside runs and failures are recorded!")
+
+
+def test_append_stages():
+    """An append reports backup and save inside append, with the rows written."""
+    print("Testing append instrumentation...")
+    with tempfile.TemporaryDirectory() as tmp:
+        master = wg.write_master(Path(tmp) / 'master.xlsx', 500, days=5)
+        df = wg.master_frame(120, days=1, first_day=date(2026, 1, 1))
+        with rm.run_report('append', tmp, write=False) as report:
+            assert ep.a(df, master) == 120
+        by_name = {s.name: s for s in report.spans}
+        assert set(by_name) == {'append', 'backup', 'save'}
+        assert by_name['append'].rows == 120 and by_name['save'].rows == 120
+        assert by_name['backup'].parent == by_name['save'].parent == 'append'
+        assert ep.run_report_dir(['process-hda', 'HDA', str(master)]) == master.parent
+        assert ep.run_report_dir(['download-only', 'f.xlsm']) == Path('.')
+    print("✓ Append, backup and save are timed!")
+
+
+if __name__ == "__main__":
+    test_spans_and_report()
+    test_no_run_and_failures()
+    test_append_stages()
+    print("\n🎉 All run metrics tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script for CLI startup cost (lazy_imports.py).
+Importing excel_processor and download_files must not import pandas, openpyxl,
+requests or msal, and `--help` of both scripts must finish within the startup
+budget (STARTUP_BUDGET seconds, default 1.0, measured in a fresh interpreter).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import lazy_imports
+
+HERE = Path(__file__).parent
+HEAVY = ('pandas', 'numpy', 'openpyxl', 'requests', 'msal')
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))
+
+
+def _python(*args) -> subprocess.CompletedProcess:
+    env = dict(os.environ, RUN_REPORTS='0')
+    return subprocess.run([sys.executable, *args], cwd=HERE, env=env, capture_output=True, text=True)
+
+
+def test_entry_points_import_no_heavy_modules():
+    """Importing the entry points leaves the heavy dependencies unimported."""
+    print("Testing entry point imports...")
+    code = ("import json, sys; import excel_processor, download_files; "
+            f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))")
+    result = _python('-c', code)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+    print("✓ No heavy modules imported at startup!")
+
+
+def test_help_within_budget():
+    """--help of both scripts starts and exits within the budget."""
+    print("Testing --help startup time...")
+    for script, expected in (('excel_processor.py', 'Usage:'), ('download_files.py', 'usage:')):
+        t0 = time.perf_counter()
+        result = _python(script, '--help')
+        elapsed = time.perf_counter() - t0
+        assert result.returncode == 0 and expected in result.stdout, result.stderr
+        assert elapsed < STARTUP_BUDGET, f"{script} --help took {elapsed:.2f}s (budget {STARTUP_BUDGET}s)"
+        print(f"✓ {script} --help in {elapsed:.2f}s")
+
+
+def test_lazy_stand_ins():
+    """Stand-ins import on first use and report missing modules as DEPENDENCY_ERROR."""
+    print("Testing lazy stand-ins...")
+    dedent = lazy_imports.lazy_attr('textwrap', 'dedent')
+    assert dedent('  a\n  b') == 'a\nb'
+    mod = lazy_imports.lazy_module('colorsys')
+    assert 'not loaded' in repr(mod)
+    assert mod.rgb_to_hsv(1, 0, 0)[0] == 0 and 'loaded' in repr(mod)
+
+    missing = lazy_imports.lazy_module('no_such_module_here', hint='pip install nothing')
+    try:
+        missing.anything
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        raise AssertionError('missing module did not exit')
+    print("✓ Stand-ins load on demand!")
+
+
+if __name__ == "__main__":
+    test_entry_points_import_no_heavy_modules()
+    test_help_within_budget()
+    test_lazy_stand_ins()
+    print("\n🎉 All startup tests passed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the vectorized Hudson transform helpers (transform_columns.py).
+Checks that every column helper returns exactly what the per-row Series.map did
+(values, index and dtype) on messy input, and that the full transforms agree
+between the vectorized and row-wise engines.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import excel_processor as ep
+import transform_columns as tc
+import transformer as tf
+
+
+def _messy_frame() -> pd.DataFrame:
+    df = pd.DataFrame({
+        'MatrixDescription': ['North Zone Low Load Factor', None, np.nan, '  West Zone High Load Factor  ',
+                              'Houston Zone Medium Load Factor', 'weird', 'South zone low', ''],
+        'Price': [0.07, 0.08, 'x', None, 1, 2, 3, 4],
+        'TermCode': [12, '24', '36 Months', 12.9, np.nan, None, -12, '60.0'],
+        'StartDate': ['2025-09-01', datetime(2025, 10, 1), None, 'bad', '2025-11-01', '2025-12-01',
+                      '2026-01-01', '2026-02-01'],
+        'Product': ['Fixed Price', 'fixed price ', 'Fixed Price', 'Fixed Price', 'Other', 'Fixed Price',
+                    'Fixed Price', 'Fixed Price'],
+    })
+    df.index = [5, 3, 9, 1, 0, 7, 2, 4]
+    return df
+
+
+def test_column_helpers_match_rowwise():
+    """Each helper equals Series.map over the reference per-row function."""
+    print("Testing vectorized column helpers against Series.map...")
+    df = _messy_frame()
+    cases = [
+        (tc.terms_column, tc.term_to_int, df['TermCode']),
+        (tc.terms_column, tc.term_to_int, pd.Series([12, 24, 7, 60.5, np.nan])),
+        (tc.terms_column, tc.term_to_int, pd.Series([12, 24, 36])),
+        (tc.zone_column, tc.parse_zone, df['MatrixDescription']),
+        (tc.load_column, tc.parse_lf, df['MatrixDescription']),
+        (tc.col_e_zone_column, tc.parse_zone_from_col_e, df['MatrixDescription']),
+        (tc.col_e_load_column, tc.parse_load_from_col_e, df['MatrixDescription']),
+    ]
+    for helper, fn, s in cases:
+        pd.testing.assert_series_equal(helper(s, 'vectorized'), s.map(fn), check_exact=True)
+    starts = pd.to_datetime(df['StartDate'], errors='coerce', format='mixed')
+    pd.testing.assert_series_equal(tc.dates_column(starts, 'vectorized'), starts.dt.date, check_exact=True)
+    print("✓ Column helpers match the per-row functions!")
+
+
+def test_transforms_match_between_engines():
+    """hda_matrix_to_master_cols / v2 / transform_to_master_format agree across engines."""
+    print("\nTesting full transforms with both engines...")
+    df = _messy_frame()
+    engine = tc.TRANSFORM_ENGINE
+    try:
+        for fn in (ep.hda_matrix_to_master_cols, ep.hda_matrix_to_base_cols_v2, tf.transform_to_master_format):
+            tc.TRANSFORM_ENGINE = 'rowwise'
+            expected = fn(df)
+            tc.TRANSFORM_ENGINE = 'vectorized'
+            pd.testing.assert_frame_equal(fn(df), expected, check_exact=True)
+    finally:
+        tc.TRANSFORM_ENGINE = engine
+    print("✓ Vectorized and row-wise transforms are identical!")
+
+
+def test_description_dictionary_parses_each_description_once():
+    """Repeated descriptions are parsed once and reused across calls."""
+    print("\nTesting description dictionary...")
+    calls = []
+
+    def zone_fn(text):
+        calls.append(text)
+        return tc.parse_zone(text)
+
+    descriptions = tc.DescriptionDictionary(zone_fn, tc.parse_lf, 'test')
+    s = pd.Series(['North Zone Low Load Factor', 'West Zone High Load Factor'] * 500 + [None, np.nan])
+    zones, loads = descriptions.columns(s, 'vectorized')
+    pd.testing.assert_series_equal(zones, s.map(tc.parse_zone), check_exact=True)
+    pd.testing.assert_series_equal(loads, s.map(tc.parse_lf), check_exact=True)
+    assert len(descriptions) == 2
+    assert calls.count('North Zone Low Load Factor') == 1
+
+    descriptions.columns(s.iloc[::-1], 'vectorized')
+    assert calls.count('North Zone Low Load Factor') == 1
+    print("✓ Each distinct description is parsed once!")
+
+
+if __name__ == "__main__":
+    test_column_helpers_match_rowwise()
+    test_transforms_match_between_engines()
+    test_description_dictionary_parses_each_description_once()
+    print("\n🎉 All transform column tests passed!")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the synthetic workload generator (workload_generator.py).
+Generates small Matrix Table, ERCOT and master workbooks and checks that they have
+the real layouts, that the existing readers and filters accept them, and that the
+same seed gives the same data.
+"""
+
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import excel_processor as ep
+import excel_reader as xr
+import workload_generator as wg
+from sheet_select import list_sheet_names
+
+
+def test_matrix_workbook_layout():
+    """Hidden Matrix Table, helper sheets and VBA part; the reader transforms it."""
+    print("Testing synthetic Matrix Table workbook...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = wg.write_matrix_workbook(Path(tmp) / 'matrix.xlsm', rows=3000, hidden=True)
+        with zipfile.ZipFile(path) as zf:
+            assert wg.VBA_PART in zf.namelist()
+            assert wg.XLSM_MAIN_TYPE in zf.read('[Content_Types].xml').decode()
+        wb = load_workbook(path, read_only=True, keep_vba=True)
+        assert wb['Matrix Table'].sheet_state == 'hidden'
+        assert wb['Matrix Price Locator'].sheet_state == 'hidden'
+        wb.close()
+        assert 'Matrix Table' in list_sheet_names(path)
+
+        df = pd.read_excel(path, sheet_name='Matrix Table')
+        assert len(df) == 3000
+        assert list(df.columns[[3, 4, 7, 9]]) == ['TermCode', 'MatrixDescription', 'Price', 'StartDate']
+        assert not df.duplicated(['StartDate', 'TermCode', 'MatrixDescription']).any()
+
+        out = xr.transform_input_to_master_df(path, start_id=1)
+        assert 0 < len(out) < 3000
+        assert set(out['Term']) <= {12, 24, 36, 48, 60}
+        assert {'COAST', 'NORTH', 'SOUTH', 'WEST'} <= set(out['Zone'])
+        print(f"✓ {len(out)} master rows from a hidden 3000-row Matrix Table!")
+
+
+def test_ercot_sheet_filters():
+    """The ERCOT sheet has BASE_COLS and a mix the filter partly keeps."""
+    print("Testing synthetic ERCOT sheet...")
+    df = wg.ercot_sheet(4000)
+    assert list(df.columns) == ep.BASE_COLS and len(df) == 4000
+    kept = ep.filter_sheet(df)
+    assert 0 < len(kept) < len(df)
+    assert set(kept['Product']) == {'Fixed Price'}
+    assert wg.ercot_sheet(4000).equals(df)
+    assert not wg.ercot_sheet(4000, seed=1).equals(df)
+    print(f"✓ filter_sheet keeps {len(kept)} of {len(df)} rows!")
+
+
+def test_master_generation():
+    """Masters span the daily appends, are reproducible and stream to disk intact."""
+    print("Testing synthetic master tables...")
+    df = wg.master_frame(7300, days=30)
+    assert list(df.columns) == wg.MASTER_COLUMNS == ['ID'] + ep.MASTER_HEADERS
+    assert len(df) == 7300 and df['ID'].tolist() == list(range(1, 7301))
+    assert df['Price_Date'].nunique() == 30
+    assert set(df['REP1']) == set(wg.MASTER_SUPPLIERS)
+    assert not df.duplicated(ep.MASTER_HEADERS[:8]).any()
+    pd.testing.assert_frame_equal(df, pd.concat(wg.master_chunks(7300, days=30, chunk_rows=1000),
+                                                ignore_index=True))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = wg.write_master(Path(tmp) / 'master.xlsx', 2000, days=10)
+        back = pd.read_excel(path)
+        assert list(back.columns) == wg.MASTER_COLUMNS and len(back) == 2000
+        expected = wg.master_frame(2000, days=10)
+        assert back['ID'].tolist() == expected['ID'].tolist()
+        assert back['Daily'].round(2).tolist() == expected['Daily'].tolist()
+        assert (back['Date'] == expected['Date']).all()
+    print("✓ Masters are reproducible and stream to disk!")
+
+
+def test_parse_size():
+    assert [wg.parse_size(s) for s in ('10k', '100K', '1M', '5m', '2500', '1.5M')] == \
+        [10_000, 100_000, 1_000_000, 5_000_000, 2500, 1_500_000]
+    assert [wg.size_label(n) for n in wg.MASTER_SIZES] == ['10k', '100k', '1M', '5M']
+
+
+if __name__ == "__main__":
+    test_matrix_workbook_layout()
+    test_ercot_sheet_filters()
+    test_master_generation()
+    test_parse_size()
+    print("\n🎉 All workload generator tests passed!")
@@ -0,0 +1,246 @@
+"""
+Column-at-a-time helpers for the Hudson Matrix Table transforms.
+
+hda_matrix_to_master_cols, hda_matrix_to_base_cols_v2 (excel_processor.py),
+transform_to_master_format (transformer.py) and transform_input_to_master_df
+(excel_reader.py) used to push every cell through small Python closures with
+Series.map. The helpers here compute the same columns over the whole Series at
+once and return exactly what the per-row map returned (same values, index and
+dtype):
+- numeric term columns: numpy truncation and a TARGET_TERMS membership test
+- text terms: factorize into codes, parse each distinct value once, then expand
+  the results by code
+- descriptions (MatrixDescription, Column E): a DescriptionDictionary parses
+  each distinct string into (Zone, Load) once and the categorical codes expand
+  both columns in one step. A Matrix Table has a few dozen distinct
+  descriptions across tens of thousands of rows.
+- start dates: the same per-distinct-value conversion for .dt.date
+
+The per-row reference functions are kept below; set HDA_TRANSFORM_ENGINE=rowwise
+(or pass engine='rowwise') to use them, e.g. to compare or benchmark.
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_datetime64_dtype, is_numeric_dtype
+
+TARGET_TERMS = {12, 24, 36, 48, 60}
+
+# Transform engine for the Hudson column helpers:
+#   'vectorized' - whole-column operations (default)
+#   'rowwise'    - legacy Series.map over the per-row functions below
+TRANSFORM_ENGINE = os.getenv("HDA_TRANSFORM_ENGINE", "vectorized")
+
+# HDA_DEBUG=1 prints each description the first time it is parsed (instead of per row)
+DEBUG = os.getenv("HDA_DEBUG", "").strip().lower() in ("1", "true", "yes")
+
+_COL_E_ZONE_RE = r'\b([A-Za-z]+)\s+zone\b'
+_COL_E_ZONES = {'north': 'NORTH', 'west': 'WEST', 'south': 'SOUTH', 'houston': 'COAST'}
+
+
+# --- Per-row reference functions ---
+
+def term_to_int(v) -> Optional[int]:
+    """Term in months if it is one of TARGET_TERMS, else None."""
+    try:
+        iv = int(float(v))
+        return iv if iv in TARGET_TERMS else None
+    except Exception:
+        m = re.search(r"(\d+)", str(v))
+        if m:
+            iv = int(m.group(1))
+            return iv if iv in TARGET_TERMS else None
+        return None
+
+
+def parse_zone(text: str) -> str:
+    """Zone name from a MatrixDescription by removing the load factor suffix."""
+    s = str(text or '').strip()
+    for token in [' Low Load Factor', ' Medium Load Factor', ' High Load Factor']:
+        if s.endswith(token):
+            return s[: -len(token)]
+    return s
+
+
+def parse_lf(text: str) -> str:
+    """LOW/MED/HIGH from a MatrixDescription, else ''."""
+    s = str(text or '').strip()
+    if 'Low Load Factor' in s:
+        return 'LOW'
+    elif 'Medium Load Factor' in s:
+        return 'MED'
+    elif 'High Load Factor' in s:
+        return 'HIGH'
+    return ''
+
+
+def parse_zone_from_col_e(val: str) -> str:
+    """Word before 'zone' in Column E mapped per spec (Houston -> COAST), else 'NA'."""
+    s = str(val or '').strip()
+    if not s:
+        return 'NA'
+    m = re.search(_COL_E_ZONE_RE, s, flags=re.IGNORECASE)
+    if not m:
+        return 'NA'
+    return _COL_E_ZONES.get(m.group(1).strip().lower(), 'NA')
+
+
+def parse_load_from_col_e(val: str) -> str:
+    """HIGH/MED/LOW from Column E text, else 'NA'."""
+    s = str(val or '').lower()
+    if 'high' in s:
+        return 'HIGH'
+    if 'med' in s:
+        return 'MED'
+    if 'low' in s:
+        return 'LOW'
+    return 'NA'
+
+
+# --- Vectorized building blocks ---
+
+def _engine(engine: Optional[str]) -> str:
+    return engine or TRANSFORM_ENGINE
+
+
+def _inferred(values: np.ndarray, like: pd.Series) -> pd.Series:
+    """Series shaped like `like` with the dtype Series.map would have inferred for values."""
+    return pd.Series(np.asarray(values, dtype=object), index=like.index, name=like.name).infer_objects()
+
+
+def _by_distinct(s: pd.Series, fn: Callable) -> pd.Series:
+    """s.map(fn), calling fn once per distinct value and expanding by factorize codes."""
+    codes, uniques = pd.factorize(s)
+    values = np.array([fn(v) for v in uniques] + [None], dtype=object)[codes]
+    # Missing cells are coded -1; None and NaN can parse differently, so do them one by one
+    for i in np.flatnonzero(codes == -1):
+        values[i] = fn(s.iat[i])
+    return _inferred(values, s)
+
+
+def _is_text(s: pd.Series) -> bool:
+    # Only pure text columns are parsed per distinct value: factorize/categorical treat
+    # 1, 1.0 and True as one value, which str()-based parsers would tell apart
+    return infer_dtype(s, skipna=True) in ('string', 'empty')
+
+
+def _terms_from_numbers(s: pd.Series) -> pd.Series:
+    x = s.to_numpy(dtype='float64', na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        iv = np.trunc(x)
+    ok = np.isin(iv, sorted(TARGET_TERMS))
+    # Same dtype map() infers: int64 if every row is a term, all-None object if none is
+    if ok.all():
+        return pd.Series(iv.astype('int64'), index=s.index, name=s.name)
+    if not ok.any():
+        return pd.Series([None] * len(x), index=s.index, name=s.name, dtype=object)
+    return pd.Series(np.where(ok, iv, np.nan), index=s.index, name=s.name)
+
+
+# --- Column helpers ---
+
+def terms_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """Vectorized s.map(term_to_int)."""
+    if _engine(engine) == 'rowwise' or len(s) == 0:
+        return s.map(term_to_int)
+    if is_numeric_dtype(s) or is_bool_dtype(s):
+        return _terms_from_numbers(s)
+    # Numbers that compare equal give the same term, so factorize merging them is harmless
+    return _by_distinct(s, term_to_int)
+
+
+class DescriptionDictionary:
+    """Description text -> (Zone, Load), each distinct string parsed once per process.
+
+    The Matrix Table repeats the same zone x load factor descriptions for every
+    start month and term, so the column is converted to a categorical, only its
+    categories are looked up here, and the category codes expand the (Zone, Load)
+    pairs back to rows in one step. Entries persist across calls, so a batch of
+    workbooks parses each description once.
+    """
+
+    def __init__(self, zone_fn: Callable, load_fn: Callable, label: str):
+        self.zone_fn = zone_fn
+        self.load_fn = load_fn
+        self.label = label
+        self._entries: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def parse(self, text) -> Tuple[str, str]:
+        """(zone, load) for one description, from the dictionary when already seen."""
+        pair = self._entries.get(text) if isinstance(text, str) else None
+        if pair is None:
+            pair = (self.zone_fn(text), self.load_fn(text))
+            if DEBUG:
+                print(f"{self.label}: {text!r} -> zone={pair[0]!r}, load={pair[1]!r}")
+            if isinstance(text, str):
+                self._entries[text] = pair
+        return pair
+
+    def columns(self, s: pd.Series, engine: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+        """(s.map(zone_fn), s.map(load_fn)) through the dictionary."""
+        if _engine(engine) == 'rowwise' or len(s) == 0 or not _is_text(s):
+            return s.map(self.zone_fn), s.map(self.load_fn)
+        cat = s.astype('category')
+        codes = cat.cat.codes.to_numpy()
+        pairs = [self.parse(c) for c in cat.cat.categories] + [(None, None)]
+        zones = np.array([p[0] for p in pairs], dtype=object)[codes]
+        loads = np.array([p[1] for p in pairs], dtype=object)[codes]
+        # Missing cells are coded -1; None and NaN can parse differently, so do them one by one
+        for i in np.flatnonzero(codes == -1):
+            zones[i], loads[i] = self.parse(s.iat[i])
+        return _inferred(zones, s), _inferred(loads, s)
+
+
+MATRIX_DESCRIPTIONS = DescriptionDictionary(parse_zone, parse_lf, 'parse_lf')
+COL_E_DESCRIPTIONS = DescriptionDictionary(parse_zone_from_col_e, parse_load_from_col_e, 'parse_col_e')
+
+
+def zone_load_columns(s: pd.Series, engine: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+    """(Zone, Load) columns from a MatrixDescription column."""
+    return MATRIX_DESCRIPTIONS.columns(s, engine)
+
+
+def col_e_zone_load_columns(s: pd.Series, engine: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+    """(Zone, Load) columns from Column E text (Houston -> COAST, 'NA' when unknown)."""
+    return COL_E_DESCRIPTIONS.columns(s, engine)
+
+
+def zone_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """Vectorized s.map(parse_zone) for a MatrixDescription column."""
+    return zone_load_columns(s, engine)[0]
+
+
+def load_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """Vectorized s.map(parse_lf) for a MatrixDescription column."""
+    return zone_load_columns(s, engine)[1]
+
+
+def col_e_zone_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """Vectorized s.map(parse_zone_from_col_e)."""
+    return col_e_zone_load_columns(s, engine)[0]
+
+
+def col_e_load_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """Vectorized s.map(parse_load_from_col_e)."""
+    return col_e_zone_load_columns(s, engine)[1]
+
+
+def dates_column(s: pd.Series, engine: Optional[str] = None) -> pd.Series:
+    """pd.to_datetime(s, errors='coerce').dt.date, converting each distinct timestamp once."""
+    if _engine(engine) == 'rowwise' or len(s) == 0:
+        return pd.to_datetime(s, errors='coerce').dt.date
+    ts = s if is_datetime64_dtype(s) else pd.to_datetime(s, errors='coerce')
+    codes, uniques = pd.factorize(ts)
+    if len(uniques) == 0:
+        # All missing: .dt.date keeps a datetime64 dtype here, so let it decide
+        return ts.dt.date
+    dates = list(pd.Series(uniques).dt.date) + [pd.NaT]
+    return pd.Series(np.array(dates, dtype=object)[codes], index=s.index, name=s.name, dtype=object)
@@ -7,11 +7,12 @@ used in the excel processing workflow.
 
 import re
 import pandas as pd
-import shutil
-from datetime import date, datetime
+from datetime import date
 from pathlib import Path
 from typing import Optional, Dict, List
 
+from transform_columns import dates_column, terms_column, zone_load_columns
+
 
 # Constants from excel_processor.py
 TARGET_TERMS = {12, 24, 36, 48, 60}
@@ -35,36 +36,18 @@ MASTER_COLS = [
 
 def create_master_table_backup(master_path: Path) -> Optional[Path]:
     """
-    Create a timestamped backup copy of the master table before modifications.
+    Create a timestamped backup of the master table before modifications.
+    MASTER_BACKUP_MODE picks the deduplicating backup store ('store', default)
+    or a full copy ('copy'); see backup_store.backup_master_for_mode.
 
     Args:
         master_path: Path to the master table file
 
     Returns:
-        Path to the backup file if successful, None if failed
+        Path to the backup file (or snapshot manifest) if successful, None if failed
     """
-    if not master_path.exists():
-        print(f"Master table not found for backup: {master_path}")
-        return None
-
-    try:
-        # Create backup directory if it doesn't exist
-        backup_dir = master_path.parent / "backups"
-        backup_dir.mkdir(exist_ok=True)
-
-        # Generate timestamped backup filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{master_path.stem}_backup_{timestamp}{master_path.suffix}"
-        backup_path = backup_dir / backup_name
-
-        # Copy the master table to backup location
-        shutil.copy2(master_path, backup_path)
-        print(f"Created backup: {backup_path}")
-        return backup_path
-
-    except Exception as e:
-        print(f"Failed to create backup of master table: {e}")
-        return None
+    from backup_store import backup_master_for_mode
+    return backup_master_for_mode(master_path)
 
 
 def parse_term_to_int(val) -> Optional[int]:
@@ -239,13 +222,11 @@ def transform_to_master_format(df: pd.DataFrame) -> pd.DataFrame:
     # Dates
     today = date.today()
     out['Price_Date'] = today  # Column B - today's date for all rows
-    start_dates = pd.to_datetime(work_df[c_start], errors='coerce')
-    out['Date'] = start_dates.dt.date  # Column C - start date from input
+    out['Date'] = dates_column(work_df[c_start])  # Column C - start date from input
     
     # Zone and Load Factor
     if c_desc is not None:
-        out['Zone'] = work_df[c_desc].map(parse_zone_from_description)
-        out['Load'] = work_df[c_desc].map(parse_load_factor_from_description)
+        out['Zone'], out['Load'] = zone_load_columns(work_df[c_desc])
     else:
         out['Zone'] = work_df[c_zone].astype(str) if c_zone is not None else ''
         out['Load'] = work_df[c_lf].astype(str) if c_lf is not None else ''
@@ -254,18 +235,7 @@ def transform_to_master_format(df: pd.DataFrame) -> pd.DataFrame:
     out['REP1'] = 'HUDSON'
     
     # Term with filtering
-    def term_to_int(v):
-        try:
-            iv = int(float(v))
-            return iv if iv in TARGET_TERMS else None
-        except Exception:
-            m = re.search(r"(\d+)", str(v))
-            if m:
-                iv = int(m.group(1))
-                return iv if iv in TARGET_TERMS else None
-            return None
-    
-    out['Term'] = work_df[c_term].map(term_to_int)
+    out['Term'] = terms_column(work_df[c_term])
     
     # Usage tiers
     out['Min_MWh'] = 0
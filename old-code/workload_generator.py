@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Synthetic workload generator: Hudson Matrix Table workbooks, ERCOT pricing sheets
+and master tables of any size, reproducible from a seed.
+
+The only real fixtures are one day's Hudson workbook and a small master, which say
+nothing about a master after a year of daily appends or about multi-supplier inputs.
+Everything here is generated offline from the layouts of those files:
+- matrix: .xlsm with hidden helper sheets, a VBA part and a 'Matrix Table' sheet with
+          the real columns A..L (TermCode in D, MatrixDescription in E, Price in H,
+          StartDate in J); rows are distinct (product, start month, term) combinations
+- ercot:  'Start Month/State/Utility/Congestion Zone/Load Factor/Term/Product/0-200,000'
+          sheet with the filter's mix of products and terms ('12 Months', ...)
+- master: 17-column 'DAILY PRICING - new' table spread over a year of daily appends
+          from several suppliers, written with the streaming engine in bounded memory,
+          so 1M and 5M row masters are practical
+
+The same seed, size and options always give the same cell values.
+
+Usage:
+    python workload_generator.py matrix OUT.xlsm [--rows 22045] [--hidden] [--seed N]
+    python workload_generator.py ercot OUT.xlsx [--rows 6000] [--seed N]
+    python workload_generator.py master OUT.xlsx --rows 1M [--seed N]
+    python workload_generator.py all OUT_DIR [--master-sizes 10k,100k,1M,5M]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from xlsx_stream import _read_rels, _rels_path, clone_zipinfo, copy_member, workbook_part_path
+
+SEED = 20250827
+MASTER_SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+MATRIX_ROWS = 22045
+ERCOT_ROWS = 6000
+MASTER_DAYS = 365
+MASTER_SHEET = 'DAILY PRICING - new'
+
+# --- Matrix Table layout ---
+
+MATRIX_HEADERS = ['LookupColumn', 'StartMonth', 'StartYear', 'TermCode', 'MatrixDescription', 'TdspCode',
+                  'DivisionCode', 'Price', 'CreatedDate', 'StartDate', 'GreenPrice', 'CreatedDate']
+# Term mix of the sample workbook; only 12/24/36/48/60 survive the transform
+MATRIX_TERMS = (6, 12, 15, 18, 21, 24, 30, 36, 48, 60)
+# Other sheets of the real workbook, (name, hidden)
+MATRIX_SHEETS = [('Matrix Price Locator', True), ('TX - Power', True), ('zip to zone', True),
+                 ('HES Matrix', False), ('NY - Power', False), ('OH - Power', False)]
+
+
+def _matrix_products() -> List[Tuple[str, str, str, float]]:
+    """(MatrixDescription, TdspCode, DivisionCode, base price) like the sample's products."""
+    products = []
+    for zone, tdsp in [('Houston', 'CNTP'), ('North', 'TXUED'), ('South', 'AEPTCC'), ('West', 'AEPTNC')]:
+        for lf, adj in [('High', -0.002), ('Medium', 0.0), ('Low', 0.002)]:
+            products.append((f'{zone} Zone {lf} Load Factor', tdsp, 'HES_ERCOT_TX', 0.071 + adj))
+    for utility, tdsp, division in [('JCPL Power', 'JCPL', 'HES_PJM_NJ'), ('AECO Power', 'AECO', 'HES_PJM_NJ'),
+                                    ('Duquesne Power', 'DUQ', 'HES_PJM_PA'),
+                                    ('Duke Energy Ohio', 'DEO', 'HES_PJM_OH'),
+                                    ('Dayton Power and Light', 'DPL', 'HES_PJM_OH'),
+                                    ('NGrid (WCMA) Power', 'WMECO', 'HES_NEPOOL_MA')]:
+        for lf, adj in [('High', -0.003), ('Medium', 0.0), ('Low', 0.003)]:
+            products.append((f'{utility} {lf} Load Factor', tdsp, division, 0.095 + adj))
+    for name, tdsp, division in [('CONED Zone J Power', 'CONED', 'HES_NYISO_NY'),
+                                 ('NIMO Zone A Power', 'NIMO', 'HES_NYISO_NY'),
+                                 ('COMED Power', 'COMED', 'HES_PJM_IL'), ('Baltimore Power', 'BGE', 'HES_MD')]:
+        products.append((name, tdsp, division, 0.113))
+    for name, tdsp, division in [('National Fuel Gas', 'NFG', 'HES_NYISO_NY'),
+                                 ('Consolidated Edison Gas', 'CONED', 'HES_NYISO_NY'),
+                                 ('Nicor Gas', 'NICOR', 'HES_PJM_IL'), ('PSEG Gas', 'PSEG', 'HES_PJM_NJ'),
+                                 ('BGE Gas', 'BGE', 'HES_MD'), ('Columbia Gas', 'COLUM', 'HES_PJM_OH')]:
+        products.append((name, tdsp, division, 0.62))
+    return products
+
+
+def _sample_grid(rng: np.random.Generator, sizes: Sequence[int], rows: int) -> List[np.ndarray]:
+    """Indices into each axis of the grid sizes for rows distinct cells, in grid order."""
+    total = int(np.prod(sizes))
+    flat = np.sort(rng.choice(total, size=rows, replace=False)) if rows < total else np.arange(total)
+    return list(np.unravel_index(flat, sizes))
+
+
+def _month_starts(first: date, count: int) -> pd.DatetimeIndex:
+    return pd.date_range(pd.Timestamp(first).replace(day=1), periods=count, freq='MS')
+
+
+def matrix_table_frame(rows: int = MATRIX_ROWS, seed: int = SEED,
+                       created: date = date(2025, 8, 27)) -> pd.DataFrame:
+    """A 'Matrix Table' sheet as pandas reads it (the second CreatedDate is 'CreatedDate.1').
+
+    Rows are distinct (start month, term, product) combinations; the number of start
+    months grows with rows, from 24 months after the created date upwards.
+    """
+    rng = np.random.default_rng(seed)
+    products = _matrix_products()
+    months_needed = max(24, -(-rows // (len(products) * len(MATRIX_TERMS))))
+    months = _month_starts(pd.Timestamp(created) + pd.offsets.MonthBegin(1), months_needed)
+    m_idx, t_idx, p_idx = _sample_grid(rng, (len(months), len(MATRIX_TERMS), len(products)), rows)
+    n = len(m_idx)
+
+    desc = np.array([p[0] for p in products], dtype=object)[p_idx]
+    base = np.array([p[3] for p in products])[p_idx]
+    terms = np.array(MATRIX_TERMS)[t_idx]
+    starts = months[m_idx]
+    # Longer terms and later starts cost a little more, plus per-cell noise
+    price = base * (1 + 0.002 * (terms - 12) / 12 + 0.001 * m_idx) + rng.normal(0, 0.002, n)
+    green = np.where(rng.random(n) < 0.05, rng.uniform(0.004, 0.0404, n), 0.0)
+    created_ts = pd.Timestamp(created)
+
+    df = pd.DataFrame({
+        'LookupColumn': [f'M{s.month}Y{s.year}T{t}D{d}' for s, t, d in zip(starts, terms, desc)],
+        'StartMonth': starts.month.to_numpy(),
+        'StartYear': starts.year.to_numpy(),
+        'TermCode': terms,
+        'MatrixDescription': desc,
+        'TdspCode': np.array([p[1] for p in products], dtype=object)[p_idx],
+        'DivisionCode': np.array([p[2] for p in products], dtype=object)[p_idx],
+        'Price': price.round(4),
+        'CreatedDate': created_ts,
+        'StartDate': starts,
+        'GreenPrice': green.round(4),
+        'CreatedDate.1': pd.NaT,
+    })
+    # Only the first row carries the second CreatedDate in the real sheet
+    if n:
+        df.loc[0, 'CreatedDate.1'] = created_ts
+    return df
+
+
+# --- VBA part ---
+
+VBA_PART = 'xl/vbaProject.bin'
+VBA_CONTENT_TYPE = 'application/vnd.ms-office.vbaProject'
+VBA_REL_TYPE = 'http://schemas.microsoft.com/office/2006/relationships/vbaProject'
+XLSX_MAIN_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml'
+XLSM_MAIN_TYPE = 'application/vnd.ms-excel.sheet.macroEnabled.main+xml'
+OLE_SIGNATURE = bytes.fromhex('d0cf11e0a1b11ae1')
+VBA_SIZE = 78848
+
+
+def add_vba_part(path: Path | str, seed: int = SEED) -> None:
+    """Turn a saved .xlsx package into a macro-enabled one with a vbaProject.bin part.
+
+    The part is a placeholder of the real one's size (OLE signature and filler bytes):
+    enough for code that has to carry the macros through, not for Excel to run them.
+    """
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    blob = OLE_SIGNATURE + rng.integers(0, 256, VBA_SIZE - len(OLE_SIGNATURE), dtype=np.uint8).tobytes()
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zout:
+        wb_part = workbook_part_path(zin)
+        rels_part = _rels_path(wb_part)
+        rel_ids = set(_read_rels(zin, wb_part))
+        for info in zin.infolist():
+            if info.filename == '[Content_Types].xml':
+                text = zin.read(info).decode('utf-8').replace(XLSX_MAIN_TYPE, XLSM_MAIN_TYPE)
+                text = text.replace('<Default ', f'<Default Extension="bin" ContentType="{VBA_CONTENT_TYPE}"/>'
+                                                 '<Default ', 1)
+                zout.writestr(clone_zipinfo(info), text)
+            elif info.filename == rels_part:
+                rid = next(f'rId{i}' for i in range(len(rel_ids) + 1, len(rel_ids) + 100)
+                           if f'rId{i}' not in rel_ids)
+                text = zin.read(info).decode('utf-8').replace(
+                    '</Relationships>', f'<Relationship Id="{rid}" Type="{VBA_REL_TYPE}" '
+                                        f'Target="vbaProject.bin"/></Relationships>')
+                zout.writestr(clone_zipinfo(info), text)
+            else:
+                copy_member(zin, info, zout)
+        zout.writestr(VBA_PART, blob)
+    tmp.replace(path)
+
+
+def write_matrix_workbook(path: Path | str, rows: int = MATRIX_ROWS, seed: int = SEED,
+                          created: date = date(2025, 8, 27), hidden: bool = False,
+                          vba: bool = True) -> Path:
+    """Write a Hudson-style workbook: helper sheets (some hidden), then the Matrix Table
+    (hidden too with hidden=True), plus a VBA part when vba is set.
+    """
+    path = Path(path)
+    df = matrix_table_frame(rows, seed, created)
+    wb = Workbook(write_only=True)
+    for name, is_hidden in MATRIX_SHEETS:
+        ws = wb.create_sheet(name)
+        if is_hidden:
+            ws.sheet_state = 'hidden'
+        ws.append(['Zone', 'Load Factor', 'Lookup'])
+        for i, (desc, tdsp, _, _) in enumerate(_matrix_products()[:20]):
+            ws.append([desc, tdsp, f'=VLOOKUP(A{i + 2},\'Matrix Table\'!E:H,4,FALSE)'])
+    ws = wb.create_sheet('Matrix Table')
+    if hidden:
+        ws.sheet_state = 'hidden'
+    ws.append(MATRIX_HEADERS)
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if v is pd.NaT else (v.to_pydatetime() if isinstance(v, pd.Timestamp) else v)
+                   for v in row])
+    wb.save(path)
+    if vba:
+        add_vba_part(path, seed)
+    return path
+
+
+# --- ERCOT pricing sheet ---
+
+ERCOT_AREAS = [('AEP TX Central', 'Houston LZ'), ('AEP TX Central', 'South LZ'), ('AEP TX Central', 'West LZ'),
+               ('AEP TX North', 'North LZ'), ('AEP TX North', 'South LZ'), ('AEP TX North', 'West LZ'),
+               ('CenterPoint', 'Houston LZ'), ('CenterPoint', 'South LZ'), ('LPL', 'West LZ'),
+               ('Oncor', 'North LZ'), ('Oncor', 'South LZ'), ('Oncor', 'West LZ'),
+               ('TNMP', 'Houston LZ'), ('TNMP', 'North LZ'), ('TNMP', 'West LZ')]
+ERCOT_LOAD_FACTORS = ('LO', 'MED', 'HI', 'RESIDENTIAL LO', 'RESIDENTIAL HI')
+# Only Fixed Price rows with 12..60 month terms pass filter_sheet
+ERCOT_TERMS = ('6 Months', '12 Months', '18 Months', '24 Months', '36 Months', '48 Months', '60 Months')
+ERCOT_PRODUCTS = ('Fixed Price', 'Fixed Price Green', 'Index Plus')
+
+
+def ercot_sheet(rows: int = ERCOT_ROWS, seed: int = SEED, first_month: date = date(2025, 8, 1)) -> pd.DataFrame:
+    """An ERCOT pricing sheet (filtration.BASE_COLS) of distinct area/load/term/product/month rows."""
+    rng = np.random.default_rng(seed)
+    per_month = len(ERCOT_AREAS) * len(ERCOT_LOAD_FACTORS) * len(ERCOT_TERMS) * len(ERCOT_PRODUCTS)
+    months = _month_starts(first_month, max(15, -(-rows // per_month)))
+    m_idx, a_idx, l_idx, t_idx, p_idx = _sample_grid(
+        rng, (len(months), len(ERCOT_AREAS), len(ERCOT_LOAD_FACTORS), len(ERCOT_TERMS), len(ERCOT_PRODUCTS)),
+        rows)
+    n = len(m_idx)
+    areas = np.array(ERCOT_AREAS, dtype=object)
+    return pd.DataFrame({
+        'Start Month': months[m_idx],
+        'State': 'TX',
+        'Utility': areas[a_idx, 0],
+        'Congestion Zone': areas[a_idx, 1],
+        'Load Factor': np.array(ERCOT_LOAD_FACTORS, dtype=object)[l_idx],
+        'Term': np.array(ERCOT_TERMS, dtype=object)[t_idx],
+        'Product': np.array(ERCOT_PRODUCTS, dtype=object)[p_idx],
+        '0-200,000': (8.15 + 0.35 * (a_idx % 3) + 0.1 * t_idx + rng.normal(0, 0.6, n)).clip(6.0, 11.3),
+    })
+
+
+def write_ercot_workbook(path: Path | str, rows: int = ERCOT_ROWS, seed: int = SEED) -> Path:
+    """Write the ERCOT sheet as the first (only) sheet of an .xlsx, like ERCOT-new.xlsx."""
+    path = Path(path)
+    df = ercot_sheet(rows, seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in row])
+    wb.save(path)
+    return path
+
+
+# --- Master table ---
+
+# REP1 -> (share of rows, (Min_MWh, Max_MWh) tiers, price level $/MWh, Broker_Fee, Max_Meters)
+MASTER_SUPPLIERS = {
+    'HUDSON': (0.37, [(0, 1000)], 75.0, 0, 5),
+    'GEXA': (0.24, [(0, 250), (250, 500), (500, 1000)], 78.0, 5, 10),
+    'APG&E': (0.17, [(0, 200)], 82.0, 0, 5),
+    'NRG': (0.16, [(0, 300000)], 74.0, 5, 10),
+    'ATLANTIC': (0.04, [(0, 1000)], 80.0, 0, 10),
+    'CONSTELLATION': (0.02, [(0, 300)], 89.0, 0, 20),
+}
+MASTER_ZONES = ('COAST', 'NORTH', 'SOUTH', 'WEST', 'TNMP')
+MASTER_LOADS = ('HIGH', 'MED', 'LOW')
+MASTER_TERMS = (6, 12, 18, 24, 30, 36, 48, 60)
+MASTER_COLUMNS = ['ID', 'Price_Date', 'Date', 'Zone', 'Load', 'REP1', 'Term', 'Min_MWh', 'Max_MWh',
+                  'Daily_No_Ruc', 'RUC_Nodal', 'Daily', 'Com_Disc', 'HOA_Disc', 'Broker_Fee', 'Meter_Fee',
+                  'Max_Meters']
+
+
+def _master_day(day: int, rows: int, seed: int, first_day: date) -> Dict[str, np.ndarray]:
+    """One day's appends as column arrays: each supplier's share of distinct
+    zone/load/term/tier/month rows, starting the month after the price date
+    (36 months, more when a share needs them).
+    """
+    rng = np.random.default_rng([seed, day])
+    price_date = np.datetime64(first_day, 'D') + day
+    first_month = price_date.astype('datetime64[M]') + 1
+    names = list(MASTER_SUPPLIERS)
+    shares = np.array([MASTER_SUPPLIERS[s][0] for s in names])
+    counts = np.floor(shares / shares.sum() * rows).astype(int)
+    counts[0] += rows - counts.sum()
+    parts: Dict[str, list] = {}
+    for name, count in zip(names, counts):
+        _, tiers, level, broker, meters = MASTER_SUPPLIERS[name]
+        per_month = len(MASTER_TERMS) * len(MASTER_ZONES) * len(MASTER_LOADS) * len(tiers)
+        sizes = (max(36, -(-int(count) // per_month)), len(MASTER_TERMS), len(MASTER_ZONES),
+                 len(MASTER_LOADS), len(tiers))
+        m_idx, t_idx, z_idx, l_idx, tier_idx = _sample_grid(rng, sizes, count)
+        tier = np.array(tiers)[tier_idx]
+        terms = np.array(MASTER_TERMS)[t_idx]
+        price = (level + 0.8 * z_idx - 1.5 * l_idx + 0.05 * terms + 0.2 * m_idx
+                 + rng.normal(0, 2.0, count)).round(2)
+        columns = {
+            'Price_Date': np.full(count, price_date), 'Date': (first_month + m_idx).astype('datetime64[D]'),
+            'Zone': np.array(MASTER_ZONES, dtype=object)[z_idx],
+            'Load': np.array(MASTER_LOADS, dtype=object)[l_idx], 'REP1': np.full(count, name, dtype=object),
+            'Term': terms, 'Min_MWh': tier[:, 0], 'Max_MWh': tier[:, 1],
+            'Daily_No_Ruc': price, 'RUC_Nodal': np.zeros(count), 'Daily': price, 'Com_Disc': np.zeros(count),
+            'HOA_Disc': np.zeros(count), 'Broker_Fee': np.full(count, float(broker)),
+            'Meter_Fee': np.zeros(count), 'Max_Meters': np.full(count, meters),
+        }
+        for col, values in columns.items():
+            parts.setdefault(col, []).append(values)
+    return {col: np.concatenate(values) for col, values in parts.items()}
+
+
+def master_chunks(rows: int, seed: int = SEED, days: int = MASTER_DAYS,
+                  first_day: date = date(2024, 9, 2), chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Master rows (B..Q columns plus ID) as DataFrames of about chunk_rows rows.
+
+    rows are spread evenly over days daily appends, so every size covers the same
+    calendar span with more or fewer rows per day. IDs run from 1, as the stream
+    engine assigns them in a new master.
+    """
+    next_id = 1
+    pending: List[Dict[str, np.ndarray]] = []
+    pending_rows = 0
+    for day in range(days):
+        day_rows = rows * (day + 1) // days - rows * day // days
+        if day_rows == 0:
+            continue
+        pending.append(_master_day(day, day_rows, seed, first_day))
+        pending_rows += day_rows
+        if pending_rows >= chunk_rows or day == days - 1:
+            out = pd.DataFrame({col: np.concatenate([p[col] for p in pending]) for col in pending[0]})
+            out.insert(0, 'ID', np.arange(next_id, next_id + len(out)))
+            next_id += len(out)
+            pending, pending_rows = [], 0
+            yield out
+
+
+def master_frame(rows: int, seed: int = SEED, days: int = MASTER_DAYS,
+                 first_day: date = date(2024, 9, 2)) -> pd.DataFrame:
+    """The whole generated master as one DataFrame (for sizes that fit in memory)."""
+    return pd.concat(master_chunks(rows, seed, days, first_day), ignore_index=True)
+
+
+def write_master(path: Path | str, rows: int, seed: int = SEED, days: int = MASTER_DAYS,
+                 first_day: date = date(2024, 9, 2)) -> Path:
+    """Write a master workbook of rows generated rows with the streaming append engine.
+    Memory stays at one chunk of rows whatever the size.
+    """
+    from excel_processor import MASTER_HEADERS, stream_append_to_master
+
+    path = Path(path)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = MASTER_SHEET
+    ws.append(['ID'] + MASTER_HEADERS)
+    wb.save(path)
+
+    def values() -> Iterator[tuple]:
+        for chunk in master_chunks(rows, seed, days, first_day):
+            chunk['Price_Date'] = chunk['Price_Date'].dt.date
+            chunk['Date'] = chunk['Date'].dt.date
+            # Plain Python values: the cell writer's type checks are much faster on them
+            yield from zip(*(chunk[col].tolist() for col in MASTER_HEADERS))
+
+    stream_append_to_master(values(), path)
+    return path
+
+
+# --- Sizes and CLI ---
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    text = text.strip().lower().replace('_', '').replace(',', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def size_label(rows: int) -> str:
+    for suffix, scale in (('M', 1_000_000), ('k', 1_000)):
+        if rows >= scale and rows % scale == 0:
+            return f'{rows // scale}{suffix}'
+    return str(rows)
+
+
+def generate_all(out_dir: Path | str, master_sizes: Sequence[int] = MASTER_SIZES, seed: int = SEED) -> List[Path]:
+    """A matrix workbook, an ERCOT workbook and one master per size in out_dir."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = [write_matrix_workbook(out_dir / 'HudsonMatrixPrices-synthetic.xlsm', seed=seed),
+               write_ercot_workbook(out_dir / 'ERCOT-synthetic.xlsx', seed=seed)]
+    for rows in master_sizes:
+        started = datetime.now()
+        written.append(write_master(out_dir / f'master-{size_label(rows)}.xlsx', rows, seed))
+        print(f"  master {size_label(rows)}: {(datetime.now() - started).total_seconds():.1f}s")
+    return written
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("kind", choices=("matrix", "ercot", "master", "all"))
+    parser.add_argument("out", type=Path, help="output file (output directory for 'all')")
+    parser.add_argument("--rows", type=parse_size, help="rows to generate (10k, 1M, ...)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--hidden", action="store_true", help="matrix: hide the Matrix Table sheet")
+    parser.add_argument("--no-vba", action="store_true", help="matrix: leave out the VBA part")
+    parser.add_argument("--master-sizes", default=','.join(size_label(s) for s in MASTER_SIZES),
+                        help="all: comma-separated master sizes")
+    args = parser.parse_args(argv)
+
+    if args.kind == 'matrix':
+        written = [write_matrix_workbook(args.out, args.rows or MATRIX_ROWS, args.seed,
+                                         hidden=args.hidden, vba=not args.no_vba)]
+    elif args.kind == 'ercot':
+        written = [write_ercot_workbook(args.out, args.rows or ERCOT_ROWS, args.seed)]
+    elif args.kind == 'master':
+        if not args.rows:
+            parser.error("master needs --rows")
+        written = [write_master(args.out, args.rows, args.seed)]
+    else:
+        written = generate_all(args.out, [parse_size(s) for s in args.master_sizes.split(',')], args.seed)
+    for path in written:
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
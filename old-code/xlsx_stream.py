@@ -0,0 +1,285 @@
+"""
+Low-level helpers for working on .xlsx/.xlsm packages without openpyxl's object model.
+
+A workbook is a zip of XML parts. These helpers resolve sheet parts from the workbook
+metadata, copy zip members chunk by chunk, register cell styles in styles.xml and build
+cell XML, so callers can rewrite or read a single sheet as a stream.
+"""
+from __future__ import annotations
+
+import math
+import numbers
+import re
+import shutil
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, time
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE
+from openpyxl.utils.datetime import to_excel, MAC_EPOCH, WINDOWS_EPOCH
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_DOC_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+CHUNK_SIZE = 1 << 20
+ZIP64_LIMIT = (1 << 31) - 1
+
+_XML_ATTR_ENTITIES = {'"': '&quot;'}
+_XML_ATTR_UNENTITIES = {'&quot;': '"', '&apos;': "'"}
+
+
+# --- Package structure ---
+
+def _join_part(base_dir: str, target: str) -> str:
+    """Resolve a relationship Target against the directory of the part that owns it."""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    parts: List[str] = []
+    for p in (PurePosixPath(base_dir) / target).parts:
+        if p == '..':
+            if parts:
+                parts.pop()
+        elif p not in ('', '.'):
+            parts.append(p)
+    return '/'.join(parts)
+
+
+def _rels_path(part: str) -> str:
+    p = PurePosixPath(part)
+    return str(p.parent / '_rels' / f'{p.name}.rels').lstrip('./')
+
+
+def _read_rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """Return {rId: (type, resolved part path)} for the relationships of a part ('' = package)."""
+    rels_name = '_rels/.rels' if not part else _rels_path(part)
+    try:
+        root = ET.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    base_dir = str(PurePosixPath(part).parent) if part else ''
+    out: Dict[str, Tuple[str, str]] = {}
+    for rel in root.findall(f'{{{NS_PKG_REL}}}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        out[rel.get('Id')] = (rel.get('Type', ''), _join_part(base_dir, rel.get('Target', '')))
+    return out
+
+
+def workbook_part_path(zf: zipfile.ZipFile) -> str:
+    """Locate the workbook part (normally xl/workbook.xml) from the package relationships."""
+    for rel_type, target in _read_rels(zf, '').values():
+        if rel_type.endswith('/officeDocument'):
+            return target
+    return 'xl/workbook.xml'
+
+
+def related_part_path(zf: zipfile.ZipFile, rel_suffix: str) -> Optional[str]:
+    """Return the workbook-level part whose relationship type ends with rel_suffix (e.g. '/styles')."""
+    for rel_type, target in _read_rels(zf, workbook_part_path(zf)).values():
+        if rel_type.endswith(rel_suffix):
+            return target
+    return None
+
+
+def workbook_sheets(zf: zipfile.ZipFile) -> List[Dict[str, object]]:
+    """List sheets in workbook order as dicts with name, state, path and active flag.
+
+    Reads only workbook.xml and its relationships, so it is cheap regardless of sheet size.
+    """
+    wb_part = workbook_part_path(zf)
+    root = ET.fromstring(zf.read(wb_part))
+    rels = _read_rels(zf, wb_part)
+
+    active_tab = 0
+    view = root.find(f'{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView')
+    if view is not None:
+        try:
+            active_tab = int(view.get('activeTab', '0'))
+        except ValueError:
+            active_tab = 0
+
+    sheets: List[Dict[str, object]] = []
+    for el in root.findall(f'{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet'):
+        rid = el.get(f'{{{NS_DOC_REL}}}id')
+        rel_type, path = rels.get(rid, ('', ''))
+        sheets.append({
+            'name': el.get('name', ''),
+            'state': el.get('state', 'visible'),
+            'path': path,
+            'is_worksheet': rel_type.endswith('/worksheet'),
+        })
+    for i, sh in enumerate(sheets):
+        sh['active'] = (i == active_tab)
+    return sheets
+
+
+def workbook_uses_1904(zf: zipfile.ZipFile) -> bool:
+    root = ET.fromstring(zf.read(workbook_part_path(zf)))
+    pr = root.find(f'{{{NS_MAIN}}}workbookPr')
+    return pr is not None and pr.get('date1904', '0') in ('1', 'true')
+
+
+def clone_zipinfo(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Copy the name, timestamp and compression of a member for writing into a new zip."""
+    out = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    out.compress_type = info.compress_type
+    out.external_attr = info.external_attr
+    return out
+
+
+def copy_member(zin: zipfile.ZipFile, info: zipfile.ZipInfo, zout: zipfile.ZipFile) -> None:
+    """Copy a zip member into zout chunk by chunk (never holds the whole member in memory)."""
+    with zin.open(info) as src, zout.open(clone_zipinfo(info), 'w',
+                                          force_zip64=info.file_size > ZIP64_LIMIT) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+# --- Styles ---
+
+_NUMFMTS_RE = re.compile(r'<numFmts\b[^>]*?(?:/>|>(.*?)</numFmts>)', re.S)
+_NUMFMT_RE = re.compile(r'<numFmt\b([^>]*?)/?>')
+_CELLXFS_RE = re.compile(r'(<cellXfs\b[^>]*?>)(.*?)(</cellXfs>)', re.S)
+_XF_RE = re.compile(r'<xf\b([^>]*?)(?:/>|>(.*?)</xf>)', re.S)
+_ALIGN_RE = re.compile(r'<alignment\b([^>]*?)/?>')
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_COUNT_RE = re.compile(r'\bcount="\d+"')
+
+
+def _attrs(text: str) -> Dict[str, str]:
+    return dict(_ATTR_RE.findall(text or ''))
+
+
+def _with_count(open_tag: str, count: int) -> str:
+    if _COUNT_RE.search(open_tag):
+        return _COUNT_RE.sub(f'count="{count}"', open_tag, count=1)
+    return open_tag[:-1] + f' count="{count}">'
+
+
+def ensure_cell_styles(styles_xml: str,
+                       specs: Sequence[Tuple[str, Optional[str]]]) -> Tuple[str, List[int]]:
+    """Make sure a cellXfs entry exists for each (number_format, horizontal_alignment) spec.
+
+    Existing entries with the default font/fill/border and the same number format and
+    alignment are reused, so repeated appends do not keep growing styles.xml.
+    Returns the (possibly) patched styles.xml text and the xf index for each spec.
+    """
+    # Number formats: builtin ids, then existing custom formats, then new ids from 164 up
+    custom: Dict[str, int] = {}
+    m_fmts = _NUMFMTS_RE.search(styles_xml)
+    if m_fmts and m_fmts.group(1):
+        for attr_text in _NUMFMT_RE.findall(m_fmts.group(1)):
+            a = _attrs(attr_text)
+            if 'numFmtId' in a and 'formatCode' in a:
+                custom.setdefault(unescape(a['formatCode'], _XML_ATTR_UNENTITIES), int(a['numFmtId']))
+    new_fmts: List[Tuple[int, str]] = []
+    next_fmt_id = max(list(custom.values()) + [163]) + 1
+
+    def fmt_id(fmt: str) -> int:
+        nonlocal next_fmt_id
+        if fmt in BUILTIN_FORMATS_REVERSE:
+            return BUILTIN_FORMATS_REVERSE[fmt]
+        if fmt not in custom:
+            custom[fmt] = next_fmt_id
+            new_fmts.append((next_fmt_id, fmt))
+            next_fmt_id += 1
+        return custom[fmt]
+
+    m_xfs = _CELLXFS_RE.search(styles_xml)
+    if m_xfs is None:
+        raise ValueError('styles.xml has no cellXfs element')
+    existing: List[Optional[tuple]] = []
+    for xf_attrs, inner in _XF_RE.findall(m_xfs.group(2)):
+        a = _attrs(xf_attrs)
+        inner = inner or ''
+        align = _ALIGN_RE.search(inner)
+        leftover = _ALIGN_RE.sub('', inner).strip()
+        if leftover:
+            existing.append(None)  # protection/extLst etc. - never reuse
+            continue
+        existing.append((a.get('numFmtId', '0'), a.get('fontId', '0'), a.get('fillId', '0'),
+                         a.get('borderId', '0'), tuple(sorted(_attrs(align.group(1)).items())) if align else ()))
+
+    added_xfs: List[str] = []
+    ids: List[int] = []
+    for fmt, horizontal in specs:
+        nid = fmt_id(fmt or 'General')
+        align_key = (('horizontal', horizontal),) if horizontal else ()
+        key = (str(nid), '0', '0', '0', align_key)
+        if key in existing:
+            ids.append(existing.index(key))
+            continue
+        xf = f'<xf numFmtId="{nid}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"'
+        if horizontal:
+            xf += f' applyAlignment="1"><alignment horizontal="{horizontal}"/></xf>'
+        else:
+            xf += '/>'
+        existing.append(key)
+        added_xfs.append(xf)
+        ids.append(len(existing) - 1)
+
+    if added_xfs:
+        open_tag = _with_count(m_xfs.group(1), len(existing))
+        styles_xml = (styles_xml[:m_xfs.start()] + open_tag + m_xfs.group(2) + ''.join(added_xfs)
+                      + m_xfs.group(3) + styles_xml[m_xfs.end():])
+    if new_fmts:
+        entries = ''.join(f'<numFmt numFmtId="{i}" formatCode="{escape(f, _XML_ATTR_ENTITIES)}"/>'
+                          for i, f in new_fmts)
+        m_fmts = _NUMFMTS_RE.search(styles_xml)
+        if m_fmts:
+            body = (m_fmts.group(1) or '') + entries
+            styles_xml = (styles_xml[:m_fmts.start()] + f'<numFmts count="{len(_NUMFMT_RE.findall(body))}">' + body
+                          + '</numFmts>' + styles_xml[m_fmts.end():])
+        else:
+            root_open = re.search(r'<styleSheet\b[^>]*>', styles_xml)
+            if root_open is None:
+                raise ValueError('styles.xml has no styleSheet root element')
+            styles_xml = (styles_xml[:root_open.end()] + f'<numFmts count="{len(new_fmts)}">' + entries
+                          + '</numFmts>' + styles_xml[root_open.end():])
+    return styles_xml, ids
+
+
+# --- Cells ---
+
+def cell_xml(ref: str, value, style: Optional[int] = None, date1904: bool = False) -> str:
+    """Serialise one cell. Empty values (None/NaN/NaT) become a styled empty cell."""
+    s = f' s="{style}"' if style else ''
+    try:
+        if value is None or value != value:
+            return f'<c r="{ref}"{s}/>'
+    except (TypeError, ValueError):
+        # pd.NA and friends refuse boolean comparison
+        return f'<c r="{ref}"{s}/>'
+
+    # Exact built-in types skip the numbers ABC checks, which dominate large writes
+    kind = type(value)
+    if kind is int:
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+    if kind is float:
+        if not math.isfinite(value):
+            return f'<c r="{ref}"{s}/>'
+        return f'<c r="{ref}"{s}><v>{"%.16g" % value}</v></c>'
+    if kind is not str:
+        if isinstance(value, bool) or kind.__name__ == 'bool_':
+            return f'<c r="{ref}"{s} t="b"><v>{int(bool(value))}</v></c>'
+        if isinstance(value, numbers.Integral):
+            return f'<c r="{ref}"{s}><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Real):
+            f = float(value)
+            if not math.isfinite(f):
+                return f'<c r="{ref}"{s}/>'
+            # Same formatting as openpyxl so both engines produce identical cell values
+            return f'<c r="{ref}"{s}><v>{"%.16g" % f}</v></c>'
+        if isinstance(value, (datetime, date, time)):
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                value = value.replace(tzinfo=None)
+            serial = to_excel(value, MAC_EPOCH if date1904 else WINDOWS_EPOCH)
+            return f'<c r="{ref}"{s}><v>{serial}</v></c>'
+
+    text = ILLEGAL_CHARACTERS_RE.sub('', str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'